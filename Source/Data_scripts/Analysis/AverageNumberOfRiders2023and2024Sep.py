@@ -1,28 +1,61 @@
+import numpy as np
 import pandas as pd
 import os
 import gc
+import sys
+from pathlib import Path
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.drawing.image import Image
 
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processing"))
+from HourlyRollup import load_processed_rollup, hourly_average_by_station
+from QuantileSketch import load_quantile_bank, add_quantile_bands
+from Periods import define_periods, period_masks, calendar_year
+from RawData import to_hour_index
+from StationHeatmap import heatmap_matrix, heatmap_image
+from SvgChart import render_line_charts, svg_to_png, cairosvg
+from StationCatalog import load_station_catalog
+from DraftSample import load_draft_sample, draft_periods, draft_rows, estimate_means, save_draft_intervals, print_draft_total
 
-def process_data_in_chunks(file_path, years_to_analyze, chunk_size=100000):
+# Years and/or (label, start date, end date) ranges to analyze, all computed in one pass
+PERIODS = [2023, 2024]
+
+# Estimate the averages from the draft sample built by IngestRawData.py instead:
+# seconds instead of a full scan, labelled as drafts, with 95% confidence intervals
+DRAFT_MODE = False
+
+# Add a sheet with the station x hour heatmap of the averages to every file: 'total', 'cluster' or None
+HEATMAP_ORDER = 'total'
+
+# Add a sheet with the hourly line chart of every station to every file, drawn
+# by SvgChart.py (needs the cairosvg package to turn the charts into images)
+STATION_CHART_SHEETS = False
+
+# Rows between the tops of two charts on the chart sheet (each chart is 360 pixels tall)
+CHART_SHEET_ROW_STEP = 20
+
+
+def process_data_in_chunks(file_path, periods, chunk_size=100000):
     """
     Process the MTA ridership data in chunks to reduce memory usage
     
     Args:
         file_path (str): Path to the CSV file
-        years_to_analyze (list): List of years to extract
+        periods (list): Periods from Periods.define_periods, all filled in the same pass
         chunk_size (int): Number of rows to process at once
         
     Returns:
-        dict: Dictionary with years as keys and processed dataframes as values
+        dict: Dictionary with period labels as keys and processed dataframes as values
     """
     # Initialize dictionaries to store results
-    year_sums = {year: {} for year in years_to_analyze}
-    year_counts = {year: {} for year in years_to_analyze}
+    period_labels = [period['label'] for period in periods]
+    period_sums = {label: {} for label in period_labels}
+    period_counts = {label: {} for label in period_labels}
     
     # Define the columns we need - this reduces memory by loading only necessary columns
     usecols = ['transit_timestamp', 'station_complex_id', 'station_complex', 
@@ -44,7 +77,7 @@ def process_data_in_chunks(file_path, years_to_analyze, chunk_size=100000):
     
     # Process the file in chunks
     rows_processed = 0
-    rows_matching_years = 0
+    rows_matching_periods = 0
     
     for chunk_num, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size, usecols=usecols)):
         if chunk_num % 10 == 0:
@@ -60,24 +93,24 @@ def process_data_in_chunks(file_path, years_to_analyze, chunk_size=100000):
         # Drop rows with invalid timestamps or ridership
         chunk = chunk.dropna(subset=['transit_timestamp', 'ridership'])
         
-        # Extract year and hour from timestamp
-        chunk['year'] = chunk['transit_timestamp'].dt.year
+        # Extract hour from timestamp
         chunk['hour'] = chunk['transit_timestamp'].dt.hour
         
         rows_processed += len(chunk)
         
-        # Filter for relevant years
-        for year in years_to_analyze:
-            year_chunk = chunk[chunk['year'] == year]
+        # Filter for every period from the same chunk
+        for period, mask in period_masks(to_hour_index(chunk['transit_timestamp']), periods):
+            label = period['label']
+            period_chunk = chunk[mask]
             
-            if chunk_num % 10 == 0 and len(year_chunk) > 0:
-                print(f"Chunk {chunk_num}: Found {len(year_chunk)} rows for year {year}")
+            if chunk_num % 10 == 0:
+                print(f"Chunk {chunk_num}: Found {len(period_chunk)} rows for period {label}")
             
-            rows_matching_years += len(year_chunk)
+            rows_matching_periods += len(period_chunk)
             
-            if not year_chunk.empty:
+            if not period_chunk.empty:
                 # Group by required columns and calculate sum and count
-                grouped = year_chunk.groupby([
+                grouped = period_chunk.groupby([
                     'station_complex_id', 
                     'station_complex', 
                     'hour'
@@ -87,60 +120,93 @@ def process_data_in_chunks(file_path, years_to_analyze, chunk_size=100000):
                 for _, row in grouped.iterrows():
                     key = (row['station_complex_id'], row['station_complex'], row['hour'])
                     
-                    if key in year_sums[year]:
-                        year_sums[year][key] += row['sum']
-                        year_counts[year][key] += row['count']
+                    if key in period_sums[label]:
+                        period_sums[label][key] += row['sum']
+                        period_counts[label][key] += row['count']
                     else:
-                        year_sums[year][key] = row['sum']
-                        year_counts[year][key] = row['count']
+                        period_sums[label][key] = row['sum']
+                        period_counts[label][key] = row['count']
         
         # Explicitly delete chunk to free memory
         del chunk
         gc.collect()
     
     print(f"\nProcessed {rows_processed} total rows")
-    print(f"Found {rows_matching_years} rows matching target years {years_to_analyze}")
+    print(f"Found {rows_matching_periods} rows matching target periods {period_labels}")
     
     # Calculate averages and create final dataframes
     result = {}
-    for year in years_to_analyze:
+    for label in period_labels:
         rows = []
-        key_count = len(year_sums[year])
-        print(f"Creating dataframe for year {year} with {key_count} station/hour combinations")
+        key_count = len(period_sums[label])
+        print(f"Creating dataframe for period {label} with {key_count} station/hour combinations")
         
-        for key, total in year_sums[year].items():
-            count = year_counts[year][key]
+        for key, total in period_sums[label].items():
+            count = period_counts[label][key]
             avg = total / count if count > 0 else 0
-            _, station_name, hour = key  # Skip station_complex_id
+            station_id, station_name, hour = key
             rows.append({
+                'station_complex_id': station_id,
                 'station_complex': station_name,
                 'hour': int(hour),
                 'ridership': float(avg)
             })
         
         if rows:
-            result[year] = pd.DataFrame(rows)
+            result[label] = pd.DataFrame(rows)
             # Sort by station_complex and hour for better readability
-            result[year] = result[year].sort_values(by=['station_complex', 'hour'])
-            print(f"Created dataframe for year {year} with {len(rows)} rows")
+            result[label] = result[label].sort_values(by=['station_complex', 'hour'])
+            print(f"Created dataframe for period {label} with {len(rows)} rows")
         else:
-            print(f"Warning: No data found for year {year}")
-            result[year] = pd.DataFrame(columns=['station_complex', 'hour', 'ridership'])
+            print(f"Warning: No data found for period {label}")
+            result[label] = pd.DataFrame(columns=['station_complex_id', 'station_complex', 'hour', 'ridership'])
         
         # Clear dictionaries to free memory
-        year_sums[year].clear()
-        year_counts[year].clear()
+        period_sums[label].clear()
+        period_counts[label].clear()
     
     return result
 
 
-def save_results_to_excel(df_dict, prefix="avg_ridership"):
+def estimate_from_draft_sample(processed_dir, periods):
+    """
+    Estimate the average ridership per station and hour from the draft sample
+    
+    Args:
+        processed_dir (str): Directory with the draft sample and station catalog
+        periods (list): Periods from Periods.define_periods
+        
+    Returns:
+        tuple: (dict like process_data_in_chunks with draft period labels as
+        keys, dict of the same labels -> estimates with confidence intervals)
+    """
+    sample = load_draft_sample(processed_dir)
+    catalog = load_station_catalog(Path(processed_dir))
+    
+    result = {}
+    intervals = {}
+    for period, draft_period in zip(periods, draft_periods(periods)):
+        label = draft_period['label']
+        rows = draft_rows(sample, catalog, period)
+        print_draft_total(label, rows)
+        if rows.empty:
+            continue
+        means = estimate_means(rows, ['station_complex_id', 'station_complex', 'hour'])
+        result[label] = means.rename(columns={'estimate': 'ridership'})[['station_complex_id', 'station_complex', 'hour', 'ridership']]
+        intervals[label] = means
+    
+    return result, intervals
+
+
+def save_results_to_excel(df_dict, prefix="avg_ridership", heatmap_order=HEATMAP_ORDER, station_charts=STATION_CHART_SHEETS):
     """
     Save dataframes to Excel files with table formatting (Dark Teal, Table Style Medium 2)
     
     Args:
-        df_dict (dict): Dictionary with years as keys and dataframes as values
+        df_dict (dict): Dictionary with period labels as keys and dataframes as values
         prefix (str): Prefix for output filenames
+        heatmap_order (str): Station order of the heatmap sheet ('total' or 'cluster'), None for no heatmap
+        station_charts (bool): Add a sheet with the line chart of every station
         
     Returns:
         list: List of output filenames
@@ -159,25 +225,29 @@ def save_results_to_excel(df_dict, prefix="avg_ridership"):
     current_datetime = datetime.now().strftime("%Y_%m_%d_%I_%M_%S_%p")  # Using underscores between components
     
     filenames = []
-    years = list(df_dict.keys())
+    periods = list(df_dict.keys())
     
-    for year in years:
-        df = df_dict[year]
+    for period in periods:
+        # The id only keeps stations that share a name apart in the heatmap
+        df = df_dict[period].drop(columns='station_complex_id', errors='ignore')
         
         # Rename columns for better readability in the Excel table
         df = df.rename(columns={
             'station_complex': 'Station Name',
             'hour': 'Hour',
-            'ridership': 'Average Ridership'
+            'ridership': 'Average Ridership',
+            'p50': 'Median Ridership (P50)',
+            'p90': 'P90 Ridership',
+            'p99': 'P99 Ridership'
         })
         
         # Create Excel file path with local date and time included
-        filename = os.path.join(file_path_output, f"{prefix}_{year}Made_On_{date_time_str}.xlsx")
+        filename = os.path.join(file_path_output, f"{prefix}_{period}Made_On_{date_time_str}.xlsx")
         
         # Create Excel workbook
         wb = Workbook()
         ws = wb.active
-        ws.title = f"Ridership {year}"
+        ws.title = f"Ridership {period}"[:31]
         
         # Write headers
         headers = list(df.columns)
@@ -188,13 +258,15 @@ def save_results_to_excel(df_dict, prefix="avg_ridership"):
         for row_idx, row in enumerate(dataframe_to_rows(df, index=False, header=False), 2):
             for col_idx, value in enumerate(row, 1):
                 cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                # Format the "Average Ridership" column to display as number with 2 decimal places
-                if col_idx == 3:  # The "Average Ridership" column
+                # Format the "Average Ridership" and percentile columns to display as number with 2 decimal places
+                if col_idx >= 3:  # The "Average Ridership" column and any percentile columns
                     cell.number_format = '0.00'
         
         # Create a table
         table_ref = f"A1:{get_column_letter(len(headers))}{len(df) + 1}"
-        table = Table(displayName=f"RidershipTable{year}", ref=table_ref)
+        # Table names may only contain letters, digits and underscores
+        table_name = "".join(c if c.isalnum() else "_" for c in str(period))
+        table = Table(displayName=f"RidershipTable{table_name}", ref=table_ref)
         
         # Set table style to "Table Style Medium 2" (Dark Teal)
         style = TableStyleInfo(
@@ -224,6 +296,22 @@ def save_results_to_excel(df_dict, prefix="avg_ridership"):
             adjusted_width = (max_length + 2) * 1.2
             ws.column_dimensions[column_letter].width = adjusted_width
         
+        # Station x hour heatmap of the same averages on its own sheet
+        if heatmap_order and not df_dict[period].empty:
+            names, matrix = heatmap_matrix(df_dict[period])
+            ws_heatmap = wb.create_sheet(f"Heatmap {period}"[:31])
+            ws_heatmap.add_image(Image(heatmap_image(names, matrix, f"Average Riders per Station and Hour - {period}",
+                                                     heatmap_order, dpi=96)), "B2")
+        
+        # Line chart of every station, in name order, rendered as SVG and rasterized
+        if station_charts and not df_dict[period].empty:
+            names, matrix = heatmap_matrix(df_dict[period])
+            order = np.argsort(names, kind='stable')
+            charts = render_line_charts([f"Avg Ridership for {name} - {period}" for name in names[order]], matrix[order])
+            ws_charts = wb.create_sheet(f"Charts {period}"[:31])
+            for i, svg in enumerate(charts):
+                ws_charts.add_image(Image(svg_to_png(svg, scale=0.6)), f"B{2 + i * CHART_SHEET_ROW_STEP}")
+        
         # Save the workbook
         wb.save(filename)
         print(f"Saved Excel file with formatted table: {filename}")
@@ -231,13 +319,13 @@ def save_results_to_excel(df_dict, prefix="avg_ridership"):
         filenames.append(filename)
         
         # Delete dataframe after saving to free memory
-        del df_dict[year]
+        del df_dict[period]
         gc.collect()
         
     return filenames
 
 
-def main():
+def main(period_specs=PERIODS, draft=DRAFT_MODE):
     """
     Main function to execute the MTA ridership analysis pipeline
     """
@@ -245,18 +333,49 @@ def main():
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
     file_path = os.path.join(base_dir, "Data", "Raw", "MTA_Subway_Hourly_Ridership__2020-2024.csv")
     
-    # Check if file exists
-    if not os.path.exists(file_path):
-        print(f"Error: File not found at {file_path}")
-        return
+    # Years or date ranges to analyze
+    periods = define_periods(period_specs)
     
-    # Years to analyze
-    years_to_analyze = [2023, 2024]
+    station_charts = STATION_CHART_SHEETS
+    if station_charts and cairosvg is None:
+        print("cairosvg is not installed, saving the files without the station chart sheets")
+        station_charts = False
     
-    print(f"Looking for data from years: {years_to_analyze}")
+    print(f"Looking for data from periods: {[period['label'] for period in periods]}")
     
-    # Process data in chunks and calculate average ridership
-    avg_ridership = process_data_in_chunks(file_path, years_to_analyze)
+    if draft:
+        avg_ridership, intervals = estimate_from_draft_sample(os.path.join(base_dir, "Data", "processed"), periods)
+        if not avg_ridership:
+            print("🚨 No sampled rows in any period, nothing to report.")
+            return
+        saved_files = save_results_to_excel(avg_ridership, prefix="DRAFT_avg_ridership", station_charts=station_charts)
+        intervals_file = save_draft_intervals(intervals, os.path.join(base_dir, "Data", "reports"), "avg_ridership")
+        for filename in saved_files + [intervals_file]:
+            print(f"Draft average ridership saved to {filename}")
+        return
+    
+    # Use the hourly rollup built by IngestRawData.py when it exists,
+    # otherwise process data in chunks and calculate average ridership
+    rollup, catalog = load_processed_rollup(os.path.join(base_dir, "Data", "processed"))
+    if rollup is not None:
+        avg_ridership = hourly_average_by_station(rollup, catalog, periods)
+        
+        # Add P50/P90/P99 bands from the quantile sketches built during ingest.
+        # The sketches are kept per calendar year, so other date ranges get no bands.
+        try:
+            quantile_bank = load_quantile_bank(Path(base_dir) / "Data" / "processed")
+            for period in periods:
+                year = calendar_year(period)
+                if year is not None:
+                    avg_ridership[period['label']] = add_quantile_bands(avg_ridership[period['label']], quantile_bank, catalog, year)
+        except FileNotFoundError as e:
+            print(f"{e} Saving averages without percentile bands.")
+    else:
+        # Only the raw CSV fallback needs the file
+        if not os.path.exists(file_path):
+            print(f"Error: File not found at {file_path}")
+            return
+        avg_ridership = process_data_in_chunks(file_path, periods)
     
     if not avg_ridership:
         print("Error: No data processed, check previous messages for details")
@@ -264,7 +383,7 @@ def main():
     
     # Save results to Excel with table formatting
     print("Saving results to Excel with table formatting...")
-    saved_files = save_results_to_excel(avg_ridership)
+    saved_files = save_results_to_excel(avg_ridership, station_charts=station_charts)
     
     # Display the results
     for filename in saved_files:
@@ -3,20 +3,35 @@ import matplotlib.pyplot as plt
 from pptx import Presentation
 from pptx.util import Inches
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
 
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processing"))
+from HourlyRollup import load_processed_rollup, average_daily_ridership_by_day_of_week, DAYS_OF_WEEK
+from Periods import define_periods, periods_label, add_period_column
+from StationCatalog import load_station_catalog
+from ExcelTables import unique_sheet_name
+from DraftSample import load_draft_sample, draft_periods, draft_rows, estimate_totals, save_draft_intervals, print_draft_total
+
 # Add watermark text constant
 WATERMARK_TEXT = "Mantie Reid II"
 
-def process_year_data(chunks, year):
-    """Process data for a specific year"""
+# Years and/or (label, start date, end date) ranges to analyze, all computed in one pass
+PERIODS = [2023, 2024]
+
+# Estimate the averages from the draft sample built by IngestRawData.py instead:
+# seconds instead of a full scan, labelled as drafts, with 95% confidence intervals
+DRAFT_MODE = False
+
+def process_period_data(chunks, periods):
+    """Process data for every period in a single pass over the chunks"""
     daily_ridership = pd.DataFrame()
     
     for chunk in chunks:
-        # Filter data for the specified year and create a copy
-        mask = chunk["transit_timestamp"].dt.year == year
-        chunk_filtered = chunk[mask].copy()
+        # Tag rows with the period(s) they belong to; rows outside every period are dropped
+        chunk_filtered = add_period_column(chunk, periods)
         
         if not chunk_filtered.empty:
             # Add new columns to the copy
@@ -24,26 +39,60 @@ def process_year_data(chunks, year):
             chunk_filtered.loc[:, "day_of_week"] = chunk_filtered["transit_timestamp"].dt.day_name()
             
             # Sum ridership by date
-            daily_sum = chunk_filtered.groupby(["date", "day_of_week"])["ridership"].sum().reset_index()
+            daily_sum = chunk_filtered.groupby(["period", "date", "day_of_week"])["ridership"].sum().reset_index()
             daily_ridership = pd.concat([daily_ridership, daily_sum])
 
-    # Group by date and sum to get true daily totals
-    daily_ridership = daily_ridership.groupby(["date", "day_of_week"])["ridership"].sum().reset_index()
+    avg_ridership = {}
+    for period in periods:
+        label = period["label"]
+        if daily_ridership.empty:
+            period_daily = pd.DataFrame(columns=["date", "day_of_week", "ridership"])
+        else:
+            period_daily = daily_ridership[daily_ridership["period"] == label]
 
-    # Calculate the average ridership for each day of the week
-    avg_ridership = daily_ridership.groupby("day_of_week")["ridership"].mean().reindex([
-        "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"
-    ])
+        # Group by date and sum to get true daily totals
+        period_daily = period_daily.groupby(["date", "day_of_week"])["ridership"].sum().reset_index()
+
+        # Calculate the average ridership for each day of the week
+        avg_ridership[label] = period_daily.groupby("day_of_week")["ridership"].mean().reindex([
+            "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"
+        ])
     
     return avg_ridership
 
-def create_chart(avg_ridership, year, base_dir):
-    """Create and save a bar chart for the specified year"""
+def estimate_from_draft_sample(processed_dir, periods):
+    """Estimate the average daily ridership of every day of the week from the draft sample, with confidence intervals"""
+    sample = load_draft_sample(processed_dir)
+    catalog = load_station_catalog(Path(processed_dir))
+
+    avg_ridership = {}
+    intervals = {}
+    for period, draft_period in zip(periods, draft_periods(periods)):
+        label = draft_period["label"]
+        rows = draft_rows(sample, catalog, period)
+        print_draft_total(label, rows)
+        if rows.empty:
+            continue
+
+        # Estimated total of each day of the week divided by the number of those days
+        # in the period, counted from the calendar since the sample misses some dates
+        totals = estimate_totals(rows, ["day_of_week"]).set_index("day_of_week").reindex(DAYS_OF_WEEK)
+        start = max(period["start"], catalog["first_seen"].min().normalize())
+        end = min(period["end"], catalog["last_seen"].max().normalize() + pd.Timedelta(days=1))
+        days = pd.date_range(start, end, inclusive="left").day_name().value_counts().reindex(DAYS_OF_WEEK)
+        averages = totals.div(days, axis=0)
+        avg_ridership[label] = averages["estimate"].rename("ridership")
+        intervals[label] = averages.rename_axis("day_of_week").reset_index()
+
+    return avg_ridership, intervals
+
+def create_chart(avg_ridership, period, base_dir):
+    """Create and save a bar chart for the specified period"""
     fig, ax = plt.subplots(figsize=(12, 6))
     bars = ax.bar(avg_ridership.index, avg_ridership.values, color='#1f77b4', alpha=0.8)
     ax.set_xlabel("Day of the Week", fontsize=10, fontweight='bold')
     ax.set_ylabel("Average Ridership", fontsize=10, fontweight='bold')
-    ax.set_title(f"Average Daily Subway Ridership by Day of Week ({year})", 
+    ax.set_title(f"Average Daily Subway Ridership by Day of Week ({period})", 
               fontsize=12, fontweight='bold', pad=20)
     plt.xticks(rotation=45, ha="right")
     ax.grid(axis="y", linestyle="--", alpha=0.7)
@@ -66,27 +115,27 @@ def create_chart(avg_ridership, year, base_dir):
     plt.tight_layout()
 
     # Save the chart
-    chart_path = os.path.join(base_dir, "Data", "reports", f"ridership_chart_{year}.png")
+    chart_path = os.path.join(base_dir, "Data", "reports", f"ridership_chart_{str(period).replace(' ', '_')}.png")
     plt.savefig(chart_path, dpi=300, bbox_inches='tight')
     plt.close()
     
     return chart_path
 
-def save_to_excel(avg_ridership_2023, avg_ridership_2024, base_dir):
-    """Save both years' data to Excel with timestamp in filename"""
+def save_to_excel(avg_ridership_by_period, base_dir, prefix=""):
+    """Save every period's data to Excel with timestamp in filename"""
     # Get current date and time
     current_time = datetime.now()
     date_time_str = current_time.strftime("%B %d, %Y %I-%M %p")
     
     # Create base filename with timestamp
-    base_filename = f"MTA_Subway_Ridership_Weekday_Stats_average_{date_time_str}.xlsx"
+    base_filename = f"{prefix}MTA_Subway_Ridership_Weekday_Stats_average_{date_time_str}.xlsx"
     excel_dir = os.path.join(base_dir, "Data", "reports")
     excel_path = os.path.join(excel_dir, base_filename)
     
     # Handle duplicate files
     counter = 1
     while os.path.exists(excel_path):
-        base_filename = f"MTA_Subway_Ridership_Weekday_Stats_average_{date_time_str}_{counter}.xlsx"
+        base_filename = f"{prefix}MTA_Subway_Ridership_Weekday_Stats_average_{date_time_str}_{counter}.xlsx"
         excel_path = os.path.join(excel_dir, base_filename)
         counter += 1
     
@@ -94,49 +143,34 @@ def save_to_excel(avg_ridership_2023, avg_ridership_2024, base_dir):
         workbook = writer.book
         number_format = workbook.add_format({'num_format': '#,##0'})
 
-        # Save 2023 data
-        avg_ridership_df_2023 = avg_ridership_2023.reset_index()
-        avg_ridership_df_2023.columns = ["Day of the Week", "Average Ridership"]
-        avg_ridership_df_2023.to_excel(writer, index=False, sheet_name='2023 Average Ridership')
-        
-        # Format 2023 sheet
-        worksheet_2023 = writer.sheets['2023 Average Ridership']
-        worksheet_2023.set_column('B:B', 18, number_format)
-        worksheet_2023.set_column('A:A', 15)
-        worksheet_2023.add_table(0, 0, len(avg_ridership_df_2023), 1, {
-            'columns': [
-                {'header': 'Day of the Week'},
-                {'header': 'Average Ridership', 'format': number_format}
-            ],
-            'style': 'Table Style Medium 2'
-        })
-
-        # Save 2024 data
-        avg_ridership_df_2024 = avg_ridership_2024.reset_index()
-        avg_ridership_df_2024.columns = ["Day of the Week", "Average Ridership"]
-        avg_ridership_df_2024.to_excel(writer, index=False, sheet_name='2024 Average Ridership')
-        
-        # Format 2024 sheet
-        worksheet_2024 = writer.sheets['2024 Average Ridership']
-        worksheet_2024.set_column('B:B', 18, number_format)
-        worksheet_2024.set_column('A:A', 15)
-        worksheet_2024.add_table(0, 0, len(avg_ridership_df_2024), 1, {
-            'columns': [
-                {'header': 'Day of the Week'},
-                {'header': 'Average Ridership', 'format': number_format}
-            ],
-            'style': 'Table Style Medium 2'
-        })
+        for period, avg_ridership in avg_ridership_by_period.items():
+            # Save the period's data
+            sheet_name = unique_sheet_name(writer, f"{period} Average Ridership")
+            avg_ridership_df = avg_ridership.reset_index()
+            avg_ridership_df.columns = ["Day of the Week", "Average Ridership"]
+            avg_ridership_df.to_excel(writer, index=False, sheet_name=sheet_name)
+            
+            # Format the sheet
+            worksheet = writer.sheets[sheet_name]
+            worksheet.set_column('B:B', 18, number_format)
+            worksheet.set_column('A:A', 15)
+            worksheet.add_table(0, 0, len(avg_ridership_df), 1, {
+                'columns': [
+                    {'header': 'Day of the Week'},
+                    {'header': 'Average Ridership', 'format': number_format}
+                ],
+                'style': 'Table Style Medium 2'
+            })
     
     return excel_path
 
-def create_powerpoint(chart_path_2023, chart_path_2024, base_dir):
-    """Create PowerPoint presentation with both years' charts"""
+def create_powerpoint(chart_paths, base_dir, file_label):
+    """Create PowerPoint presentation with one chart slide per period"""
     current_time = datetime.now()
     date_time_str = current_time.strftime("%B %d, %Y %I-%M %p")
 
     # Create PowerPoint presentation with date in filename
-    base_filename = f"Average Daily Subway Ridership by Day of Week_For_2023_and_2024{date_time_str}.pptx"
+    base_filename = f"Average Daily Subway Ridership by Day of Week_For_{file_label}{date_time_str}.pptx"
     ppt_dir = os.path.join(base_dir, "Data", "reports")
     os.makedirs(ppt_dir, exist_ok=True)
     ppt_path = os.path.join(ppt_dir, base_filename)
@@ -151,30 +185,24 @@ def create_powerpoint(chart_path_2023, chart_path_2024, base_dir):
     # Create the presentation
     prs = Presentation()
     
-    # Add 2023 slide
+    # Add one slide per period
     slide_layout = prs.slide_layouts[5]
-    slide_2023 = prs.slides.add_slide(slide_layout)
-    title_2023 = slide_2023.shapes.title
-    title_2023.text = "Average Daily Subway Ridership by Day of Week (2023)"
-    slide_2023.shapes.add_picture(chart_path_2023, Inches(1), Inches(2.5), width=Inches(8))
-
-    # Add 2024 slide
-    slide_2024 = prs.slides.add_slide(slide_layout)
-    title_2024 = slide_2024.shapes.title
-    title_2024.text = "Average Daily Subway Ridership by Day of Week (2024)"
-    slide_2024.shapes.add_picture(chart_path_2024, Inches(1), Inches(2.5), width=Inches(8))
+    for period, chart_path in chart_paths.items():
+        slide = prs.slides.add_slide(slide_layout)
+        title = slide.shapes.title
+        title.text = f"Average Daily Subway Ridership by Day of Week ({period})"
+        slide.shapes.add_picture(chart_path, Inches(1), Inches(2.5), width=Inches(8))
 
     # Save the PowerPoint file
     prs.save(ppt_path)
     return ppt_path
 
-def main():
+def main(period_specs=PERIODS, draft=DRAFT_MODE):
+    periods = define_periods(period_specs)
+
     # Set up paths
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
     file_path = os.path.join(base_dir, "Data", "Raw", "MTA_Subway_Hourly_Ridership__2020-2024.csv")
-    
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"CSV file not found at path: {file_path}")
 
     # Create output directories
     for dir_path in [
@@ -183,34 +211,49 @@ def main():
     ]:
         os.makedirs(dir_path, exist_ok=True)
 
-    # Load and process data
-    date_format = '%m/%d/%Y %I:%M:%S %p'
-    chunks = pd.read_csv(file_path, 
-                        chunksize=100000,
-                        low_memory=False,
-                        parse_dates=['transit_timestamp'],
-                        date_format=date_format)
-    
-    # Process both years
-    avg_ridership_2023 = process_year_data(chunks, 2023)
-    
-    # Reset file pointer for 2024
-    chunks = pd.read_csv(file_path, 
-                        chunksize=100000,
-                        low_memory=False,
-                        parse_dates=['transit_timestamp'],
-                        date_format=date_format)
-    avg_ridership_2024 = process_year_data(chunks, 2024)
+    if draft:
+        avg_ridership, intervals = estimate_from_draft_sample(os.path.join(base_dir, "Data", "processed"), periods)
+        if not avg_ridership:
+            print("🚨 No sampled rows in any period, nothing to report.")
+            return
+        chart_paths = {period: create_chart(ridership, period, base_dir) for period, ridership in avg_ridership.items()}
+        excel_path = save_to_excel(avg_ridership, base_dir, prefix="DRAFT_")
+        ppt_path = create_powerpoint(chart_paths, base_dir, periods_label(draft_periods(periods)))
+        intervals_path = save_draft_intervals(intervals, os.path.join(base_dir, "Data", "reports"), "Weekday_Stats_average")
+        print("✅ Draft Excel file saved at:", excel_path)
+        print("✅ Draft PowerPoint file saved at:", ppt_path)
+        print("✅ Draft confidence intervals saved at:", intervals_path)
+        return
+
+    # Use the hourly rollup built by IngestRawData.py when it exists
+    rollup, _ = load_processed_rollup(os.path.join(base_dir, "Data", "processed"))
+
+    if rollup is not None:
+        avg_ridership = {period["label"]: average_daily_ridership_by_day_of_week(rollup, period) for period in periods}
+    else:
+        # Only the raw CSV fallback needs the file
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"CSV file not found at path: {file_path}")
+
+        # Load and process data
+        date_format = '%m/%d/%Y %I:%M:%S %p'
+        chunks = pd.read_csv(file_path, 
+                            chunksize=100000,
+                            low_memory=False,
+                            parse_dates=['transit_timestamp'],
+                            date_format=date_format)
+        
+        # Process every period in one pass
+        avg_ridership = process_period_data(chunks, periods)
 
     # Create charts
-    chart_path_2023 = create_chart(avg_ridership_2023, 2023, base_dir)
-    chart_path_2024 = create_chart(avg_ridership_2024, 2024, base_dir)
+    chart_paths = {period: create_chart(ridership, period, base_dir) for period, ridership in avg_ridership.items()}
 
     # Save to Excel
-    excel_path = save_to_excel(avg_ridership_2023, avg_ridership_2024, base_dir)
+    excel_path = save_to_excel(avg_ridership, base_dir)
 
     # Create PowerPoint
-    ppt_path = create_powerpoint(chart_path_2023, chart_path_2024, base_dir)
+    ppt_path = create_powerpoint(chart_paths, base_dir, periods_label(periods))
 
     # Print output paths
     print("✅ Excel file saved at:", excel_path)
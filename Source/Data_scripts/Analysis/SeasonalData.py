@@ -3,10 +3,43 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 import io
+import sys
+from pathlib import Path
+
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Processing"))
+from HourlyRollup import load_processed_rollup, seasonal_ridership_by_station
+from Periods import define_periods, add_period_column, calendar_year
+from StationCatalog import load_station_catalog
+from ExcelTables import unique_sheet_name
+from TopKStations import load_top_k_tracker, top_stations as top_k_stations
+from DraftSample import load_draft_sample, draft_periods, draft_rows, estimate_totals, save_draft_intervals, print_draft_total
 
 # Add watermark text constant
 WATERMARK_TEXT = "Mantie Reid II"
 
+# Years and/or (label, start date, end date) ranges to analyze, all computed in one pass
+PERIODS = [2023, 2024]
+
+# Pick the top stations of whole calendar years, and their seasonal ridership,
+# from the top-K summaries built by IngestRawData.py instead of ranking every
+# station. Other periods keep the exact ranking.
+USE_TOP_K_SUMMARIES = False
+
+# Estimate the totals from the draft sample built by IngestRawData.py instead:
+# seconds instead of a full scan, labelled as drafts, with 95% confidence intervals
+DRAFT_MODE = False
+
+# Bar colors for each period in the overall chart
+PERIOD_COLORS = ['#8884d8', '#82ca9d', '#ffc658', '#ff8042', '#a4de6c', '#d0ed57']
+
+# Winter/Spring/Summer/Fall colors for each period in the top stations chart
+PERIOD_SEASON_COLORS = [
+    ['#94a3b8', '#86efac', '#fde047', '#fb923c'],  # lighter colors for the first period
+    ['#475569', '#16a34a', '#ca8a04', '#ea580c'],  # darker colors for the second period
+    ['#1e293b', '#14532d', '#713f12', '#7c2d12']   # darkest colors for the third period
+]
+
 def get_season(month):
     """Returns the season based on the month number."""
     if month in [12, 1, 2]:
@@ -18,9 +51,9 @@ def get_season(month):
     elif month in [9, 10, 11]:
         return 'Fall'
 
-def calculate_seasonal_ridership_by_station(file_path, year, chunk_size=500000):
-    """Processes the CSV file in chunks and calculates total ridership per season for each station in a given year."""
-    seasonal_ridership = {}
+def calculate_seasonal_ridership_by_station(file_path, periods, chunk_size=500000):
+    """Processes the CSV file in chunks once and calculates total ridership per season for each station in every period."""
+    seasonal_ridership = {period['label']: {} for period in periods}
     
     # Read CSV in chunks to optimize performance
     for chunk in pd.read_csv(file_path, 
@@ -28,32 +61,54 @@ def calculate_seasonal_ridership_by_station(file_path, year, chunk_size=500000):
                          parse_dates=['transit_timestamp'],
                          date_format='%m/%d/%Y %I:%M:%S %p',
                          chunksize=chunk_size):
-        # Extract year and month
-        chunk['year'] = chunk['transit_timestamp'].dt.year
-        chunk['month'] = chunk['transit_timestamp'].dt.month
+        # Keep only rows inside the periods, tagged with the period they belong to
+        chunk = add_period_column(chunk, periods)
         
-        # Filter only for the specified year
-        chunk = chunk[chunk['year'] == year]
+        # Extract month
+        chunk['month'] = chunk['transit_timestamp'].dt.month
         
         # Map each month to a season
         chunk['season'] = chunk['month'].apply(get_season)
         
         # Aggregate ridership per season per station
-        season_totals = chunk.groupby(['station_complex', 'season'])['ridership'].sum().reset_index()
+        season_totals = chunk.groupby(['period', 'station_complex', 'season'])['ridership'].sum().reset_index()
         
         # Update main dictionary
         for _, row in season_totals.iterrows():
+            period_ridership = seasonal_ridership[row['period']]
             station = row['station_complex']
             season = row['season']
             ridership = row['ridership']
             
-            if station not in seasonal_ridership:
-                seasonal_ridership[station] = {'Winter': 0, 'Spring': 0, 'Summer': 0, 'Fall': 0}
+            if station not in period_ridership:
+                period_ridership[station] = {'Winter': 0, 'Spring': 0, 'Summer': 0, 'Fall': 0}
             
-            seasonal_ridership[station][season] += ridership
+            period_ridership[station][season] += ridership
     
     return seasonal_ridership
 
+def estimate_from_draft_sample(processed_dir, periods):
+    """Estimates the seasonal ridership of every station from the draft sample, with confidence intervals."""
+    sample = load_draft_sample(processed_dir)
+    catalog = load_station_catalog(Path(processed_dir))
+    
+    seasonal_ridership = {}
+    intervals = {}
+    for period, draft_period in zip(periods, draft_periods(periods)):
+        label = draft_period['label']
+        rows = draft_rows(sample, catalog, period)
+        print_draft_total(label, rows)
+        if rows.empty:
+            continue
+        
+        totals = estimate_totals(rows, ['station_complex', 'season'])
+        seasons = totals.pivot(index='station_complex', columns='season', values='estimate')
+        seasons = seasons.reindex(columns=['Winter', 'Spring', 'Summer', 'Fall']).fillna(0)
+        seasonal_ridership[label] = seasons.to_dict(orient='index')
+        intervals[label] = totals
+    
+    return seasonal_ridership, intervals
+
 def get_top_stations_data(seasonal_ridership, top_n=5):
     """Convert seasonal ridership dictionary to DataFrame and get top N stations."""
     df = pd.DataFrame.from_dict(seasonal_ridership, orient='index')
@@ -61,15 +116,43 @@ def get_top_stations_data(seasonal_ridership, top_n=5):
     top_stations = total_ridership.nlargest(top_n).index
     return df.loc[top_stations]
 
-def create_seasonal_comparison_chart(results_2023, results_2024):
-    """Creates a vertical bar chart comparing seasonal ridership between 2023 and 2024 without y-axis numbers"""
-    # Convert the dictionaries to DataFrames and get the total ridership for each season
-    df_2023 = pd.DataFrame.from_dict(results_2023, orient='index').sum()
-    df_2024 = pd.DataFrame.from_dict(results_2024, orient='index').sum()
-    
+def top_stations_from_summaries(processed_dir, periods, top_n=5):
+    """
+    Same tables as get_top_stations_data for the whole-year periods, from the top-K summaries
+
+    The stations are the top_n of the year's summary and each season's
+    ridership is that season's estimate. A station missing from a season's
+    summary is below its smallest counter there and is shown as 0.
+    """
+    tracker = load_top_k_tracker(Path(processed_dir))
+    catalog = load_station_catalog(Path(processed_dir))
+    
+    top_by_period = {}
+    for period in periods:
+        year = calendar_year(period)
+        if year is None:
+            print(f"📝 {period['label']} is not a calendar year, ranking its stations exactly")
+            continue
+        stations = top_k_stations(tracker, catalog, 'year', year, k=top_n)['station_complex']
+        seasons = {}
+        for season in ['Winter', 'Spring', 'Summer', 'Fall']:
+            estimates = top_k_stations(tracker, catalog, 'season', year, season, k=tracker['capacity'])
+            seasons[season] = estimates.set_index('station_complex')['estimated_ridership'].reindex(stations).fillna(0)
+        top_by_period[period['label']] = pd.DataFrame(seasons, index=stations).rename_axis(None)
+    return top_by_period
+
+def create_seasonal_comparison_chart(results_by_period):
+    """Creates a vertical bar chart comparing seasonal ridership between the periods without y-axis numbers"""
     # Set up the data for plotting
     seasons = ['Winter', 'Spring', 'Summer', 'Fall']
-    width = 0.35  # width of the bars
+    periods = list(results_by_period)
+    width = 0.7 / len(periods)  # width of the bars
+    
+    # Convert the dictionaries to DataFrames and get the total ridership for each season
+    season_totals = {
+        period: pd.DataFrame.from_dict(results, orient='index').reindex(columns=seasons).sum()
+        for period, results in results_by_period.items()
+    }
     
     # Create positions for the bars
     x = np.arange(len(seasons))
@@ -78,11 +161,14 @@ def create_seasonal_comparison_chart(results_2023, results_2024):
     fig, ax = plt.subplots(figsize=(12, 6))
     
     # Create the bars
-    rects1 = ax.bar(x - width/2, df_2023, width, label='2023', color='#8884d8')
-    rects2 = ax.bar(x + width/2, df_2024, width, label='2024', color='#82ca9d')
+    all_rects = []
+    for i, period in enumerate(periods):
+        offset = (i - (len(periods) - 1) / 2) * width
+        all_rects.append(ax.bar(x + offset, season_totals[period], width, label=period,
+                                color=PERIOD_COLORS[i % len(PERIOD_COLORS)]))
     
     # Customize the plot
-    ax.set_title('Seasonal Ridership Comparison (2023 vs 2024)', pad=20)
+    ax.set_title(f"Seasonal Ridership Comparison ({' vs '.join(periods)})", pad=20)
     ax.set_xlabel('Season')
     ax.set_ylabel('Total Ridership')
     ax.set_xticks(x)
@@ -105,8 +191,8 @@ def create_seasonal_comparison_chart(results_2023, results_2024):
                        textcoords="offset points",
                        ha='center', va='bottom', rotation=0)
     
-    autolabel(rects1)
-    autolabel(rects2)
+    for rects in all_rects:
+        autolabel(rects)
     
     # Add watermark with your name - positioned in the bottom right
     #plt.figtext(0.50, 0.10, WATERMARK_TEXT, ha='left', color='gray', alpha=0.7, fontsize=10)
@@ -119,44 +205,41 @@ def create_seasonal_comparison_chart(results_2023, results_2024):
     
     return fig
 
-def create_top_stations_comparison_chart(data_2023, data_2024):
+def create_top_stations_comparison_chart(data_by_period):
     """Create horizontal bar chart comparing seasonal ridership for top stations."""
-    # Set up the plot with increased width and height
-    fig, ax = plt.subplots(figsize=(18, 20))  # Increased width from 15 to 18
+    periods = list(data_by_period)
+    scale = max(1, len(periods) / 2)
     
-    # Define colors for each year and season
-    colors_2023 = ['#94a3b8', '#86efac', '#fde047', '#fb923c']  # lighter colors for 2023
-    colors_2024 = ['#475569', '#16a34a', '#ca8a04', '#ea580c']  # darker colors for 2024
+    # Set up the plot with increased width and height
+    fig, ax = plt.subplots(figsize=(18, 20 * scale))  # Increased width from 15 to 18
     
     # Set up positions for the bars with much more spacing
-    stations = data_2023.index
+    # The stations are the first period's top stations; every period shows its own ridership for them
+    stations = data_by_period[periods[0]].index
+    data_by_period = {period: data.reindex(stations).fillna(0) for period, data in data_by_period.items()}
     seasons = ['Winter', 'Spring', 'Summer', 'Fall']
-    y_pos = np.arange(len(stations)) * 8
+    y_pos = np.arange(len(stations)) * 8 * scale
     bar_height = 0.2
+    period_step = bar_height * 3
+    season_step = period_step * len(periods) - bar_height
+    
+    # Calculate offset based on maximum value
+    offset = max(data.max().max() for data in data_by_period.values()) * 0.01
     
     # Plot bars for each season with much more spacing
-    for i, (season, color_2023, color_2024) in enumerate(zip(seasons, colors_2023, colors_2024)):
-        pos_2023 = y_pos - bar_height * 6 + (i * bar_height * 5)
-        pos_2024 = y_pos - bar_height * 3 + (i * bar_height * 5)
-        
-        # 2023 bars
-        bars_2023 = ax.barh(pos_2023, data_2023[season], height=bar_height, 
-                           label=f'{season} 2023', color=color_2023)
-        
-        # 2024 bars
-        bars_2024 = ax.barh(pos_2024, data_2024[season], height=bar_height,
-                           label=f'{season} 2024', color=color_2024)
-        
-        # Add value labels only at the end of bars
-        for j, (value_2023, value_2024) in enumerate(zip(data_2023[season], data_2024[season])):
-            # Calculate offset based on maximum value
-            offset = max(data_2023.max().max(), data_2024.max().max()) * 0.01
+    for i, season in enumerate(seasons):
+        for j, period in enumerate(periods):
+            data = data_by_period[period]
+            pos = y_pos - bar_height * 6 + (i * season_step) + (j * period_step)
+            color = PERIOD_SEASON_COLORS[j % len(PERIOD_SEASON_COLORS)][i]
+            
+            ax.barh(pos, data[season], height=bar_height,
+                    label=f'{season} {period}', color=color)
             
             # Only add labels at the end of bars
-            ax.text(value_2023 + offset, pos_2023[j], f'{value_2023:,.0f}',
-                   va='center', ha='left', fontsize=10)
-            ax.text(value_2024 + offset, pos_2024[j], f'{value_2024:,.0f}',
-                   va='center', ha='left', fontsize=10)
+            for k, value in enumerate(data[season]):
+                ax.text(value + offset, pos[k], f'{value:,.0f}',
+                       va='center', ha='left', fontsize=10)
 
     # Customize the plot
     ax.set_yticks(y_pos)
@@ -167,7 +250,7 @@ def create_top_stations_comparison_chart(data_2023, data_2024):
     ax.set_xticks([])
     
     # Add title
-    plt.title('Top 5 Stations Seasonal Ridership Comparison (2023-2024)', pad=20, fontsize=14)
+    plt.title(f"Top 5 Stations Seasonal Ridership Comparison ({'-'.join(periods)})", pad=20, fontsize=14)
     
     # Remove x-axis label since we removed the ticks
     ax.set_xlabel('')
@@ -191,26 +274,14 @@ def create_top_stations_comparison_chart(data_2023, data_2024):
     
     return fig
 
-def save_results_to_excel(results_2023, results_2024, output_path):
-    """Saves the seasonal ridership results and charts to an Excel file with formatted tables."""
+def save_results_to_excel(results_by_period, output_path, top_stations_by_period=None):
+    """
+    Saves the seasonal ridership results and charts to an Excel file with formatted tables
+
+    top_stations_by_period holds the top station tables already picked for
+    some periods, e.g. by top_stations_from_summaries; the others are ranked here.
+    """
     with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-        # Save 2023 data
-        df_results_2023 = pd.DataFrame.from_dict(results_2023, orient='index').reset_index()
-        df_results_2023.columns = ['Station', 'Winter', 'Spring', 'Summer', 'Fall']
-        df_results_2023.to_excel(writer, sheet_name='Ridership_2023', index=False)
-        
-        # Save 2024 data
-        df_results_2024 = pd.DataFrame.from_dict(results_2024, orient='index').reset_index()
-        df_results_2024.columns = ['Station', 'Winter', 'Spring', 'Summer', 'Fall']
-        df_results_2024.to_excel(writer, sheet_name='Ridership_2024', index=False)
-        
-        # Save comparison data
-        df_comparison = pd.DataFrame({
-            '2023': df_results_2023.sum(numeric_only=True),
-            '2024': df_results_2024.sum(numeric_only=True)
-        })
-        df_comparison.to_excel(writer, sheet_name='Comparison', index=True)
-        
         # Get workbook and add table formatting
         workbook = writer.book
         
@@ -231,35 +302,34 @@ def save_results_to_excel(results_2023, results_2024, output_path):
             ]
         }
         
-        # Format 2023 sheet
-        worksheet_2023 = writer.sheets['Ridership_2023']
-        worksheet_2023.add_table(
-            0, 0, 
-            len(df_results_2023), 
-            len(df_results_2023.columns) - 1, 
-            table_style
-        )
-        
-        # Format number columns in 2023 sheet with width
-        for col in range(1, 5):  # Columns B through E
-            worksheet_2023.set_column(col, col, 15, number_format)  # Set width to 15 characters
-        # Set station column width
-        worksheet_2023.set_column(0, 0, 30)  # Set width for station names
-        
-        # Format 2024 sheet
-        worksheet_2024 = writer.sheets['Ridership_2024']
-        worksheet_2024.add_table(
-            0, 0,
-            len(df_results_2024),
-            len(df_results_2024.columns) - 1,
-            table_style
-        )
+        # Save each period's data
+        season_totals = {}
+        for period, results in results_by_period.items():
+            df_results = pd.DataFrame.from_dict(results, orient='index')
+            df_results = df_results.reindex(columns=['Winter', 'Spring', 'Summer', 'Fall']).reset_index()
+            df_results.columns = ['Station', 'Winter', 'Spring', 'Summer', 'Fall']
+            sheet_name = unique_sheet_name(writer, f'Ridership_{period}')
+            df_results.to_excel(writer, sheet_name=sheet_name, index=False)
+            season_totals[period] = df_results.sum(numeric_only=True)
+            
+            # Format the period's sheet
+            worksheet_period = writer.sheets[sheet_name]
+            worksheet_period.add_table(
+                0, 0, 
+                len(df_results), 
+                len(df_results.columns) - 1, 
+                table_style
+            )
+            
+            # Format number columns with width
+            for col in range(1, 5):  # Columns B through E
+                worksheet_period.set_column(col, col, 15, number_format)  # Set width to 15 characters
+            # Set station column width
+            worksheet_period.set_column(0, 0, 30)  # Set width for station names
         
-        # Format number columns in 2024 sheet with width
-        for col in range(1, 5):  # Columns B through E
-            worksheet_2024.set_column(col, col, 15, number_format)  # Set width to 15 characters
-        # Set station column width
-        worksheet_2024.set_column(0, 0, 30)  # Set width for station names
+        # Save comparison data
+        df_comparison = pd.DataFrame(season_totals)
+        df_comparison.to_excel(writer, sheet_name='Comparison', index=True)
         
         # Format comparison sheet
         worksheet_comp = writer.sheets['Comparison']
@@ -267,31 +337,30 @@ def save_results_to_excel(results_2023, results_2024, output_path):
             'style': 'Table Style Medium 9',
             'first_column': True,
             'banded_rows': True,
-            'columns': [
-                {'header': 'Season'},
-                {'header': '2023', 'format': number_format},
-                {'header': '2024', 'format': number_format}
+            'columns': [{'header': 'Season'}] + [
+                {'header': period, 'format': number_format} for period in results_by_period
             ]
         }
         worksheet_comp.add_table(
             0, 0,
             len(df_comparison),
-            2,
+            len(results_by_period),
             comp_table_style
         )
         
         # Format number columns in comparison sheet with width
         worksheet_comp.set_column(0, 0, 20)  # Width for Season column
-        worksheet_comp.set_column(1, 2, 15, number_format)  # Width for numeric columns
+        worksheet_comp.set_column(1, len(results_by_period), 15, number_format)  # Width for numeric columns
         
         # Get top 5 stations data and create charts
-        top_stations_2023 = get_top_stations_data(results_2023)
-        top_stations_2024 = get_top_stations_data(results_2024)
+        top_stations_by_period = top_stations_by_period or {}
+        top_stations = {period: top_stations_by_period[period] if period in top_stations_by_period else get_top_stations_data(results)
+                        for period, results in results_by_period.items()}
         
         # Create and save the overall comparison chart
         worksheet = workbook.add_worksheet('Overall_Chart')
         
-        fig_overall = create_seasonal_comparison_chart(results_2023, results_2024)
+        fig_overall = create_seasonal_comparison_chart(results_by_period)
         imgdata_overall = io.BytesIO()
         fig_overall.savefig(imgdata_overall, format='png', dpi=300, bbox_inches='tight')
         plt.close(fig_overall)
@@ -301,7 +370,7 @@ def save_results_to_excel(results_2023, results_2024, output_path):
         # Create and save the top stations chart
         worksheet_top = workbook.add_worksheet('Top_Stations_Chart')
         
-        fig_top = create_top_stations_comparison_chart(top_stations_2023, top_stations_2024)
+        fig_top = create_top_stations_comparison_chart(top_stations)
         imgdata_top = io.BytesIO()
         fig_top.savefig(imgdata_top, format='png', dpi=300, bbox_inches='tight')
         plt.close(fig_top)
@@ -328,7 +397,7 @@ def get_unique_filename(base_path):
     
     return new_path
 
-def main():
+def main(period_specs=PERIODS, draft=DRAFT_MODE, top_k=USE_TOP_K_SUMMARIES):
     """Main function to execute seasonal ridership calculations and create visualizations."""
     from datetime import datetime
     
@@ -341,16 +410,40 @@ def main():
     output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "Data", "reports")
     
     # Create filename with date and time
-    base_filename = f"Seasonal_Ridership_Data_by_Station_{date_time_str}.xlsx"
+    base_filename = f"{'DRAFT_' if draft else ''}Seasonal_Ridership_Data_by_Station_{date_time_str}.xlsx"
     output_path = os.path.join(output_dir, base_filename)
     
     # Get unique filename if file already exists
     output_path = get_unique_filename(output_path)
     
-    results_2023 = calculate_seasonal_ridership_by_station(file_path, 2023)
-    results_2024 = calculate_seasonal_ridership_by_station(file_path, 2024)
-    
-    save_results_to_excel(results_2023, results_2024, output_path)
+    processed_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "Data", "processed")
+    periods = define_periods(period_specs)
+    if draft:
+        results_by_period, intervals = estimate_from_draft_sample(processed_dir, periods)
+        if not results_by_period:
+            print("🚨 No sampled rows in any period, nothing to report.")
+            return
+        save_results_to_excel(results_by_period, output_path)
+        print("Draft results and charts saved to:", output_path)
+        print("Draft confidence intervals saved to:", save_draft_intervals(intervals, output_dir, "Seasonal_Ridership"))
+        return
+    
+    # Use the hourly rollup built by IngestRawData.py when it exists
+    rollup, catalog = load_processed_rollup(processed_dir)
+    
+    if rollup is not None:
+        results_by_period = {period['label']: seasonal_ridership_by_station(rollup, catalog, period) for period in periods}
+    else:
+        results_by_period = calculate_seasonal_ridership_by_station(file_path, periods)
+    
+    top_stations_by_period = None
+    if top_k:
+        try:
+            top_stations_by_period = top_stations_from_summaries(processed_dir, periods)
+        except FileNotFoundError as e:
+            print(f"{e} Ranking the stations exactly.")
+    
+    save_results_to_excel(results_by_period, output_path, top_stations_by_period)
     
     print("Results and charts saved to:", output_path)
 
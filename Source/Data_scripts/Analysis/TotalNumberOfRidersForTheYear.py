@@ -2,11 +2,41 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 import matplotlib.ticker as ticker
+import numpy as np
+import sys
 from datetime import datetime
 
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(str(Path(__file__).resolve().parents[1] / "Processing"))
+from Periods import define_periods, periods_label, add_period_column, calendar_year
+from HourlyRollup import load_processed_rollup, station_totals_by_period
+from Hierarchy import station_hierarchy, rollup_hierarchy, hierarchy_shares
+from StationCatalog import load_station_catalog
+from ExcelTables import unique_sheet_name
+from TopKStations import load_top_k_tracker, top_stations
+from DraftSample import load_draft_sample, draft_periods, draft_rows, estimate_totals, save_draft_intervals, print_draft_total
+
 # Add watermark text constant
 WATERMARK_TEXT = "Mantie Reid II"
 
+# Years and/or (label, start date, end date) ranges to analyze, all computed in one pass
+PERIODS = [2023, 2024]
+
+# Estimate the totals from the draft sample built by IngestRawData.py instead:
+# seconds instead of a full scan, labelled as drafts, with 95% confidence intervals
+DRAFT_MODE = False
+
+# Take the Top 15 tables of whole calendar years from the top-K summaries built
+# by IngestRawData.py, with the error bound of every estimate, instead of
+# ranking the exact station totals. Other periods keep the exact ranking.
+USE_TOP_K_SUMMARIES = False
+
+# Stations listed in the Top tables of every period
+TOP_STATIONS = 15
+
+# Bar colors used for the periods in the Top 10 chart
+PERIOD_COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b"]
+
 def get_unique_filename(base_path):
     """Generate a unique filename by adding a number if the file exists."""
     directory = base_path.parent
@@ -21,7 +51,7 @@ def get_unique_filename(base_path):
     
     return new_path
 
-def define_paths():
+def define_paths(periods):
     # Get current date and time
     current_time = datetime.now()
     date_time_str = current_time.strftime("%B %d, %Y %I-%M %p")
@@ -33,26 +63,22 @@ def define_paths():
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Create filename with date and time
-    base_filename = f"MTA_Station_Ridership_Yearly_Analysis_For_2023_and_2024{date_time_str}.xlsx"
+    base_filename = f"MTA_Station_Ridership_Yearly_Analysis_For_{periods_label(periods)}{date_time_str}.xlsx"
     output_file = output_dir / base_filename
     
     # Get unique filename if file already exists
     output_file = get_unique_filename(output_file)
 
-    if not file_path.exists():
-        raise FileNotFoundError(f"🚨 File not found: {file_path}")
-
     return file_path, output_file, output_dir
 
-def load_data(file_path, chunksize=100000):
+def load_data(file_path, periods, chunksize=100000):
     date_column = "transit_timestamp"
     ridership_column = "ridership"
     station_column = "station_complex"
+    borough_column = "borough"
     date_format = '%m/%d/%Y %I:%M:%S %p'
 
-    total_ridership_per_year = {}
-    stations_2023 = {}
-    stations_2024 = {}
+    partial_totals = []
 
     for chunk in pd.read_csv(
         file_path, 
@@ -61,43 +87,95 @@ def load_data(file_path, chunksize=100000):
         date_format=date_format,
         low_memory=False
     ):
-        chunk["year"] = chunk[date_column].dt.year
-        yearly_ridership = chunk.groupby("year")[ridership_column].sum()
-        for year, ridership in yearly_ridership.items():
-            total_ridership_per_year[year] = total_ridership_per_year.get(year, 0) + ridership
-
-        stations_2023_chunk = chunk[chunk["year"] == 2023].groupby(station_column)[ridership_column].sum()
-        for station, ridership in stations_2023_chunk.items():
-            stations_2023[station] = stations_2023.get(station, 0) + ridership
-
-        stations_2024_chunk = chunk[chunk["year"] == 2024].groupby(station_column)[ridership_column].sum()
-        for station, ridership in stations_2024_chunk.items():
-            stations_2024[station] = stations_2024.get(station, 0) + ridership
-
-    return total_ridership_per_year, stations_2023, stations_2024
-
-def process_data(total_ridership_per_year, stations_2023, stations_2024):
-    official_ridership_2023 = total_ridership_per_year.get(2023, 0)
-    official_ridership_2024 = total_ridership_per_year.get(2024, 0)
-
-    print(f"✅ Total Subway Ridership in 2023: {official_ridership_2023:,}")
-    print(f"✅ Total Subway Ridership in 2024: {official_ridership_2024:,}")
-
-    stations_2023 = pd.DataFrame(list(stations_2023.items()), columns=["station_complex", "ridership"])
-    stations_2024 = pd.DataFrame(list(stations_2024.items()), columns=["station_complex", "ridership"])
-
-    stations_2023["percentage"] = (stations_2023["ridership"] / official_ridership_2023) if official_ridership_2023 > 0 else 0
-    stations_2024["percentage"] = (stations_2024["ridership"] / official_ridership_2024) if official_ridership_2024 > 0 else 0
-
-    # Keep ridership as numeric values
-    top5_2023 = stations_2023.sort_values(by="ridership", ascending=False).head(15)
-    top5_2024 = stations_2024.sort_values(by="ridership", ascending=False).head(15)
-    top10_2023 = stations_2023.sort_values(by="ridership", ascending=False).head(10)
-    top10_2024 = stations_2024.sort_values(by="ridership", ascending=False).head(10)
-
-    return stations_2023, stations_2024, top5_2023, top5_2024, top10_2023, top10_2024
-
-def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_2024, top10_2023, top10_2024, output_dir, file_path, ridership_column, chunksize=100000, date_column="transit_timestamp", date_format='%m/%d/%Y %I:%M:%S %p'):
+        # Every period is filled from the same chunk, so the file is only read once
+        chunk = add_period_column(chunk, periods, date_column)
+        chunk[borough_column] = chunk[borough_column].fillna("Unknown")
+        partial_totals.append(chunk.groupby([station_column, borough_column, "period"])[ridership_column].sum())
+
+    # One row per station with a ridership column per period; borough and
+    # system totals are derived from these station totals in process_data
+    totals = pd.concat(partial_totals).groupby(level=[0, 1, 2], sort=False).sum().unstack("period")
+    totals = totals.reindex(columns=[period["label"] for period in periods])
+    return totals.rename_axis(columns=None).reset_index()
+
+def estimate_from_draft_sample(processed_dir, periods):
+    """Station totals like load_data, estimated from the draft sample, and their confidence intervals."""
+    sample = load_draft_sample(processed_dir)
+    catalog = load_station_catalog(processed_dir)
+
+    estimates = []
+    intervals = {}
+    for period, draft_period in zip(periods, draft_periods(periods)):
+        label = draft_period["label"]
+        rows = draft_rows(sample, catalog, period)
+        print_draft_total(label, rows)
+        if rows.empty:
+            continue
+        totals = estimate_totals(rows, ["station_complex", "borough"])
+        estimates.append(totals.set_index(["station_complex", "borough"])["estimate"].rename(label))
+        intervals[label] = totals
+
+    if not estimates:
+        return None, intervals
+    station_ridership = pd.concat(estimates, axis=1).reset_index()
+    return station_ridership, intervals
+
+def process_data(station_ridership):
+    periods = [col for col in station_ridership.columns if col not in ("station_complex", "borough")]
+
+    # Station, borough and system totals for every period at once
+    hierarchy = station_hierarchy(station_ridership["borough"])
+    levels = rollup_hierarchy(station_ridership[periods].fillna(0).to_numpy(), hierarchy)
+    shares = hierarchy_shares(levels, hierarchy)
+
+    results = {}
+    for i, period in enumerate(periods):
+        official_ridership = levels["system"][i]
+        print(f"✅ Total Subway Ridership in {period}: {official_ridership:,.0f}")
+
+        present = station_ridership[period].notna().to_numpy()
+        stations = pd.DataFrame({
+            "station_complex": station_ridership["station_complex"].to_numpy()[present],
+            "borough": station_ridership["borough"].to_numpy()[present],
+            "ridership": levels["station"][present, i],
+            "percentage": shares["station_of_system"][present, i],
+            "share_of_borough": shares["station_of_borough"][present, i]
+        })
+        boroughs = pd.DataFrame({
+            "borough": hierarchy["boroughs"],
+            "ridership": levels["borough"][:, i],
+            "percentage": shares["borough_of_system"][:, i]
+        })
+
+        # Keep ridership as numeric values
+        ranked = stations.sort_values(by="ridership", ascending=False)
+        results[period] = {
+            "stations": stations,
+            "boroughs": boroughs.sort_values(by="ridership", ascending=False),
+            "top15": ranked.head(TOP_STATIONS),
+            "top10": ranked.head(10)
+        }
+
+    return results
+
+def use_top_k_summaries(results, periods, processed_dir):
+    """Replace the Top tables of whole-year periods with the top-K summaries' estimates and error bounds."""
+    try:
+        tracker = load_top_k_tracker(processed_dir)
+        catalog = load_station_catalog(processed_dir)
+    except FileNotFoundError as e:
+        print(f"{e} Keeping the exact top stations.")
+        return results
+
+    for period in periods:
+        year = calendar_year(period)
+        if year is None:
+            print(f"📝 {period['label']} is not a calendar year, keeping its exact top stations")
+            continue
+        results[period['label']]["top15"] = top_stations(tracker, catalog, 'year', year, k=TOP_STATIONS)
+    return results
+
+def write_to_excel(output_file, results, output_dir):
     with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
         workbook = writer.book
         
@@ -106,6 +184,7 @@ def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_20
         percent_format = workbook.add_format({'num_format': '0.00%'})
 
         def write_as_table(df, sheet_name, writer, use_color=False):
+            sheet_name = unique_sheet_name(writer, sheet_name)
             df.to_excel(writer, sheet_name=sheet_name, index=False)
             worksheet = writer.sheets[sheet_name]
             end_row = len(df)
@@ -115,9 +194,9 @@ def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_20
             # Define column formats
             columns = []
             for col in df.columns:
-                if col == "station_complex":
+                if col in ("station_complex", "borough", "guaranteed_top_k"):
                     columns.append({'header': col})
-                elif col == "percentage":
+                elif col in ("percentage", "share_of_borough"):
                     columns.append({'header': col, 'format': percent_format})
                 else:
                     columns.append({'header': col, 'format': number_format})
@@ -137,35 +216,33 @@ def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_20
                 )
                 if col == "ridership":
                     worksheet.set_column(idx, idx, max_length + 2, number_format)
-                elif col == "percentage":
+                elif col in ("percentage", "share_of_borough"):
                     worksheet.set_column(idx, idx, max_length + 2, percent_format)
                 else:
                     worksheet.set_column(idx, idx, max_length + 2)
 
-        write_as_table(stations_2023, "2023 Ridership", writer)
-        write_as_table(stations_2024, "2024 Ridership", writer)
-        write_as_table(top5_2023, "Top 5 Stations 2023", writer, use_color=True)
-        write_as_table(top5_2024, "Top 5 Stations 2024", writer, use_color=True)
+        periods = list(results)
+        for period in periods:
+            write_as_table(results[period]["stations"], f"{period} Ridership", writer)
+        for period in periods:
+            write_as_table(results[period]["boroughs"], f"{period} Boroughs", writer)
+        for period in periods:
+            write_as_table(results[period]["top15"], f"Top {TOP_STATIONS} Stations {period}", writer, use_color=True)
 
         fig, ax = plt.subplots(figsize=(12, 8))
-        top10_2023_plot = top10_2023.copy()
-        top10_2024_plot = top10_2024.copy()
-
-        bar_height = 0.35
-        y_pos = range(len(top10_2023_plot))
-        ax.barh([i + bar_height for i in y_pos], 
-                top10_2023_plot["ridership"], 
-                height=bar_height,
-                label="2023",
-                color="#1f77b4",
-                alpha=0.8)
-        
-        ax.barh([i for i in y_pos], 
-                top10_2024_plot["ridership"], 
-                height=bar_height,
-                label="2024",
-                color="#d62728",
-                alpha=0.8)
+
+        # The stations are the top 10 of the first period; every period shows its own ridership for them
+        top10_stations = results[periods[0]]["top10"]["station_complex"].tolist()
+        bar_height = 0.7 / len(periods)
+        y_pos = np.arange(len(top10_stations))
+        for i, period in enumerate(periods):
+            ridership = results[period]["stations"].set_index("station_complex")["ridership"]
+            ax.barh(y_pos + (len(periods) - 1 - i) * bar_height,
+                    ridership.reindex(top10_stations).fillna(0),
+                    height=bar_height,
+                    label=period,
+                    color=PERIOD_COLORS[i % len(PERIOD_COLORS)],
+                    alpha=0.8)
         
         def format_with_commas(x, p):
             return f"{x:,.0f}"
@@ -173,13 +250,13 @@ def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_20
         ax.xaxis.set_major_formatter(ticker.FuncFormatter(format_with_commas))
         ax.set_xlabel("Ridership", fontsize=10, fontweight='bold')
         ax.set_ylabel("Station Complex", fontsize=10, fontweight='bold')
-        ax.set_title("Top 10 Subway Stations Ridership Comparison (2023 vs 2024)", 
+        ax.set_title(f"Top 10 Subway Stations Ridership Comparison ({' vs '.join(periods)})", 
                     fontsize=12, 
                     fontweight='bold', 
                     pad=20)
        
-        ax.set_yticks([i + bar_height/2 for i in y_pos])
-        ax.set_yticklabels(top10_2023_plot["station_complex"], fontsize=9)
+        ax.set_yticks(y_pos + bar_height * (len(periods) - 1) / 2)
+        ax.set_yticklabels(top10_stations, fontsize=9)
         ax.grid(True, axis='x', linestyle='--', alpha=0.3)
 
         ax.legend(bbox_to_anchor=(1.02, 1),
@@ -199,31 +276,39 @@ def write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_20
         plt.savefig(chart_path, bbox_inches="tight", dpi=300)
         plt.close(fig)
 
-        hourly_data = pd.Series(0, index=range(24))
-        hourly_counts = pd.Series(0, index=range(24))
-        for chunk in pd.read_csv(file_path, chunksize=chunksize, parse_dates=[date_column], date_format=date_format, low_memory=False):
-            chunk['hour'] = chunk[date_column].dt.hour
-            hourly_sum = chunk.groupby('hour')[ridership_column].sum()
-            hourly_count = chunk.groupby('hour').size()
-            hourly_data = hourly_data.add(hourly_sum, fill_value=0)
-            hourly_counts = hourly_counts.add(hourly_count, fill_value=0)
-
-        hourly_data = hourly_data / hourly_counts
-        hours = list(range(1, 24)) + [0]
-        hourly_data = hourly_data.reindex(hours)
-
-        # Removed hourly chart code as requested
-
         worksheet_chart = workbook.add_worksheet("Top 10 Chart")
         worksheet_chart.insert_image("B2", str(chart_path))
 
     print(f"✅ Updated file with full ridership data, percentages, top stations, and charts saved to: {output_file}")
 
-def main():
-    file_path, output_file, output_dir = define_paths()
-    total_ridership_per_year, stations_2023, stations_2024 = load_data(file_path)
-    stations_2023, stations_2024, top5_2023, top5_2024, top10_2023, top10_2024 = process_data(total_ridership_per_year, stations_2023, stations_2024)
-    write_to_excel(output_file, stations_2023, stations_2024, top5_2023, top5_2024, top10_2023, top10_2024, output_dir, file_path, "ridership")
+def main(period_specs=PERIODS, draft=DRAFT_MODE, top_k=USE_TOP_K_SUMMARIES):
+    periods = define_periods(period_specs)
+    file_path, output_file, output_dir = define_paths(draft_periods(periods) if draft else periods)
+
+    if draft:
+        processed_dir = Path(__file__).resolve().parents[2] / "Data" / "processed"
+        station_ridership, intervals = estimate_from_draft_sample(processed_dir, periods)
+        if station_ridership is None:
+            print("🚨 No sampled rows in any period, nothing to report.")
+            return
+        write_to_excel(output_file, process_data(station_ridership), output_dir)
+        print(f"✅ Draft confidence intervals saved to: {save_draft_intervals(intervals, output_dir, 'Station_Ridership_Yearly_Analysis')}")
+        return
+
+    # Use the hourly rollup built by IngestRawData.py when it exists
+    rollup, catalog = load_processed_rollup(Path(__file__).resolve().parents[2] / "Data" / "processed")
+    if rollup is not None:
+        station_ridership = station_totals_by_period(rollup, catalog, periods)
+    else:
+        # Only the raw CSV fallback needs the file
+        if not file_path.exists():
+            raise FileNotFoundError(f"🚨 File not found: {file_path}")
+        station_ridership = load_data(file_path, periods)
+
+    results = process_data(station_ridership)
+    if top_k:
+        results = use_top_k_summaries(results, periods, Path(__file__).resolve().parents[2] / "Data" / "processed")
+    write_to_excel(output_file, results, output_dir)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
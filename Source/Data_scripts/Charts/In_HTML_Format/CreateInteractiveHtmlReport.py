@@ -0,0 +1,247 @@
+import base64
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Processing"))
+from HourlyRollup import load_rollup
+from StationCatalog import load_station_catalog
+from StationClustering import profile_matrix, HOUR_LABELS
+from Periods import define_periods, periods_label
+from SeriesCodec import encode_series
+
+# Years and/or (label, start date, end date) ranges whose months can be picked in the report
+PERIODS = [2023, 2024]
+
+WATERMARK_TEXT = "Created By Mantie Reid II"
+
+# Averages are stored as tenths of a rider plus one, so 0 can mark an hour without data
+AVERAGE_SCALE = 10
+
+# The page: the data blob replaces __REPORT_DATA__. Each station's blob is a
+# SeriesCodec series (months x 24 values) in base64, decoded the first time
+# the station is picked.
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  body { font-family: Arial, Helvetica, sans-serif; margin: 24px; color: #222; }
+  .controls { display: flex; gap: 12px; align-items: center; flex-wrap: wrap; margin-bottom: 12px; }
+  select, input { font-size: 14px; padding: 4px; }
+  #station { min-width: 360px; }
+  #chart text { font-family: Arial, Helvetica, sans-serif; }
+</style>
+</head>
+<body>
+<h2>__TITLE__</h2>
+<div class="controls">
+  <input id="filter" type="search" placeholder="Filter stations">
+  <select id="station"></select>
+  <select id="month"></select>
+</div>
+<svg id="chart" width="1000" height="600" viewBox="0 0 1000 600"></svg>
+<script>
+const DATA = __REPORT_DATA__;
+const decoded = new Map();
+
+// SeriesCodec header: magic, version, scheme, width, pad, count, payload bytes, base
+function decodeSeries(b64) {
+  const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+  const view = new DataView(bytes.buffer);
+  const scheme = bytes[5], width = bytes[6];
+  const count = view.getUint32(8, true), size = view.getUint32(12, true);
+  const base = Number(view.getBigInt64(16, true));
+  const payload = bytes.subarray(24, 24 + size);
+  const values = new Float64Array(count);
+  if (scheme === 0) {
+    // delta + zigzag + varint
+    let pos = 0, previous = base;
+    for (let i = 0; i < count; i++) {
+      let z = 0, scale = 1, b;
+      do { b = payload[pos++]; z += (b & 0x7f) * scale; scale *= 128; } while (b & 0x80);
+      previous += (z % 2) ? -(z + 1) / 2 : z / 2;
+      values[i] = previous;
+    }
+  } else {
+    // frame of reference, little-endian bit-packing
+    let bit = 0;
+    for (let i = 0; i < count; i++) {
+      let v = 0;
+      for (let k = 0; k < width; k++, bit++) {
+        if (payload[bit >> 3] & (1 << (bit & 7))) v += 2 ** k;
+      }
+      values[i] = v + base;
+    }
+  }
+  return values;
+}
+
+function stationProfiles(id) {
+  if (!decoded.has(id)) decoded.set(id, decodeSeries(DATA.blobs[id]));
+  return decoded.get(id);
+}
+
+function niceStep(max) {
+  const raw = max / 5, power = 10 ** Math.floor(Math.log10(raw || 1));
+  return [1, 2, 5, 10].map(m => m * power).find(s => s >= raw);
+}
+
+function svg(tag, attrs, text) {
+  const el = document.createElementNS("http://www.w3.org/2000/svg", tag);
+  for (const [k, v] of Object.entries(attrs)) el.setAttribute(k, v);
+  if (text !== undefined) el.textContent = text;
+  return el;
+}
+
+function draw() {
+  const chart = document.getElementById("chart");
+  chart.replaceChildren();
+  const id = document.getElementById("station").value;
+  const m = Number(document.getElementById("month").value);
+  if (!id) return;
+  const station = DATA.stations.find(s => s.id === id);
+  const all = stationProfiles(id);
+  const points = [];
+  for (let h = 0; h < 24; h++) {
+    const v = all[m * 24 + h];
+    if (v > 0) points.push([h, (v - 1) / DATA.scale]);
+  }
+  const [year, month] = DATA.months[m].split("-").map(Number);
+  const title = `Avg Ridership for ${station.name} - ${month}/${year}`;
+  const left = 80, top = 80, width = 880, height = 400;
+  chart.append(svg("text", {x: 500, y: 30, "text-anchor": "middle", "font-size": 20}, title));
+  if (points.length === 0) {
+    chart.append(svg("text", {x: 500, y: 300, "text-anchor": "middle", "font-size": 16}, "No data for this month"));
+    return;
+  }
+
+  const am = points.filter(p => p[0] < 12), pm = points.filter(p => p[0] >= 12);
+  const peak = list => list.length ? DATA.hours[list.reduce((a, b) => (b[1] > a[1] ? b : a))[0]] : "-";
+  chart.append(svg("text", {x: 500, y: 55, "text-anchor": "middle", "font-size": 15, fill: "#555"},
+                   `AM peak ${peak(am)}, PM peak ${peak(pm)}`));
+
+  const step = niceStep(Math.max(...points.map(p => p[1])));
+  const yMax = Math.ceil(Math.max(...points.map(p => p[1])) / step) * step || step;
+  const x = h => left + (h + 0.5) * width / 24, y = v => top + height - v / yMax * height;
+  for (let v = 0; v <= yMax + 1e-9; v += step) {
+    chart.append(svg("line", {x1: left, x2: left + width, y1: y(v), y2: y(v), stroke: "#ccc", "stroke-dasharray": "4 4"}));
+    chart.append(svg("text", {x: left - 8, y: y(v) + 4, "text-anchor": "end", "font-size": 12}, v.toLocaleString()));
+  }
+  DATA.hours.forEach((label, h) => chart.append(svg("text", {
+    x: x(h), y: top + height + 16, "text-anchor": "end", "font-size": 12,
+    transform: `rotate(-45 ${x(h)} ${top + height + 16})`}, label)));
+  chart.append(svg("rect", {x: left, y: top, width, height, fill: "none", stroke: "#444"}));
+  chart.append(svg("text", {x: left + width / 2, y: top + height + 70, "text-anchor": "middle", "font-size": 14}, "Time (EST)"));
+  chart.append(svg("text", {x: 20, y: top + height / 2, "text-anchor": "middle", "font-size": 14,
+                            transform: `rotate(-90 20 ${top + height / 2})`}, "Avg Riders"));
+
+  chart.append(svg("polyline", {points: points.map(p => `${x(p[0])},${y(p[1])}`).join(" "),
+                                fill: "none", stroke: "#1f77b4", "stroke-width": 2}));
+  points.forEach(p => chart.append(svg("circle", {cx: x(p[0]), cy: y(p[1]), r: 4, fill: "#1f77b4"})));
+  const mean = points.reduce((s, p) => s + p[1], 0) / points.length;
+  chart.append(svg("text", {x: left + width - 10, y: top + 20, "text-anchor": "end", "font-size": 13},
+                   `Avg Riders: ${mean.toFixed(2)}`));
+  chart.append(svg("text", {x: 500, y: 300, "text-anchor": "middle", "font-size": 40, fill: "gray", opacity: 0.15,
+                            transform: "rotate(-30 500 300)"}, DATA.watermark));
+}
+
+function fillStations() {
+  const text = document.getElementById("filter").value.toLowerCase();
+  const select = document.getElementById("station");
+  const current = select.value;
+  select.replaceChildren(...DATA.stations.filter(s => s.name.toLowerCase().includes(text))
+    .map(s => new Option(`${s.name} (${s.borough})`, s.id)));
+  if ([...select.options].some(o => o.value === current)) select.value = current;
+  draw();
+}
+
+document.getElementById("month").replaceChildren(...DATA.months.map((ym, i) => {
+  const [year, month] = ym.split("-").map(Number);
+  return new Option(`${month}/${year}`, i);
+}));
+document.getElementById("filter").addEventListener("input", fillStations);
+document.getElementById("station").addEventListener("change", draw);
+document.getElementById("month").addEventListener("change", draw);
+fillStations();
+</script>
+</body>
+</html>
+"""
+
+
+def report_data(rollup, catalog_df, periods):
+    """
+    Everything the page needs: the months, the stations and one encoded blob per station
+
+    Returns:
+        dict: 'months' ('YYYY-MM'), 'hours' (AM/PM labels), 'stations' (id,
+        name, borough), 'blobs' (station id -> base64 series of months x 24
+        hourly averages) plus the scale and watermark
+    """
+    index, profiles = profile_matrix(rollup, 24, by_month=True, missing=np.nan)
+    month_number = (index['year'].to_numpy() - 1970) * 12 + index['month'].to_numpy() - 1
+    month_start_hours = (np.datetime64('1970-01', 'M') + month_number).astype('datetime64[h]').astype(np.int64)
+    in_periods = np.zeros(len(index), dtype=bool)
+    for period in periods:
+        in_periods |= (month_start_hours >= period['start_hour']) & (month_start_hours < period['end_hour'])
+    index, profiles = index[in_periods], profiles[in_periods]
+
+    months = np.unique(month_number[in_periods])
+    stations = catalog_df.reset_index().set_index('station_code').sort_values('station_complex')
+    stations = stations[stations.index.isin(index['station_code'])]
+
+    # One stations x months x 24 grid of scaled averages, 0 where there is no data
+    grid = np.zeros((int(catalog_df['station_code'].max()) + 1, len(months), 24), dtype=np.int64)
+    values = np.where(np.isnan(profiles), 0, np.rint(np.nan_to_num(profiles) * AVERAGE_SCALE) + 1)
+    grid[index['station_code'].to_numpy(), np.searchsorted(months, month_number[in_periods])] = values
+
+    return {
+        'months': [str(np.datetime64('1970-01', 'M') + month) for month in months],
+        'hours': HOUR_LABELS,
+        'scale': AVERAGE_SCALE,
+        'watermark': WATERMARK_TEXT,
+        'stations': [{'id': row.station_complex_id, 'name': row.station_complex, 'borough': row.borough}
+                     for row in stations.itertuples()],
+        'blobs': {row.station_complex_id: base64.b64encode(encode_series(grid[code].ravel())).decode('ascii')
+                  for code, row in zip(stations.index, stations.itertuples())}
+    }
+
+
+def write_html_report(data, output_file, title):
+    """Fill the template with the report data and write the page."""
+    html = HTML_TEMPLATE.replace("__TITLE__", title)
+    html = html.replace("__REPORT_DATA__", json.dumps(data, separators=(',', ':')).replace("</", "<\\/"))
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return output_file
+
+
+def main(period_specs=PERIODS):
+    base_dir = Path(__file__).resolve().parents[4]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    periods = define_periods(period_specs)
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    data = report_data(rollup, catalog_df, periods)
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Ridership_Interactive_Report_{periods_label(periods)}_{date_time_str}.html"
+    write_html_report(data, output_file, f"MTA Average Hourly Ridership by Station ({' and '.join(p['label'] for p in periods)})")
+    print(f"✅ Interactive report with {len(data['stations'])} stations and {len(data['months'])} months "
+          f"built in {time.perf_counter() - started:.1f} s, saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
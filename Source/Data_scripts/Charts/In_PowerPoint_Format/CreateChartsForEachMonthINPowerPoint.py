@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 from pptx import Presentation
 from pptx.util import Inches
@@ -6,6 +7,36 @@ import os
 import gc  # Import garbage collection module
 import io  # Import io for BytesIO
 import traceback  # For better error reporting
+import sys
+
+# Shared processing code lives in Data_scripts/Processing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Processing"))
+from HourlyRollup import load_processed_rollup, monthly_station_hourly_data
+from Periods import define_periods, period_masks
+from RawData import to_hour_index
+from Forecasting import forecast_month_station_data
+from PeakHours import peak_metrics, peak_summary
+from StationHeatmap import heatmap_image
+from SvgChart import render_line_chart, svg_to_png, cairosvg
+
+# Years and/or (label, start date, end date) ranges to chart; each month in them gets its own PowerPoint
+PERIODS = [2023, 2024]
+
+# Also chart the Holt-Winters forecast of the month after the data ends (needs the rollup from IngestRawData.py)
+FORECAST_NEXT_MONTH = False
+
+# "single" draws one chart per station per slide; "grid" draws GRID_ROWS x GRID_COLUMNS
+# stations per slide with shared axes, so a month needs ~25 renders instead of 400+
+CHART_MODE = "single"
+GRID_ROWS = 4
+GRID_COLUMNS = 4
+
+# "matplotlib", or "svg" to draw the single-mode charts with SvgChart.py, which
+# skips matplotlib's layout work (needs the cairosvg package to make the PNG)
+CHART_RENDERER = "matplotlib"
+
+# Open every presentation with a station x hour heatmap of the month: 'total', 'cluster' or None
+HEATMAP_ORDER = "total"
 
 # Define chunk size for processing
 CHUNK_SIZE = 10000000  # Adjust based on available RAM
@@ -22,9 +53,13 @@ os.makedirs(file_path_OutPut, exist_ok=True)
 # Add watermark text
 WATERMARK_TEXT = "Created By Mantie Reid II"
 
-# Print file path for debugging
-print(f"Looking for data file at: {file_path}")
-if not os.path.exists(file_path):
+# Use the hourly rollup built by IngestRawData.py when it exists
+rollup, catalog = load_processed_rollup(os.path.join(base_dir, "Data", "processed"))
+
+# Only the raw CSV fallback needs the file
+if rollup is None:
+    print(f"Looking for data file at: {file_path}")
+if rollup is None and not os.path.exists(file_path):
     print(f"ERROR: File not found at {file_path}")
     # Look for the file in the current directory
     current_dir = os.getcwd()
@@ -71,6 +106,92 @@ def sanitize_name(name):
               .replace("?", "-").replace("'", "-").replace(",", "-") \
               .replace(".", "-").strip()[:31]
 
+# Average riders for every hour of one station's month, or None when too few hours have data
+def station_hourly_profile(station_id, station_info):
+    station_data = []
+    for hour in hours:
+        sum_val = station_info["sums"][hour]
+        count = station_info["counts"][hour]
+        if count > 0:
+            station_data.append({"AM_PM": hour, "ridership": sum_val / count})
+    
+    if not station_data:
+        print(f"No data for station {station_id}")
+        return None
+        
+    station_df = pd.DataFrame(station_data)
+    
+    # Skip stations with insufficient data
+    if len(station_df) < 12:  # Require at least half the hours to have data
+        print(f"Skipping station {station_id} due to insufficient data points ({len(station_df)} hours)")
+        return None
+        
+    # Merge with all_hours to ensure all 24 hours are represented
+    station_df = all_hours.merge(station_df, on="AM_PM", how="left")
+    
+    # Check if we have enough non-null data points after merging
+    valid_data_points = station_df["ridership"].count()
+    if valid_data_points < 12:
+        print(f"Skipping station {station_id} due to insufficient valid data points ({valid_data_points} hours)")
+        return None
+        
+    # Fill missing values
+    station_df["ridership"] = station_df["ridership"].interpolate(method="linear")
+    
+    # Sort by hour for proper display
+    station_df["hour_idx"] = station_df["AM_PM"].map(hour_indices)
+    return station_df.sort_values("hour_idx").drop("hour_idx", axis=1)
+
+# Figure with a grid of panels sharing both axes and one line per panel. It is made
+# once and every slide only swaps the data and titles, so ticks and layout are reused.
+def create_grid_figure(rows=GRID_ROWS, columns=GRID_COLUMNS):
+    fig, axes = plt.subplots(rows, columns, figsize=(16, 9), sharex=True, sharey=True)
+    lines = []
+    for ax in axes.flat:
+        line, = ax.plot(range(24), np.zeros(24), marker='o', markersize=2, linewidth=1.2)
+        ax.grid(True, linestyle='--', alpha=0.6)
+        ax.label_outer()
+        lines.append(line)
+    
+    # Every third hour fits under the narrow panels
+    axes.flat[0].set_xticks(range(0, 24, 3))
+    axes.flat[0].set_xticklabels(hours[::3])
+    for ax in axes[-1]:
+        ax.tick_params(axis='x', labelrotation=45, labelsize=8)
+    fig.supxlabel("Time (EST)", fontsize=12)
+    fig.supylabel("Avg Riders", fontsize=12)
+    fig.text(0.5, 0.5, WATERMARK_TEXT, ha='center', va='center', 
+             color='gray', alpha=0.15, fontsize=40, rotation=30)
+    fig.subplots_adjust(left=0.06, right=0.99, bottom=0.11, top=0.9, hspace=0.45, wspace=0.06)
+    return fig, axes, lines
+
+# Draw one slide's stations into the grid figure and return it as a PNG
+def render_grid_page(fig, axes, lines, page, title):
+    for i, (ax, line) in enumerate(zip(axes.flat, lines)):
+        if i >= len(page):
+            # Empty panels keep their axes so the hour labels of the bottom row stay
+            line.set_visible(False)
+            ax.set_title("")
+            continue
+        station_name, station_df, peak_title = page[i]
+        line.set_visible(True)
+        line.set_ydata(station_df["ridership"].to_numpy())
+        ax.set_title(f"{station_name[:40]}\n{peak_title}", fontsize=7)
+    
+    # Stations are sorted by size, so one shared scale suits the whole page
+    top = max(station_df["ridership"].max() for _, station_df, _ in page)
+    axes.flat[0].set_ylim(0, top * 1.1 if top > 0 else 1)
+    fig.suptitle(title, fontsize=16)
+    
+    img_bytes = io.BytesIO()
+    fig.savefig(img_bytes, format='png', dpi=96)
+    img_bytes.seek(0)
+    return img_bytes
+
+if CHART_RENDERER == "svg" and cairosvg is None:
+    print("cairosvg is not installed, drawing the charts with matplotlib instead")
+    CHART_RENDERER = "matplotlib"
+
 # Create a tracking dictionary for processed stations
 processed_stations = {}
 
@@ -78,33 +199,54 @@ processed_stations = {}
 required_cols = ['transit_timestamp', 'station_complex_id', 'station_complex', 'ridership']
 
 # Read first few rows to inspect the timestamp format
-try:
-    sample_df = pd.read_csv(file_path, nrows=5)
-    print("Sample data:")
-    print(sample_df[['transit_timestamp']].head())
-    
-    # Try to detect timestamp format
-    sample_timestamp = sample_df['transit_timestamp'].iloc[0] if not sample_df.empty else None
-    print(f"Sample timestamp: {sample_timestamp}")
-except Exception as e:
-    print(f"Error reading sample data: {str(e)}")
+if rollup is None:
+    try:
+        sample_df = pd.read_csv(file_path, nrows=5)
+        print("Sample data:")
+        print(sample_df[['transit_timestamp']].head())
+        
+        # Try to detect timestamp format
+        sample_timestamp = sample_df['transit_timestamp'].iloc[0] if not sample_df.empty else None
+        print(f"Sample timestamp: {sample_timestamp}")
+    except Exception as e:
+        print(f"Error reading sample data: {str(e)}")
+
+
+# Periods to chart, followed by the forecast month when it is requested
+chart_periods = define_periods(PERIODS)
+if FORECAST_NEXT_MONTH and rollup is not None:
+    chart_periods.append({"label": "Forecast", "forecast": True})
 
-# Process data for both 2023 and 2024
-for year in [2023,2024]:
-    print(f"Processing data for year {year}")
+# Process data for every requested period
+for period in chart_periods:
+    period_label = period["label"]
+    # Forecast charts are marked in their titles and file names
+    forecast_tag = " (Forecast)" if period.get("forecast") else ""
+    print(f"Processing data for period {period_label}")
     
     # Aggregation structure to store cumulative sums and counts
-    month_station_data = {}  # {(month, station_id): {"name": str, "sums": {hour: sum}, "counts": {hour: count}}}
+    month_station_data = {}  # {((year, month), station_id): {"name": str, "sums": {hour: sum}, "counts": {hour: count}}}
     
-    # Track which months we've seen
+    # Track which (year, month) pairs we've seen
     months_seen = set()
     
+    if period.get("forecast"):
+        # Forecast sums and counts have the same shape as the historical ones
+        month_station_data, months_seen = forecast_month_station_data(rollup, catalog, hours)
+        chunk_source = []
+    elif rollup is not None:
+        # The rollup already holds the sums and counts, so no chunks need to be read
+        month_station_data, months_seen = monthly_station_hourly_data(rollup, catalog, period, hours)
+        chunk_source = []
+    else:
+        chunk_source = pd.read_csv(file_path, chunksize=CHUNK_SIZE, usecols=required_cols, low_memory=False)
+    
     try:
         # Read and process in chunks to reduce memory usage
         chunks_processed = 0
         
         # Using correct timestamp format and low_memory=False to handle mixed types
-        for chunk in pd.read_csv(file_path, chunksize=CHUNK_SIZE, usecols=required_cols, low_memory=False):
+        for chunk in chunk_source:
             chunks_processed += 1
             
             if chunks_processed % 5 == 0:
@@ -151,29 +293,28 @@ for year in [2023,2024]:
                 print(f"Years in chunk {chunks_processed}:")
                 print(year_counts)
             
-            # Filter by year
-            year_mask = chunk_year == year
-            year_data_count = year_mask.sum()
+            # Filter by period
+            period_mask = next(period_masks(to_hour_index(chunk["transit_timestamp"]), [period]), (None, None))[1]
             
-            if year_data_count == 0:
-                # Skip chunk if no data for this year
-                print(f"Chunk {chunks_processed} has no data for year {year}, skipping")
+            if period_mask is None:
+                # Skip chunk if no data for this period
+                print(f"Chunk {chunks_processed} has no data for period {period_label}, skipping")
                 continue
             
-            print(f"Found {year_data_count} rows for year {year} in chunk {chunks_processed}")
+            print(f"Found {period_mask.sum()} rows for period {period_label} in chunk {chunks_processed}")
                 
             # Work with filtered data - use boolean indexing instead of .copy() to save memory
-            filtered_chunk = chunk.loc[year_mask].copy()
+            filtered_chunk = chunk.loc[period_mask].copy()
             
             # Extract month and hour
-            months = filtered_chunk["transit_timestamp"].dt.month
+            months = list(zip(filtered_chunk["transit_timestamp"].dt.year, filtered_chunk["transit_timestamp"].dt.month))
             hours_data = filtered_chunk["transit_timestamp"].dt.hour
             
             # Convert to AM/PM format
             filtered_chunk["AM_PM"] = hours_data.apply(lambda h: f"{h % 12 if h % 12 != 0 else 12} {'AM' if h < 12 else 'PM'}")
             
             # Update months we've seen
-            new_months = sorted(months.unique())
+            new_months = sorted(set(months))
             months_seen.update(new_months)
             print(f"Found months in chunk {chunks_processed}: {new_months}")
             
@@ -184,7 +325,7 @@ for year in [2023,2024]:
                 for _, row in filtered_chunk.iterrows():
                     station_id = row["station_complex_id"]
                     station_name = row["station_complex"]
-                    month = row["transit_timestamp"].month
+                    month = (row["transit_timestamp"].year, row["transit_timestamp"].month)
                     am_pm = row["AM_PM"]
                     ridership = row["ridership"]
                     
@@ -236,7 +377,7 @@ for year in [2023,2024]:
         traceback.print_exc()
         continue
     
-    print(f"Finished processing chunks for year {year}")
+    print(f"Finished processing chunks for period {period_label}")
     print(f"Months with data: {sorted(months_seen)}")
     print(f"Number of station-month combinations: {len(month_station_data)}")
     
@@ -244,16 +385,17 @@ for year in [2023,2024]:
     months_with_data = sorted(months_seen)
     
     if not months_with_data:
-        print(f"No months found for year {year}, skipping presentation creation")
+        print(f"No months found for period {period_label}, skipping presentation creation")
         continue
         
-    print(f"Creating presentations for {len(months_with_data)} months in {year}: {months_with_data}")
+    print(f"Creating presentations for {len(months_with_data)} months in {period_label}: {months_with_data}")
     
-    for month in months_with_data:
+    for year_month in months_with_data:
+        year, month = year_month
         print(f"Creating presentation for {month}/{year}")
         
         # Get all stations for this month
-        month_stations = {station_id: data for (m, station_id), data in month_station_data.items() if m == month}
+        month_stations = {station_id: data for (m, station_id), data in month_station_data.items() if m == year_month}
         
         if not month_stations:
             print(f"No stations have data for {month}/{year}")
@@ -261,111 +403,127 @@ for year in [2023,2024]:
             
         print(f"Found {len(month_stations)} stations with data for {month}/{year}")
         
+        # AM and PM peak of every station this month, for the slide titles
+        month_profiles = np.array([[info["sums"][hour] / info["counts"][hour] if info["counts"][hour] > 0 else np.nan
+                                    for hour in hours] for info in month_stations.values()])
+        peaks = peak_metrics(month_profiles)
+        peak_titles = {station_id: peak_summary(hours[am], hours[pm])
+                       for station_id, am, pm in zip(month_stations, peaks["am_peak_hour"], peaks["pm_peak_hour"])}
+        
         # Create PowerPoint presentation
         ppt = Presentation()
         chart_count = 0
         
-        # Process each station
-        for station_id, station_info in month_stations.items():
-            # Skip if already processed
-            station_key = f"{station_id}_{month}_{year}"
-            if station_key in processed_stations:
-                print(f"Skipping duplicate station: {station_id} for {month}/{year}")
-                continue
-            
-            processed_stations[station_key] = True
-            station_name = station_info["name"]
-            
-            # Calculate averages from sums and counts
-            station_data = []
-            for hour in hours:
-                sum_val = station_info["sums"][hour]
-                count = station_info["counts"][hour]
-                if count > 0:
-                    station_data.append({"AM_PM": hour, "ridership": sum_val / count})
-            
-            # Convert to DataFrame
-            if not station_data:
-                print(f"No data for station {station_id} in {month}/{year}")
-                continue
-                
-            station_df = pd.DataFrame(station_data)
+        if HEATMAP_ORDER:
+            heatmap_title = f"Avg Riders per Station and Hour - {month}/{year}{forecast_tag}"
+            names = [sanitize_name(info["name"]) for info in month_stations.values()]
+            slide = ppt.slides.add_slide(ppt.slide_layouts[5])
+            slide.shapes.title.text = heatmap_title
+            slide.shapes.add_picture(heatmap_image(names, month_profiles, heatmap_title, HEATMAP_ORDER, dpi=96),
+                                     Inches(0.5), Inches(1.5), height=Inches(5.75))
+        
+        if CHART_MODE == "grid":
+            # Largest stations first, so the stations sharing a page have similar scales
+            page_items = []
+            for station_id, station_info in month_stations.items():
+                processed_stations[f"{station_id}_{month}_{year}_{period_label}"] = True
+                station_df = station_hourly_profile(station_id, station_info)
+                if station_df is not None:
+                    page_items.append((sanitize_name(station_info["name"]), station_df, peak_titles[station_id]))
+            page_items.sort(key=lambda item: item[1]["ridership"].max(), reverse=True)
             
-            # Skip stations with insufficient data
-            if len(station_df) < 12:  # Require at least half the hours to have data
-                print(f"Skipping station {station_id} due to insufficient data points ({len(station_df)} hours)")
-                continue
+            per_page = GRID_ROWS * GRID_COLUMNS
+            n_pages = (len(page_items) + per_page - 1) // per_page
+            fig, axes, lines = create_grid_figure()
+            for page_number in range(n_pages):
+                page = page_items[page_number * per_page:(page_number + 1) * per_page]
+                title = f"Avg Ridership - {month}/{year}{forecast_tag} ({page_number + 1}/{n_pages})"
+                img_bytes = render_grid_page(fig, axes, lines, page, title)
                 
-            # Merge with all_hours to ensure all 24 hours are represented
-            station_df = all_hours.merge(station_df, on="AM_PM", how="left")
+                slide = ppt.slides.add_slide(ppt.slide_layouts[5])
+                slide.shapes.title.text = title
+                slide.shapes.add_picture(img_bytes, Inches(0.25), Inches(1.6), width=Inches(9.5))
+                chart_count += len(page)
+                del img_bytes
+            plt.close(fig)
+        else:
+            # Process each station
+            for station_id, station_info in month_stations.items():
+                # Skip if already processed
+                station_key = f"{station_id}_{month}_{year}_{period_label}"
+                if station_key in processed_stations:
+                    print(f"Skipping duplicate station: {station_id} for {month}/{year}")
+                    continue
             
-            # Check if we have enough non-null data points after merging
-            valid_data_points = station_df["ridership"].count()
-            if valid_data_points < 12:
-                print(f"Skipping station {station_id} due to insufficient valid data points ({valid_data_points} hours)")
-                continue
-                
-            # Fill missing values
-            station_df["ridership"] = station_df["ridership"].interpolate(method="linear")
+                processed_stations[station_key] = True
+                station_name = station_info["name"]
             
-            # Sort by hour for proper display
-            station_df["hour_idx"] = station_df["AM_PM"].map(hour_indices)
-            station_df = station_df.sort_values("hour_idx").drop("hour_idx", axis=1)
+                # Calculate averages from sums and counts
+                station_df = station_hourly_profile(station_id, station_info)
+                if station_df is None:
+                    continue
             
-            # Sanitize station name
-            sanitized_station_name = sanitize_name(station_name)
+                # Sanitize station name
+                sanitized_station_name = sanitize_name(station_name)
             
-            try:
-                # Create plot in memory with minimal memory usage
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(station_df["AM_PM"], station_df["ridership"], marker='o', linestyle='-', 
-                       label=f"Avg Riders: {station_df['ridership'].mean():.2f}")
-                ax.set_title(f"Avg Ridership for {sanitized_station_name} - {month}/{year}", fontsize=16)
-                ax.set_xlabel("Time (EST)", fontsize=14)
-                ax.set_ylabel("Avg Riders", fontsize=14)
-                plt.xticks(rotation=45)
-                ax.grid(True, linestyle='--', alpha=0.6)
-                ax.legend()
+                try:
+                    if CHART_RENDERER == "svg":
+                        img_bytes = svg_to_png(render_line_chart(
+                            f"Avg Ridership for {sanitized_station_name} - {month}/{year}{forecast_tag}",
+                            station_df["ridership"].to_numpy()))
+                    else:
+                        # Create plot in memory with minimal memory usage
+                        fig, ax = plt.subplots(figsize=(10, 6))
+                        ax.plot(station_df["AM_PM"], station_df["ridership"], marker='o', linestyle='-', 
+                               label=f"Avg Riders: {station_df['ridership'].mean():.2f}")
+                        ax.set_title(f"Avg Ridership for {sanitized_station_name} - {month}/{year}{forecast_tag}", fontsize=16)
+                        ax.set_xlabel("Time (EST)", fontsize=14)
+                        ax.set_ylabel("Avg Riders", fontsize=14)
+                        plt.xticks(rotation=45)
+                        ax.grid(True, linestyle='--', alpha=0.6)
+                        ax.legend()
                 
-                # Add watermark with your name - positioned in center with very low opacity
-                plt.figtext(0.5, 0.5, WATERMARK_TEXT, ha='center', va='center', 
-                           color='gray', alpha=0.15, fontsize=24, 
-                           rotation=30, transform=ax.transAxes)
+                        # Add watermark with your name - positioned in center with very low opacity
+                        plt.figtext(0.5, 0.5, WATERMARK_TEXT, ha='center', va='center', 
+                                   color='gray', alpha=0.15, fontsize=24, 
+                                   rotation=30, transform=ax.transAxes)
                 
-                plt.tight_layout()
+                        plt.tight_layout()
                 
-                # Save to BytesIO instead of file
-                img_bytes = io.BytesIO()
-                plt.savefig(img_bytes, format='png', dpi=96)  # Lower DPI for memory savings
-                img_bytes.seek(0)
-                plt.close()  # Close to release memory
+                        # Save to BytesIO instead of file
+                        img_bytes = io.BytesIO()
+                        plt.savefig(img_bytes, format='png', dpi=96)  # Lower DPI for memory savings
+                        img_bytes.seek(0)
+                        plt.close()  # Close to release memory
                 
-                # Add to PowerPoint
-                slide = ppt.slides.add_slide(ppt.slide_layouts[5])
-                title = slide.shapes.title
-                title.text = f"{sanitized_station_name} - {month}/{year}"
+                    # Add to PowerPoint
+                    slide = ppt.slides.add_slide(ppt.slide_layouts[5])
+                    title = slide.shapes.title
+                    title.text = f"{sanitized_station_name} - {month}/{year}{forecast_tag}\n{peak_titles[station_id]}"
                 
-                # Add the image directly from memory
-                left = Inches(1)
-                top = Inches(1.5)
-                height = Inches(5)
-                slide.shapes.add_picture(img_bytes, left, top, height=height)
+                    # Add the image directly from memory
+                    left = Inches(1)
+                    top = Inches(1.5)
+                    height = Inches(5)
+                    slide.shapes.add_picture(img_bytes, left, top, height=height)
                 
-                chart_count += 1
+                    chart_count += 1
                 
-                # Clean up
-                del img_bytes
+                    # Clean up
+                    del img_bytes
                 
-            except Exception as e:
-                print(f"Error creating chart for station {station_id}: {str(e)}")
+                except Exception as e:
+                    print(f"Error creating chart for station {station_id}: {str(e)}")
                 
-            # Clear station data
-            del station_df
-            gc.collect()
+                # Clear station data
+                del station_df
+                gc.collect()
         
         # Save PowerPoint to the specified output directory
         if chart_count > 0:
-            ppt_filename = f"MTA_Ridership_{month}_{year}.pptx"
+            # The period label keeps decks of overlapping periods that share a month apart
+            period_tag = "Forecast" if forecast_tag else sanitize_name(period_label).replace(" ", "_")
+            ppt_filename = f"MTA_Ridership_{'Grid_' if CHART_MODE == 'grid' else ''}{period_tag}_{month}_{year}.pptx"
             ppt_path = os.path.join(file_path_OutPut, ppt_filename)
             ppt.save(ppt_path)
             print(f"PowerPoint generated with {chart_count} charts: {ppt_path}")
@@ -376,9 +534,9 @@ for year in [2023,2024]:
         del ppt
         gc.collect()
     
-    # Clear all month data after processing the year
+    # Clear all month data after processing the period
     del month_station_data
     gc.collect()
 
 # Print summary
-print(f"Total unique station-month combinations processed: {len(processed_stations)}")
\ No newline at end of file
+print(f"Total unique station-month-period combinations processed: {len(processed_stations)}")
\ No newline at end of file
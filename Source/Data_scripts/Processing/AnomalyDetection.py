@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from RawData import hour_index_to_timestamp
+from StationCatalog import load_station_catalog
+from TimePyramid import load_time_pyramid
+from ExcelTables import write_table
+
+ANOMALY_FILE_NAME = "anomalies.npz"
+
+HOURS_PER_WEEK = 168
+
+# The baseline of an hour is the same hour of the week in this many previous weeks
+ANOMALY_WINDOW_WEEKS = 8
+
+# An hour is flagged when it is this many robust standard deviations away
+# from its baseline and differs from it by at least ANOMALY_MIN_DEVIATION riders
+ANOMALY_THRESHOLD = 5.0
+ANOMALY_MIN_DEVIATION = 50
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+# Hours scored at once; bounds the memory of the lagged copies to
+# stations x ANOMALY_BLOCK_HOURS x ANOMALY_WINDOW_WEEKS values
+ANOMALY_BLOCK_HOURS = 4 * HOURS_PER_WEEK
+
+ANOMALY_COLUMNS = ['station_code', 'hour_index', 'ridership', 'expected', 'spread', 'score']
+
+
+def empty_anomalies():
+    """Return an anomaly list with no rows that has not scored any hour yet."""
+    return {
+        'station_code': np.empty(0, dtype=np.int32),
+        'hour_index': np.empty(0, dtype=np.int64),
+        'ridership': np.empty(0, dtype=np.float32),
+        'expected': np.empty(0, dtype=np.float32),
+        'spread': np.empty(0, dtype=np.float32),
+        'score': np.empty(0, dtype=np.float32),
+        'scored_until': np.int64(-1)
+    }
+
+
+def score_hours(hourly, lo, hi, weeks=ANOMALY_WINDOW_WEEKS):
+    """
+    Robust scores of hours [lo, hi) of every station against the same hour in the previous weeks
+
+    Args:
+        hourly (ndarray): Station x hour ridership, e.g. the 'hour' level of the time pyramid
+        lo (int): First column to score, at least weeks * 168
+        hi (int): First column not scored
+
+    Returns:
+        tuple: (expected ridership (rolling median), spread (scaled rolling
+        MAD), score), each of shape (stations, hi - lo)
+    """
+    lags = np.stack([hourly[:, lo - k * HOURS_PER_WEEK:hi - k * HOURS_PER_WEEK] for k in range(1, weeks + 1)], axis=2)
+    expected = np.median(lags, axis=2)
+    spread = MAD_SCALE * np.median(np.abs(lags - expected[:, :, None]), axis=2) + 1.0
+    score = (hourly[:, lo:hi] - expected) / spread
+    return expected, spread, score
+
+
+def detect_anomalies(hourly, lo, hi, weeks=ANOMALY_WINDOW_WEEKS, threshold=ANOMALY_THRESHOLD,
+                     min_deviation=ANOMALY_MIN_DEVIATION):
+    """
+    Flag the anomalous hours in columns [lo, hi) of a station x hour matrix, a block of hours at a time
+
+    A station is only scored once it has `weeks` whole weeks of data, so a
+    station that opens part way through is not compared with the zeros before it.
+
+    Returns:
+        dict: One array per ANOMALY_COLUMNS entry, with 'hour_index' holding
+        column positions in `hourly`
+    """
+    lo = max(lo, weeks * HOURS_PER_WEEK)
+    has_data = hourly > 0
+    first_scored = has_data.argmax(axis=1) + weeks * HOURS_PER_WEEK
+    found = {column: [] for column in ANOMALY_COLUMNS}
+    for block_lo in range(lo, hi, ANOMALY_BLOCK_HOURS):
+        block_hi = min(block_lo + ANOMALY_BLOCK_HOURS, hi)
+        expected, spread, score = score_hours(hourly, block_lo, block_hi, weeks)
+        actual = hourly[:, block_lo:block_hi]
+        flagged = (np.abs(score) >= threshold) & (np.abs(actual - expected) >= min_deviation)
+        flagged &= np.arange(block_lo, block_hi)[None, :] >= first_scored[:, None]
+        stations, offsets = np.nonzero(flagged)
+        found['station_code'].append(stations.astype(np.int32))
+        found['hour_index'].append((offsets + block_lo).astype(np.int64))
+        found['ridership'].append(actual[stations, offsets].astype(np.float32))
+        found['expected'].append(expected[stations, offsets].astype(np.float32))
+        found['spread'].append(spread[stations, offsets].astype(np.float32))
+        found['score'].append(score[stations, offsets].astype(np.float32))
+
+    empty = empty_anomalies()
+    return {column: np.concatenate(parts) if parts else empty[column] for column, parts in found.items()}
+
+
+def update_anomalies(anomalies, pyramid, weeks=ANOMALY_WINDOW_WEEKS):
+    """
+    Score the hours of the pyramid that come after anomalies['scored_until']
+
+    Hours that were scored before are not looked at again, so after an
+    ingest that added new days only those days are scored.
+
+    Returns:
+        dict: The previous anomalies followed by the new ones, with
+        'scored_until' moved to the end of the data
+    """
+    hourly = pyramid['hour']
+    origin = int(pyramid['origin'])
+    with_data = np.flatnonzero(hourly.any(axis=0))
+    end = int(with_data[-1]) + 1 if len(with_data) else 0
+    start = max(int(anomalies['scored_until']) - origin, 0)
+
+    new = detect_anomalies(hourly, start, end, weeks)
+    new['hour_index'] = new['hour_index'] + origin
+
+    updated = {column: np.concatenate([anomalies[column], new[column]]) for column in ANOMALY_COLUMNS}
+    updated['scored_until'] = np.int64(max(int(anomalies['scored_until']), origin + end))
+    return updated
+
+
+def save_anomalies(anomalies, processed_dir):
+    """Save the anomaly list and how far it has been scored."""
+    output_file = processed_dir / ANOMALY_FILE_NAME
+    np.savez(output_file, **anomalies)
+    return output_file
+
+
+def load_anomalies(processed_dir):
+    """Load the anomalies written by save_anomalies."""
+    anomaly_file = processed_dir / ANOMALY_FILE_NAME
+    if not anomaly_file.exists():
+        raise FileNotFoundError(f"🚨 Anomalies not found: {anomaly_file}. Run AnomalyDetection.py first.")
+    with np.load(anomaly_file) as data:
+        return {name: data[name] for name in data.files}
+
+
+def anomaly_table(anomalies, catalog_df, top=None):
+    """
+    Rank the anomalies by how far they are from their baseline
+
+    Returns:
+        DataFrame: rank, station_complex, transit_timestamp, day_of_week,
+        ridership, expected, deviation, score and whether it is a 'Spike' or a 'Drop'
+    """
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+    timestamps = hour_index_to_timestamp(anomalies['hour_index'])
+    df = pd.DataFrame({
+        'station_complex': names.reindex(anomalies['station_code']).to_numpy(),
+        'transit_timestamp': timestamps,
+        'day_of_week': timestamps.day_name(),
+        'ridership': anomalies['ridership'],
+        'expected': anomalies['expected'],
+        'deviation': anomalies['ridership'] - anomalies['expected'],
+        'score': anomalies['score'],
+        'type': np.where(anomalies['score'] > 0, 'Spike', 'Drop')
+    })
+    df = df.iloc[np.argsort(-np.abs(anomalies['score']), kind='stable')]
+    if top is not None:
+        df = df.head(top)
+    df.insert(0, 'rank', np.arange(1, len(df) + 1))
+    return df.reset_index(drop=True)
+
+
+def main(rescore=False, top=1000):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pyramid = load_time_pyramid(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+
+    try:
+        anomalies = empty_anomalies() if rescore else load_anomalies(processed_dir)
+    except FileNotFoundError:
+        anomalies = empty_anomalies()
+    scored_before = len(anomalies['score'])
+
+    anomalies = update_anomalies(anomalies, pyramid)
+    save_anomalies(anomalies, processed_dir)
+    print(f"✅ {len(anomalies['score']) - scored_before:,} new anomalous station hours, "
+          f"{len(anomalies['score']):,} in total, scored until {hour_index_to_timestamp([anomalies['scored_until']])[0]}")
+
+    table = anomaly_table(anomalies, catalog_df, top)
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Ridership_Anomalies_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0'})
+        score_format = workbook.add_format({'num_format': '0.0'})
+        date_format = workbook.add_format({'num_format': 'mm/dd/yyyy hh:mm AM/PM'})
+        formats = {'ridership': number_format, 'expected': number_format, 'deviation': number_format,
+                   'score': score_format, 'transit_timestamp': date_format}
+
+        worksheet = write_table(writer, table, 'Anomalies', formats)
+        worksheet.set_column(0, 0, 8)
+        worksheet.set_column(1, 1, 40)
+        worksheet.set_column(2, 2, 24)
+        worksheet.set_column(3, len(table.columns) - 1, 14)
+
+    print(f"✅ Top {len(table):,} anomalies saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
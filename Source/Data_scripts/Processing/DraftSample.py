@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from RawData import to_hour_index, hour_index_to_timestamp
+from HourlyRollup import get_season
+from ExcelTables import write_table
+
+DRAFT_SAMPLE_FILE_NAME = "draft_sample.npz"
+
+# Rows kept for every station and month. About 1-2% of the raw rows, enough
+# for totals within a few percent; a draft report reads this in seconds.
+DRAFT_ROWS_PER_STRATUM = 100
+
+# z of the 95% confidence intervals reported with every draft estimate
+DRAFT_CONFIDENCE_Z = 1.96
+
+# Added to the period labels of draft reports, so every sheet, chart and file says so
+DRAFT_LABEL = "Draft"
+
+SAMPLE_COLUMNS = ['station_code', 'hour_index', 'ridership']
+
+
+def new_draft_sampler(rows_per_stratum=DRAFT_ROWS_PER_STRATUM, seed=0):
+    """
+    Create an empty stratified reservoir sample, one stratum per station and month
+
+    Every row gets a random priority and each stratum keeps the rows with
+    the lowest ones. That is a uniform sample without replacement of each
+    stratum however the rows arrive, so it can be filled chunk by chunk.
+    """
+    return {
+        'rows_per_stratum': rows_per_stratum,
+        'rng': np.random.default_rng(seed),
+        'priority': np.empty(0),
+        'stratum': np.empty(0, dtype=np.int64),
+        **{column: np.empty(0, dtype=np.float64 if column == 'ridership' else np.int64) for column in SAMPLE_COLUMNS},
+        'seen': {}
+    }
+
+
+def _strata(station_codes, hour_index):
+    """Stratum of every row: station code in the high bits, months since 1970 in the low 32."""
+    months = (np.asarray(hour_index, dtype=np.int64) // 24).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return (np.asarray(station_codes, dtype=np.int64) << 32) | months
+
+
+def update_draft_sampler(sampler, chunk, station_codes):
+    """Offer every row of a chunk to the reservoir of its station and month."""
+    hour_index = to_hour_index(chunk['transit_timestamp'])
+    stratum = _strata(station_codes, hour_index)
+    keys, counts = np.unique(stratum, return_counts=True)
+    for key, count in zip(keys.tolist(), counts.tolist()):
+        sampler['seen'][key] = sampler['seen'].get(key, 0) + count
+
+    candidates = {
+        'priority': np.concatenate([sampler['priority'], sampler['rng'].random(len(stratum))]),
+        'stratum': np.concatenate([sampler['stratum'], stratum]),
+        'station_code': np.concatenate([sampler['station_code'], np.asarray(station_codes, dtype=np.int64)]),
+        'hour_index': np.concatenate([sampler['hour_index'], hour_index]),
+        'ridership': np.concatenate([sampler['ridership'], chunk['ridership'].to_numpy(dtype=np.float64)])
+    }
+
+    # Rank inside each stratum by priority and keep the lowest rows_per_stratum
+    order = np.lexsort((candidates['priority'], candidates['stratum']))
+    sorted_strata = candidates['stratum'][order]
+    starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    keep = order[rank < sampler['rows_per_stratum']]
+    for column, values in candidates.items():
+        sampler[column] = values[keep]
+
+
+def save_draft_sample(sampler, processed_dir):
+    """Save the sampled rows and the number of raw rows of every stratum."""
+    output_file = processed_dir / DRAFT_SAMPLE_FILE_NAME
+    strata = np.array(sorted(sampler['seen']), dtype=np.int64)
+    np.savez(output_file,
+             **{column: sampler[column] for column in ['stratum'] + SAMPLE_COLUMNS},
+             strata=strata,
+             population=np.array([sampler['seen'][key] for key in strata.tolist()], dtype=np.int64))
+    return output_file
+
+
+def load_draft_sample(processed_dir):
+    """Load the sample written by save_draft_sample."""
+    sample_file = Path(processed_dir) / DRAFT_SAMPLE_FILE_NAME
+    if not sample_file.exists():
+        raise FileNotFoundError(f"🚨 Draft sample not found: {sample_file}. Run IngestRawData.py first.")
+    with np.load(sample_file) as data:
+        return {column: data[column] for column in ['stratum', 'strata', 'population'] + SAMPLE_COLUMNS}
+
+
+def draft_periods(periods):
+    """The same periods with DRAFT_LABEL added to their labels."""
+    return [{**period, 'label': f"{period['label']} {DRAFT_LABEL}"} for period in periods]
+
+
+def draft_rows(sample, catalog_df, period):
+    """
+    Sampled rows inside a period, ready for the estimators
+
+    Returns:
+        DataFrame: station_complex_id, station_complex, borough,
+        transit_timestamp, hour, date, day_of_week, month, season and
+        ridership of every row, plus its stratum with the stratum's raw
+        ('population') and sampled row counts
+    """
+    inside = (sample['hour_index'] >= period['start_hour']) & (sample['hour_index'] < period['end_hour'])
+    stratum = sample['stratum'][inside]
+    position = np.searchsorted(sample['strata'], stratum)
+    sampled = np.bincount(np.searchsorted(sample['strata'], sample['stratum']), minlength=len(sample['strata']))
+
+    stations = catalog_df.reset_index().set_index('station_code')
+    codes = sample['station_code'][inside]
+    timestamps = hour_index_to_timestamp(sample['hour_index'][inside])
+    return pd.DataFrame({
+        'station_complex_id': stations['station_complex_id'].reindex(codes).to_numpy(),
+        'station_complex': stations['station_complex'].reindex(codes).to_numpy(),
+        'borough': stations['borough'].reindex(codes).to_numpy(),
+        'transit_timestamp': timestamps,
+        'hour': timestamps.hour,
+        'date': timestamps.normalize(),
+        'day_of_week': timestamps.day_name(),
+        'month': timestamps.month,
+        'season': timestamps.month.map(get_season),
+        'ridership': sample['ridership'][inside],
+        'stratum': stratum,
+        'population': sample['population'][position],
+        'sampled': sampled[position]
+    })
+
+
+def _cells(rows, by):
+    """Sum, sum of squares and row count of the ridership of every stratum x group."""
+    cells = rows.assign(ridership_sq=rows['ridership'] ** 2).groupby(['stratum'] + by, sort=False).agg(
+        s=('ridership', 'sum'), q=('ridership_sq', 'sum'), m=('ridership', 'size'),
+        N=('population', 'first'), n=('sampled', 'first')).reset_index()
+    cells['weight'] = cells['N'] / cells['n']
+    # N^2 (1 - n/N) / n / (n - 1): the stratum's share of the variance per unit of sample variance
+    cells['factor'] = np.where(cells['n'] > 1, cells['N'] ** 2 * (1 - cells['n'] / cells['N']) / cells['n'] / np.maximum(cells['n'] - 1, 1), 0.0)
+    return cells
+
+
+def _interval(groups, estimate, variance, z):
+    """Estimate table with its standard error and confidence bounds."""
+    standard_error = np.sqrt(np.maximum(variance, 0))
+    return groups.assign(estimate=estimate, standard_error=standard_error,
+                         low=estimate - z * standard_error, high=estimate + z * standard_error)
+
+
+def estimate_totals(rows, by, z=DRAFT_CONFIDENCE_Z):
+    """
+    Stratified estimate of the total ridership of every group
+
+    Each stratum's sampled rows stand for all its raw rows (weight N/n). A
+    group that cuts across strata, such as an hour of the day, is handled
+    as ridership that is zero outside the group, so one formula covers all.
+
+    Args:
+        rows (DataFrame): From draft_rows
+        by (list): Columns to group by
+
+    Returns:
+        DataFrame: The by columns, estimate, standard_error, low and high
+    """
+    cells = _cells(rows, by)
+    # Sample variance of the zero-filled ridership inside its stratum, times n - 1
+    cells['ss'] = cells['q'] - cells['s'] ** 2 / cells['n']
+    cells['total'] = cells['weight'] * cells['s']
+    cells['variance'] = cells['factor'] * cells['ss']
+    grouped = cells.groupby(by, sort=True)[['total', 'variance']].sum().reset_index()
+    return _interval(grouped[by], grouped['total'].to_numpy(), grouped['variance'].to_numpy(), z)
+
+
+def estimate_means(rows, by, z=DRAFT_CONFIDENCE_Z):
+    """
+    Stratified estimate of the average ridership per raw row of every group
+
+    The ratio of the estimated total to the estimated number of rows, with
+    its linearized variance.
+
+    Returns:
+        DataFrame: The by columns, estimate, standard_error, low and high
+    """
+    cells = _cells(rows, by)
+    cells['total'] = cells['weight'] * cells['s']
+    cells['count'] = cells['weight'] * cells['m']
+    grouped = cells.groupby(by, sort=True)[['total', 'count']].sum()
+    ratio = grouped['total'] / grouped['count']
+
+    # Residuals y - ratio inside the group, zero outside it
+    r = ratio.reindex(pd.MultiIndex.from_frame(cells[by]) if len(by) > 1 else cells[by[0]]).to_numpy()
+    residual_sum = cells['s'] - r * cells['m']
+    residual_sq = cells['q'] - 2 * r * cells['s'] + r ** 2 * cells['m']
+    cells['variance'] = cells['factor'] * (residual_sq - residual_sum ** 2 / cells['n'])
+    variance = cells.groupby(by, sort=True)['variance'].sum() / grouped['count'] ** 2
+    return _interval(grouped.reset_index()[by], ratio.to_numpy(), variance.to_numpy(), z)
+
+
+def save_draft_intervals(tables, output_dir, report_name):
+    """
+    Write the confidence intervals of a draft report next to it
+
+    Args:
+        tables (dict): Sheet name -> table from estimate_totals or estimate_means
+        output_dir (Path): Reports directory
+        report_name (str): Used in the file name
+
+    Returns:
+        Path: The Excel file
+    """
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = Path(output_dir) / f"DRAFT_{report_name}_Confidence_Intervals_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0.00'})
+        numeric = ['estimate', 'standard_error', 'low', 'high']
+        for sheet_name, table in tables.items():
+            worksheet = write_table(writer, table, sheet_name, {col: number_format for col in numeric})
+            for idx, col in enumerate(table.columns):
+                worksheet.set_column(idx, idx, 40 if col == 'station_complex' else 16)
+    return output_file
+
+
+def print_draft_total(label, rows, z=DRAFT_CONFIDENCE_Z):
+    """Print a period's estimated total ridership with its margin of error."""
+    if rows.empty:
+        print(f"📝 {label}: no sampled rows in this period, left out of the report")
+        return
+    total = estimate_totals(rows.assign(period=label), ['period'], z).iloc[0]
+    margin = total['high'] - total['estimate']
+    print(f"📝 {label}: estimated total {total['estimate']:,.0f} ± {margin:,.0f} "
+          f"({margin / max(total['estimate'], 1):.1%}, 95% confidence)")
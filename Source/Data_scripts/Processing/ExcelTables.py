@@ -0,0 +1,47 @@
+TABLE_STYLE = 'Table Style Medium 2'
+
+# Excel's limit on the length of a sheet name
+SHEET_NAME_LENGTH = 31
+
+
+def unique_sheet_name(writer, sheet_name):
+    """
+    Cut a sheet name to Excel's limit, numbering it when the cut name is already taken
+
+    Excel compares sheet names case-insensitively, so long labels that
+    share a prefix would otherwise collide once cut.
+    """
+    taken = {name.lower() for name in writer.sheets}
+    name = sheet_name[:SHEET_NAME_LENGTH]
+    number = 2
+    while name.lower() in taken:
+        suffix = f" ({number})"
+        name = sheet_name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+        number += 1
+    return name
+
+
+def write_table(writer, df, sheet_name, formats=None):
+    """
+    Write a DataFrame to its own sheet as a formatted Excel table
+
+    Args:
+        writer (ExcelWriter): An xlsxwriter ExcelWriter
+        df (DataFrame): Table to write, without its index
+        sheet_name (str): Cut to Excel's 31 characters and numbered if already taken
+        formats (dict): Column name -> xlsxwriter format of that column's cells
+
+    Returns:
+        Worksheet: The new sheet, e.g. to set its column widths
+    """
+    formats = formats or {}
+    sheet_name = unique_sheet_name(writer, sheet_name)
+    df.to_excel(writer, sheet_name=sheet_name, index=False)
+    worksheet = writer.sheets[sheet_name]
+    # An empty table still needs one row under its header
+    worksheet.add_table(0, 0, max(len(df), 1), len(df.columns) - 1, {
+        'columns': [{'header': str(col), 'format': formats[col]} if col in formats else {'header': str(col)}
+                    for col in df.columns],
+        'style': TABLE_STYLE
+    })
+    return worksheet
@@ -0,0 +1,228 @@
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import load_rollup
+from StationCatalog import load_station_catalog
+from RawData import to_hour_index, hour_index_to_timestamp
+from ExcelTables import write_table
+
+HOURS_PER_WEEK = 168
+
+# Whole weeks of history, ending at the last midnight in the data, the models are fitted on
+FORECAST_TRAINING_WEEKS = 8
+
+# Smoothing parameters tried for every station; each station keeps the set
+# with the lowest one-step-ahead squared error over its training weeks
+HOLT_WINTERS_ALPHAS = [0.02, 0.1, 0.3]   # level
+HOLT_WINTERS_GAMMAS = [0.05, 0.2]        # daily seasonality
+HOLT_WINTERS_DELTAS = [0.05, 0.2]        # weekly seasonality
+
+FORECAST_MODELS = ['seasonal_naive', 'holt_winters']
+
+
+def training_matrix(rollup, weeks=FORECAST_TRAINING_WEEKS):
+    """
+    Cut the last whole weeks of the rollup into dense station x hour arrays
+
+    Hours a station has no rows for are 0.
+
+    Returns:
+        dict: 'start' (hour index of the first column, a midnight), 'sums'
+        and 'counts' arrays of shape (stations, weeks * 168)
+    """
+    end = (int(rollup['hour_index'].max()) + 1) // 24 * 24
+    start = end - weeks * HOURS_PER_WEEK
+    n_stations = int(rollup['station_code'].max()) + 1
+    mask = (rollup['hour_index'] >= start) & (rollup['hour_index'] < end)
+
+    sums = np.zeros((n_stations, end - start))
+    counts = np.zeros((n_stations, end - start))
+    sums[rollup['station_code'][mask], rollup['hour_index'][mask] - start] = rollup['sum'][mask]
+    counts[rollup['station_code'][mask], rollup['hour_index'][mask] - start] = rollup['count'][mask]
+    return {'start': start, 'sums': sums, 'counts': counts}
+
+
+def seasonal_naive_forecast(history, horizon, season=HOURS_PER_WEEK):
+    """Repeat the last season (by default the last week) of every station."""
+    last_season = history[:, -season:]
+    repeats = -(-horizon // season)
+    return np.tile(last_season, (1, repeats))[:, :horizon]
+
+
+def holt_winters_forecast(history, horizon):
+    """
+    Additive Holt-Winters with a daily and a weekly season, fitted for all stations at once
+
+    The level, the 24 daily and the 168 weekly seasonal terms of every station
+    and every parameter set in the grid are updated together, one hour of
+    history at a time, so the loop runs over hours and never over stations.
+    There is no trend term: a month ahead, ridership is driven by its seasons.
+
+    Args:
+        history (ndarray): Hourly ridership, shape (stations, hours), starting
+            at midnight and covering at least two whole weeks
+        horizon (int): Number of hours to forecast after the history
+
+    Returns:
+        tuple: (forecast of shape (stations, horizon), chosen (alpha, gamma,
+        delta) of each station of shape (stations, 3))
+    """
+    n_stations, n_hours = history.shape
+    if n_hours < 2 * HOURS_PER_WEEK:
+        raise ValueError("Holt-Winters needs at least two weeks of hourly history")
+
+    grid = np.array(list(itertools.product(HOLT_WINTERS_ALPHAS, HOLT_WINTERS_GAMMAS, HOLT_WINTERS_DELTAS)))
+    alpha, gamma, delta = grid[:, 0], grid[:, 1], grid[:, 2]
+
+    # Start from the first week: its mean, the average day and what is left per hour of the week
+    first_week = history[:, :HOURS_PER_WEEK]
+    level0 = first_week.mean(axis=1)
+    daily0 = first_week.reshape(n_stations, 7, 24).mean(axis=1) - level0[:, None]
+    weekly0 = first_week - level0[:, None] - np.tile(daily0, (1, 7))
+
+    level = np.repeat(level0[:, None], len(grid), axis=1)
+    daily = np.repeat(daily0[:, None, :], len(grid), axis=1)
+    weekly = np.repeat(weekly0[:, None, :], len(grid), axis=1)
+    squared_error = np.zeros((n_stations, len(grid)))
+
+    for t in range(HOURS_PER_WEEK, n_hours):
+        hour_of_day, hour_of_week = t % 24, t % HOURS_PER_WEEK
+        error = history[:, t, None] - (level + daily[:, :, hour_of_day] + weekly[:, :, hour_of_week])
+        squared_error += error * error
+        level += alpha * error
+        daily[:, :, hour_of_day] += gamma * (1 - alpha) * error
+        weekly[:, :, hour_of_week] += delta * (1 - alpha) * error
+
+    best = squared_error.argmin(axis=1)
+    rows = np.arange(n_stations)
+    future = np.arange(n_hours, n_hours + horizon)
+    forecast = (level[rows, best][:, None]
+                + daily[rows, best][:, future % 24]
+                + weekly[rows, best][:, future % HOURS_PER_WEEK])
+    return np.maximum(forecast, 0), grid[best]
+
+
+def forecast_hours(history, horizon, model='holt_winters'):
+    """Forecast the next `horizon` hours of every station with one of FORECAST_MODELS."""
+    if model == 'seasonal_naive':
+        return seasonal_naive_forecast(history, horizon)
+    if model == 'holt_winters':
+        return holt_winters_forecast(history, horizon)[0]
+    raise ValueError(f"Unknown forecast model: {model}")
+
+
+def backtest(history, holdout=HOURS_PER_WEEK):
+    """Mean absolute error of every model per station when the last `holdout` hours are held out."""
+    train, actual = history[:, :-holdout], history[:, -holdout:]
+    return {model: np.abs(forecast_hours(train, holdout, model) - actual).mean(axis=1) for model in FORECAST_MODELS}
+
+
+def next_month_forecast(rollup, model='holt_winters', weeks=FORECAST_TRAINING_WEEKS):
+    """
+    Forecast every hour of the first whole calendar month after the data ends
+
+    Returns:
+        dict: 'month' as (year, month), 'forecast' of shape (stations, days, 24)
+        with the forecast hourly ridership, and 'rows_per_hour' of shape
+        (stations, 24) with the average number of raw rows per station and
+        hour of day over the training weeks
+    """
+    training = training_matrix(rollup, weeks)
+    history_end = training['start'] + training['sums'].shape[1]
+    month_start = (hour_index_to_timestamp([history_end - 1])[0] + pd.offsets.MonthBegin(1)).normalize()
+    month_end = month_start + pd.offsets.MonthBegin(1)
+    offset = int(to_hour_index([month_start])[0]) - history_end
+    horizon = int(to_hour_index([month_end])[0]) - history_end
+
+    forecast = forecast_hours(training['sums'], horizon, model)[:, offset:]
+    n_stations = forecast.shape[0]
+    return {
+        'month': (month_start.year, month_start.month),
+        'forecast': forecast.reshape(n_stations, -1, 24),
+        'rows_per_hour': training['counts'].reshape(n_stations, -1, 24).mean(axis=1)
+    }
+
+
+def forecast_month_station_data(rollup, catalog_df, hour_labels, model='holt_winters', weeks=FORECAST_TRAINING_WEEKS):
+    """
+    Build the month_station_data structure of CreateChartsForEachMonthINPowerPoint for the forecast month
+
+    The sums are the forecast ridership of each hour of the day added up over
+    the month, and the counts the number of raw rows those hours usually
+    have, so sums / counts is on the same scale as the historical charts.
+
+    Returns:
+        tuple: ({((year, month), station_id): {"name", "sums", "counts"}}, {(year, month)})
+    """
+    result = next_month_forecast(rollup, model, weeks)
+    n_days = result['forecast'].shape[1]
+    sums = result['forecast'].sum(axis=1)
+    counts = result['rows_per_hour'] * n_days
+    stations = catalog_df.reset_index().set_index('station_code')
+
+    month_station_data = {}
+    for code in np.flatnonzero(counts.sum(axis=1) > 0):
+        month_station_data[(result['month'], stations.at[code, 'station_complex_id'])] = {
+            "name": stations.at[code, 'station_complex'],
+            "sums": dict(zip(hour_labels, sums[code])),
+            "counts": dict(zip(hour_labels, counts[code]))
+        }
+    return month_station_data, {result['month']}
+
+
+def forecast_table(rollup, catalog_df, weeks=FORECAST_TRAINING_WEEKS):
+    """
+    Average forecast ridership per hour of the day of every station for the next month, one column per model
+
+    Returns:
+        tuple: ((year, month) forecast, DataFrame with station_complex, hour
+        and one column per model)
+    """
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+    columns = {}
+    for model in FORECAST_MODELS:
+        result = next_month_forecast(rollup, model, weeks)
+        columns[model] = result['forecast'].mean(axis=1).ravel()
+
+    n_stations = len(columns[FORECAST_MODELS[0]]) // 24
+    table = pd.DataFrame({
+        'station_complex': np.repeat(names.reindex(np.arange(n_stations)).to_numpy(), 24),
+        'hour': np.tile(np.arange(24), n_stations),
+        **columns
+    })
+    active = result['rows_per_hour'].sum(axis=1) > 0
+    return result['month'], table[np.repeat(active, 24)].sort_values(by=['station_complex', 'hour'])
+
+
+def main():
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+
+    (year, month), table = forecast_table(rollup, catalog_df)
+    errors = backtest(training_matrix(rollup)['sums'])
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+    backtest_df = pd.DataFrame({'station_complex': names.reindex(np.arange(len(errors['holt_winters']))).to_numpy(), **errors})
+    backtest_df = backtest_df.dropna(subset=['station_complex']).sort_values('station_complex')
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Hourly_Ridership_Forecast_{month}_{year}_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        number_format = writer.book.add_format({'num_format': '#,##0.0'})
+        for sheet_name, df in [(f"Forecast {month}-{year}", table), ("Backtest MAE last week", backtest_df)]:
+            worksheet = write_table(writer, df, sheet_name, {model: number_format for model in FORECAST_MODELS})
+            worksheet.set_column(0, 0, 40)
+            worksheet.set_column(1, len(df.columns) - 1, 16)
+
+    print(f"✅ Hourly ridership forecast for {month}/{year} saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
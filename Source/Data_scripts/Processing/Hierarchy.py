@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from StationCatalog import UNKNOWN_BOROUGH
+
+# Levels of the ridership hierarchy, from the finest to the coarsest
+HIERARCHY_LEVELS = ['station', 'borough', 'system']
+
+# Name of the one node of the system level in tables
+SYSTEM_LABEL = "System"
+
+
+def station_hierarchy(boroughs):
+    """
+    Link every station to its borough
+
+    Args:
+        boroughs (array-like): Borough of every station, in station order
+
+    Returns:
+        dict: 'parent' (borough code of every station) and 'boroughs'
+        (borough names in code order, sorted)
+    """
+    boroughs = pd.Series(np.asarray(boroughs, dtype=object)).fillna(UNKNOWN_BOROUGH)
+    parent, names = pd.factorize(boroughs, sort=True)
+    return {'parent': parent.astype(np.int32), 'boroughs': np.asarray(names, dtype=object)}
+
+
+def catalog_hierarchy(catalog_df):
+    """station_hierarchy of the catalog, with the station codes as positions."""
+    boroughs = np.full(int(catalog_df['station_code'].max()) + 1, UNKNOWN_BOROUGH, dtype=object)
+    boroughs[catalog_df['station_code'].to_numpy()] = catalog_df['borough'].to_numpy()
+    return station_hierarchy(boroughs)
+
+
+def rollup_hierarchy(station_values, hierarchy):
+    """
+    Borough and system totals of station aggregates, all levels in one pass
+
+    Args:
+        station_values (ndarray): Station aggregates of shape (stations, ...),
+            e.g. (stations, periods) or (stations, periods, hours)
+        hierarchy (dict): From station_hierarchy or catalog_hierarchy
+
+    Returns:
+        dict: 'station', 'borough' (shape (boroughs, ...)) and 'system' (shape
+        (...)). Each borough is the sum of its stations and the system the sum
+        of the boroughs, so the levels always add up
+    """
+    values = np.asarray(station_values, dtype=np.float64)
+    n_stations, n_boroughs = len(values), len(hierarchy['boroughs'])
+
+    # Borough x station membership matrix: one product adds up every borough
+    membership = np.zeros((n_boroughs, n_stations))
+    membership[hierarchy['parent'], np.arange(n_stations)] = 1
+    borough = (membership @ values.reshape(n_stations, -1)).reshape((n_boroughs,) + values.shape[1:])
+
+    return {'station': values, 'borough': borough, 'system': borough.sum(axis=0)}
+
+
+def hierarchy_levels(station_values, hierarchy, axis=0):
+    """
+    rollup_hierarchy of an aggregate whose stations are on any axis
+
+    Args:
+        station_values (ndarray): Station aggregates, e.g. shape (periods, stations, hours)
+        hierarchy (dict): From station_hierarchy or catalog_hierarchy
+        axis (int): Axis of the stations
+
+    Returns:
+        dict: 'station', 'borough' and 'system', laid out like station_values
+        with the station axis replaced by the boroughs and by a single
+        system entry
+    """
+    levels = rollup_hierarchy(np.moveaxis(np.asarray(station_values), axis, 0), hierarchy)
+    return {
+        'station': np.asarray(station_values, dtype=np.float64),
+        'borough': np.moveaxis(levels['borough'], 0, axis),
+        'system': np.expand_dims(levels['system'], axis)
+    }
+
+
+def _share(values, parent_values):
+    """values / parent_values, 0 where the parent is 0."""
+    parent_values = np.broadcast_to(parent_values, values.shape)
+    return np.divide(values, parent_values, out=np.zeros(values.shape), where=parent_values != 0)
+
+
+def hierarchy_shares(levels, hierarchy):
+    """
+    Share of every node in its parent and in the system
+
+    Returns:
+        dict: 'station_of_borough', 'station_of_system' and 'borough_of_system',
+        each shaped like the level it describes
+    """
+    return {
+        'station_of_borough': _share(levels['station'], levels['borough'][hierarchy['parent']]),
+        'station_of_system': _share(levels['station'], levels['system']),
+        'borough_of_system': _share(levels['borough'], levels['system'])
+    }
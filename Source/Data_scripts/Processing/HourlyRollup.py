@@ -0,0 +1,276 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from RawData import hour_index_to_timestamp
+from StationCatalog import load_station_catalog
+
+ROLLUP_FILE_NAME = "hourly_rollup.npz"
+
+# Merge the buffered partial rollups once they hold this many rows
+ROLLUP_MERGE_ROWS = 5000000
+
+# Columns of a rollup: one row per (station, hour) with the sum, count, min
+# and max of the raw ridership rows (payment method / fare class splits)
+# and the sum of their transfers
+ROLLUP_COLUMNS = ['station_code', 'hour_index', 'sum', 'count', 'min', 'max', 'transfers']
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def get_season(month):
+    """Returns the season based on the month number."""
+    if month in [12, 1, 2]:
+        return 'Winter'
+    elif month in [3, 4, 5]:
+        return 'Spring'
+    elif month in [6, 7, 8]:
+        return 'Summer'
+    elif month in [9, 10, 11]:
+        return 'Fall'
+
+
+def _reduce_sorted(station_codes, hour_indexes, sums, counts, mins, maxs, transfers):
+    """Collapse rows sharing a (station, hour) key into one rollup row."""
+    order = np.lexsort((hour_indexes, station_codes))
+    station_codes, hour_indexes = station_codes[order], hour_indexes[order]
+    new_key = np.ones(len(order), dtype=bool)
+    new_key[1:] = (station_codes[1:] != station_codes[:-1]) | (hour_indexes[1:] != hour_indexes[:-1])
+    starts = np.flatnonzero(new_key)
+
+    return {
+        'station_code': station_codes[starts].astype(np.int32),
+        'hour_index': hour_indexes[starts].astype(np.int32),
+        'sum': np.add.reduceat(sums[order], starts).astype(np.float64),
+        'count': np.add.reduceat(counts[order], starts).astype(np.int32),
+        'min': np.minimum.reduceat(mins[order], starts).astype(np.float32),
+        'max': np.maximum.reduceat(maxs[order], starts).astype(np.float32),
+        'transfers': np.add.reduceat(transfers[order], starts).astype(np.float64)
+    }
+
+
+def empty_rollup():
+    """Return a rollup with no rows."""
+    return {
+        'station_code': np.empty(0, dtype=np.int32),
+        'hour_index': np.empty(0, dtype=np.int32),
+        'sum': np.empty(0, dtype=np.float64),
+        'count': np.empty(0, dtype=np.int32),
+        'min': np.empty(0, dtype=np.float32),
+        'max': np.empty(0, dtype=np.float32),
+        'transfers': np.empty(0, dtype=np.float64)
+    }
+
+
+def rollup_chunk(chunk, station_codes):
+    """Build the partial rollup of one cleaned chunk from read_raw_chunks."""
+    if chunk.empty:
+        return empty_rollup()
+    ridership = chunk['ridership'].to_numpy(dtype=np.float64)
+    return _reduce_sorted(
+        np.asarray(station_codes, dtype=np.int32),
+        chunk['hour_index'].to_numpy(dtype=np.int64),
+        ridership,
+        np.ones(len(ridership), dtype=np.int32),
+        ridership,
+        ridership,
+        chunk['transfers'].to_numpy(dtype=np.float64)
+    )
+
+
+def merge_rollups(rollups):
+    """
+    Merge partial rollups into one
+
+    Partials can overlap on any (station, hour) key, e.g. when an hour is split
+    across two CSV chunks; sums, counts and transfers are added and min/max are combined.
+    """
+    rollups = [rollup for rollup in rollups if len(rollup['station_code'])]
+    if not rollups:
+        return empty_rollup()
+    merged = {column: np.concatenate([rollup[column] for rollup in rollups]) for column in ROLLUP_COLUMNS}
+    return _reduce_sorted(merged['station_code'], merged['hour_index'], merged['sum'],
+                          merged['count'], merged['min'], merged['max'], merged['transfers'])
+
+
+def new_rollup_builder():
+    """Create the state used by add_chunk_to_rollup during the ingest scan."""
+    return {'merged': empty_rollup(), 'parts': [], 'rows': 0}
+
+
+def add_chunk_to_rollup(builder, chunk, station_codes):
+    """
+    Add one chunk to the rollup being built
+
+    The partial rollups are buffered apart from the merged part and only
+    merged into it once they hold ROLLUP_MERGE_ROWS rows and at least as
+    many rows as the merged part. The merged part then grows geometrically,
+    so the whole scan re-sorts every row only a logarithmic number of times.
+    """
+    part = rollup_chunk(chunk, station_codes)
+    builder['parts'].append(part)
+    builder['rows'] += len(part['station_code'])
+
+    if builder['rows'] >= max(ROLLUP_MERGE_ROWS, len(builder['merged']['station_code'])):
+        builder['merged'] = merge_rollups([builder['merged']] + builder['parts'])
+        builder['parts'] = []
+        builder['rows'] = 0
+
+
+def finish_rollup(builder):
+    """Merge everything buffered by add_chunk_to_rollup into the final rollup."""
+    return merge_rollups([builder['merged']] + builder['parts'])
+
+
+def save_rollup(rollup, processed_dir):
+    """Save a rollup to the processed data directory."""
+    output_file = processed_dir / ROLLUP_FILE_NAME
+    np.savez(output_file, **rollup)
+    return output_file
+
+
+def load_rollup(processed_dir):
+    """Load the rollup written by save_rollup."""
+    rollup_file = processed_dir / ROLLUP_FILE_NAME
+    if not rollup_file.exists():
+        raise FileNotFoundError(f"🚨 Hourly rollup not found: {rollup_file}. Run IngestRawData.py first.")
+    with np.load(rollup_file) as data:
+        return {column: data[column] for column in ROLLUP_COLUMNS}
+
+
+def load_processed_rollup(processed_dir):
+    """
+    Load the hourly rollup and the station catalog for the Analysis scripts
+
+    Returns:
+        tuple: (rollup, catalog DataFrame), or (None, None) when IngestRawData.py
+        has not been run yet so the caller can fall back to the raw CSV
+    """
+    processed_dir = Path(processed_dir)
+    try:
+        rollup = load_rollup(processed_dir)
+        catalog_df = load_station_catalog(processed_dir)
+    except FileNotFoundError as e:
+        print(f"{e} Falling back to the raw CSV.")
+        return None, None
+
+    print(f"✅ Using the hourly rollup from {processed_dir}")
+    return rollup, catalog_df
+
+
+def select_period(rollup, period):
+    """Return the rows of a rollup that fall in a period from Periods.define_periods."""
+    mask = (rollup['hour_index'] >= period['start_hour']) & (rollup['hour_index'] < period['end_hour'])
+    return {column: values[mask] for column, values in rollup.items()}
+
+
+def rollup_to_frame(rollup, catalog_df):
+    """
+    Convert a rollup into a DataFrame with station names and calendar columns
+
+    Args:
+        rollup (dict): Rollup arrays
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+
+    Returns:
+        DataFrame: Rollup rows with station_complex_id, station_complex,
+        transit_timestamp, date, year, month, hour and day_of_week added
+    """
+    df = pd.DataFrame(rollup)
+    stations = catalog_df.reset_index().set_index('station_code')
+    df['station_complex_id'] = stations['station_complex_id'].reindex(df['station_code']).to_numpy()
+    df['station_complex'] = stations['station_complex'].reindex(df['station_code']).to_numpy()
+
+    timestamps = hour_index_to_timestamp(df['hour_index'])
+    df['transit_timestamp'] = timestamps
+    df['date'] = timestamps.normalize()
+    df['year'] = timestamps.year
+    df['month'] = timestamps.month
+    df['hour'] = timestamps.hour
+    df['day_of_week'] = timestamps.day_name()
+    return df
+
+
+def station_totals_by_period(rollup, catalog_df, periods):
+    """
+    Same output as load_data in TotalNumberOfRidersForTheYear, computed from the rollup
+
+    Returns:
+        DataFrame: station_complex, borough and the total ridership of every
+        period (NaN for stations without rows in the period)
+    """
+    n_stations = int(catalog_df['station_code'].max()) + 1
+    totals = {}
+    for period in periods:
+        selected = select_period(rollup, period)
+        ridership = np.bincount(selected['station_code'], weights=selected['sum'], minlength=n_stations)
+        rows = np.bincount(selected['station_code'], minlength=n_stations)
+        totals[period['label']] = np.where(rows > 0, ridership, np.nan)
+
+    stations = catalog_df.reset_index().set_index('station_code').sort_index()
+    df = pd.DataFrame({label: values[stations.index] for label, values in totals.items()})
+    df.insert(0, 'station_complex', stations['station_complex'].to_numpy())
+    df.insert(1, 'borough', stations['borough'].to_numpy())
+    # Stations sharing a name are reported together, as in the raw CSV path
+    df = df.groupby(['station_complex', 'borough'], sort=False).sum(min_count=1).reset_index()
+    return df.dropna(subset=list(totals), how='all').reset_index(drop=True)
+
+
+def seasonal_ridership_by_station(rollup, catalog_df, period):
+    """Same output as SeasonalData.calculate_seasonal_ridership_by_station, computed from the rollup."""
+    df = rollup_to_frame(select_period(rollup, period), catalog_df)
+    df['season'] = df['month'].map(get_season)
+    totals = df.pivot_table(index='station_complex', columns='season', values='sum', aggfunc='sum', fill_value=0)
+    totals = totals.reindex(columns=['Winter', 'Spring', 'Summer', 'Fall'], fill_value=0)
+    return totals.to_dict(orient='index')
+
+
+def average_daily_ridership_by_day_of_week(rollup, period):
+    """Same output as process_period_data in AverageNumberOfRidersForEachDayOfTheWeek, computed from the rollup."""
+    rollup = select_period(rollup, period)
+    dates = hour_index_to_timestamp(rollup['hour_index']).normalize()
+    daily = pd.Series(rollup['sum']).groupby(dates).sum()
+    return daily.groupby(daily.index.day_name()).mean().reindex(DAYS_OF_WEEK)
+
+
+def hourly_average_by_station(rollup, catalog_df, periods):
+    """Same output as process_data_in_chunks in AverageNumberOfRiders2023and2024Sep, computed from the rollup."""
+    result = {}
+    for period in periods:
+        df = rollup_to_frame(select_period(rollup, period), catalog_df)
+        grouped = df.groupby(['station_complex_id', 'station_complex', 'hour'])[['sum', 'count']].sum().reset_index()
+        grouped['ridership'] = grouped['sum'] / grouped['count']
+        result[period['label']] = grouped[['station_complex_id', 'station_complex', 'hour', 'ridership']].sort_values(by=['station_complex', 'hour'])
+    return result
+
+
+def monthly_station_hourly_data(rollup, catalog_df, period, hour_labels):
+    """
+    Build the month_station_data structure of CreateChartsForEachMonthINPowerPoint from the rollup
+
+    Args:
+        rollup (dict): Rollup arrays
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+        period (dict): Period from Periods.define_periods
+        hour_labels (list): AM/PM label of each hour 0-23
+
+    Returns:
+        tuple: ({((year, month), station_id): {"name", "sums", "counts"}}, set of (year, month) seen)
+    """
+    df = rollup_to_frame(select_period(rollup, period), catalog_df)
+    grouped = df.groupby(['year', 'month', 'station_complex_id', 'station_complex', 'hour'])[['sum', 'count']].sum()
+
+    month_station_data = {}
+    for (year, month, station_id, station_name, hour), row in grouped.iterrows():
+        key = ((int(year), int(month)), station_id)
+        if key not in month_station_data:
+            month_station_data[key] = {
+                "name": station_name,
+                "sums": {h: 0 for h in hour_labels},
+                "counts": {h: 0 for h in hour_labels}
+            }
+        month_station_data[key]["sums"][hour_labels[hour]] += row['sum']
+        month_station_data[key]["counts"][hour_labels[hour]] += row['count']
+
+    months_seen = set(zip(df['year'].astype(int), df['month'].astype(int)))
+    return month_station_data, months_seen
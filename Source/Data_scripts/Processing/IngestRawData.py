@@ -0,0 +1,84 @@
+import gc
+
+from RawData import CHUNK_SIZE, define_paths, read_raw_chunks
+from StationCatalog import new_station_catalog, update_station_catalog, finalize_station_catalog, save_station_catalog
+from RowGroupStore import new_row_group_writer, write_chunk, close_row_group_writer
+from HourlyRollup import new_rollup_builder, add_chunk_to_rollup, finish_rollup, save_rollup
+from TimePyramid import build_time_pyramid, save_time_pyramid
+from QuantileSketch import new_quantile_bank, update_quantile_bank, save_quantile_bank
+from TopKStations import new_top_k_tracker, update_top_k_tracker, save_top_k_tracker
+from DraftSample import new_draft_sampler, update_draft_sampler, save_draft_sample
+
+
+def ingest(file_path, processed_dir, chunksize=CHUNK_SIZE):
+    """
+    Scan the raw CSV once and build everything the other scripts read from Data/processed
+
+    Args:
+        file_path (Path): Path to the raw CSV file
+        processed_dir (Path): Directory the processed outputs are written to
+        chunksize (int): Number of rows to process at once
+
+    Returns:
+        DataFrame: The finalized station catalog
+    """
+    catalog = new_station_catalog()
+    store_writer = new_row_group_writer(processed_dir)
+    rollup_builder = new_rollup_builder()
+    top_k_tracker = new_top_k_tracker()
+    draft_sampler = new_draft_sampler()
+    rows_processed = 0
+
+    print(f"Loading and processing data from {file_path} in chunks...")
+    for chunk_num, chunk in enumerate(read_raw_chunks(file_path, chunksize=chunksize)):
+        if chunk_num % 10 == 0:
+            print(f"Processing chunk {chunk_num}...")
+
+        station_codes = update_station_catalog(catalog, chunk)
+        write_chunk(store_writer, chunk, station_codes)
+        add_chunk_to_rollup(rollup_builder, chunk, station_codes)
+        update_top_k_tracker(top_k_tracker, chunk, station_codes)
+        update_draft_sampler(draft_sampler, chunk, station_codes)
+        rows_processed += len(chunk)
+
+        del chunk
+        gc.collect()
+
+    print(f"\nProcessed {rows_processed} total rows")
+
+    catalog_df = finalize_station_catalog(catalog)
+    catalog_file = save_station_catalog(catalog_df, processed_dir)
+    print(f"✅ Station catalog with {len(catalog_df)} stations saved to: {catalog_file}")
+
+    manifest_file = close_row_group_writer(store_writer)
+    print(f"✅ Processed store with {len(store_writer['zone_maps'])} row groups saved to: {manifest_file.parent}")
+
+    rollup = finish_rollup(rollup_builder)
+    rollup_file = save_rollup(rollup, processed_dir)
+    print(f"✅ Hourly rollup with {len(rollup['sum'])} station/hour rows "
+          f"({rows_processed / max(len(rollup['sum']), 1):.1f}x fewer than raw) saved to: {rollup_file}")
+
+    pyramid_file = save_time_pyramid(build_time_pyramid(rollup), processed_dir)
+    print(f"✅ Time pyramid saved to: {pyramid_file}")
+
+    quantile_bank = new_quantile_bank()
+    update_quantile_bank(quantile_bank, rollup)
+    sketch_file = save_quantile_bank(quantile_bank, processed_dir)
+    print(f"✅ Quantile sketches for {len(quantile_bank['sketches'])} year/station/hour keys saved to: {sketch_file}")
+
+    top_k_file = save_top_k_tracker(top_k_tracker, processed_dir)
+    print(f"✅ Top-K summaries for {len(top_k_tracker['summaries'])} slices saved to: {top_k_file}")
+
+    draft_file = save_draft_sample(draft_sampler, processed_dir)
+    print(f"✅ Draft sample of {len(draft_sampler['ridership'])} rows from {len(draft_sampler['seen'])} station/month strata saved to: {draft_file}")
+
+    return catalog_df
+
+
+def main():
+    file_path, processed_dir = define_paths()
+    ingest(file_path, processed_dir)
+
+
+if __name__ == "__main__":
+    main()
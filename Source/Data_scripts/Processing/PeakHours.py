@@ -0,0 +1,144 @@
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import load_rollup
+from StationCatalog import load_station_catalog
+from StationClustering import profile_matrix, HOUR_LABELS
+from ExcelTables import write_table
+
+PEAK_FILE_NAME = "peak_hours.json"
+
+# Hours next to a peak count towards its shoulder while their ridership is at least this share of the peak
+SHOULDER_FRACTION = 0.5
+
+PEAK_COLUMNS = ['am_peak_hour', 'am_peak_ridership', 'pm_peak_hour', 'pm_peak_ridership',
+                'trough_hour', 'trough_ridership', 'peak_to_trough', 'am_shoulder_hours', 'pm_shoulder_hours']
+
+
+def _shoulder_width(profiles, peak_hours, fraction):
+    """Length of the run of hours around each peak that stays at or above fraction x the peak."""
+    hours = np.arange(profiles.shape[1])
+    peaks = profiles[np.arange(len(profiles)), peak_hours]
+    below = ~(profiles >= fraction * peaks[:, None])
+    left = np.where(below & (hours < peak_hours[:, None]), hours, -1).max(axis=1)
+    right = np.where(below & (hours > peak_hours[:, None]), hours, len(hours)).min(axis=1)
+    return right - left - 1
+
+
+def peak_metrics(profiles, fraction=SHOULDER_FRACTION):
+    """
+    AM and PM peak, trough and shoulder width of many 24-hour profiles at once
+
+    Args:
+        profiles (ndarray): Average ridership, shape (profiles, 24), NaN for hours without data
+
+    Returns:
+        dict: One array per PEAK_COLUMNS entry; hours are 0-23, the
+        peak-to-trough ratio is NaN when the trough is 0
+    """
+    profiles = np.asarray(profiles, dtype=np.float64)
+    rows = np.arange(len(profiles))
+    for_max = np.where(np.isnan(profiles), -np.inf, profiles)
+    for_min = np.where(np.isnan(profiles), np.inf, profiles)
+
+    am_peak = for_max[:, :12].argmax(axis=1)
+    pm_peak = 12 + for_max[:, 12:].argmax(axis=1)
+    trough = for_min.argmin(axis=1)
+    am_value, pm_value, trough_value = profiles[rows, am_peak], profiles[rows, pm_peak], profiles[rows, trough]
+    peak_value = np.maximum(am_value, pm_value)
+
+    return {
+        'am_peak_hour': am_peak,
+        'am_peak_ridership': am_value,
+        'pm_peak_hour': pm_peak,
+        'pm_peak_ridership': pm_value,
+        'trough_hour': trough,
+        'trough_ridership': trough_value,
+        'peak_to_trough': np.divide(peak_value, trough_value, out=np.full(len(rows), np.nan), where=trough_value > 0),
+        'am_shoulder_hours': _shoulder_width(for_max, am_peak, fraction),
+        'pm_shoulder_hours': _shoulder_width(for_max, pm_peak, fraction)
+    }
+
+
+def peak_hour_table(rollup, catalog_df, fraction=SHOULDER_FRACTION):
+    """
+    Peak hours of every station in every month, from the station x month x hour averages of the rollup
+
+    Returns:
+        DataFrame: station_complex_id, station_complex, year, month and the
+        PEAK_COLUMNS, with the hours as AM/PM labels
+    """
+    index, profiles = profile_matrix(rollup, 24, by_month=True, missing=np.nan)
+    metrics = peak_metrics(profiles, fraction)
+    stations = catalog_df.reset_index().set_index('station_code')
+
+    table = pd.DataFrame({
+        'station_complex_id': stations['station_complex_id'].reindex(index['station_code']).to_numpy(),
+        'station_complex': stations['station_complex'].reindex(index['station_code']).to_numpy(),
+        'year': index['year'],
+        'month': index['month'],
+        **metrics
+    })
+    for column in ['am_peak_hour', 'pm_peak_hour', 'trough_hour']:
+        table[column] = np.asarray(HOUR_LABELS)[table[column]]
+    return table.sort_values(['station_complex', 'year', 'month']).reset_index(drop=True)
+
+
+def peak_summary(am_peak_hour, pm_peak_hour):
+    """Text for titles, e.g. 'AM peak 8 AM, PM peak 5 PM'."""
+    return f"AM peak {am_peak_hour}, PM peak {pm_peak_hour}"
+
+
+def save_peak_table(table, processed_dir):
+    """Save the peak hour table as JSON in the processed data directory."""
+    output_file = processed_dir / PEAK_FILE_NAME
+    records = json.loads(table.to_json(orient='records'))
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=1)
+    return output_file
+
+
+def load_peak_table(processed_dir):
+    """Load the table written by save_peak_table, indexed by (station_complex_id, year, month)."""
+    peak_file = processed_dir / PEAK_FILE_NAME
+    if not peak_file.exists():
+        raise FileNotFoundError(f"🚨 Peak hour table not found: {peak_file}. Run PeakHours.py first.")
+    with open(peak_file, encoding='utf-8') as f:
+        df = pd.DataFrame(json.load(f))
+    df['station_complex_id'] = df['station_complex_id'].astype(str)
+    return df.set_index(['station_complex_id', 'year', 'month'])
+
+
+def main():
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    table = peak_hour_table(rollup, catalog_df)
+    save_peak_table(table, processed_dir)
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Peak_Hours_By_Station_And_Month_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0.00'})
+        ratio_format = workbook.add_format({'num_format': '0.0'})
+        formats = {'am_peak_ridership': number_format, 'pm_peak_ridership': number_format,
+                   'trough_ridership': number_format, 'peak_to_trough': ratio_format}
+
+        worksheet = write_table(writer, table, 'Peak Hours', formats)
+        worksheet.set_column(0, 0, 18)
+        worksheet.set_column(1, 1, 40)
+        worksheet.set_column(2, len(table.columns) - 1, 16)
+
+    print(f"✅ Peak hours of {table['station_complex_id'].nunique()} stations saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
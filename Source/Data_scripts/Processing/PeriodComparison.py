@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import load_rollup, DAYS_OF_WEEK
+from StationCatalog import load_station_catalog
+from Periods import define_periods, periods_label, DEFAULT_PERIODS
+from ExcelTables import write_table
+from Hierarchy import catalog_hierarchy, hierarchy_levels, HIERARCHY_LEVELS, SYSTEM_LABEL
+
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+
+# Season code (index into SEASONS) of every month, 1-12
+SEASON_OF_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+# Dimensions every station is compared by and the labels of their values
+COMPARISON_DIMENSIONS = {
+    'station': [''],
+    'hour': list(range(24)),
+    'day_of_week': DAYS_OF_WEEK,
+    'season': SEASONS
+}
+
+
+def _dimension_keys(hour_index):
+    """Return the value code of every dimension for each hour index."""
+    hour_index = np.asarray(hour_index, dtype=np.int64)
+    days = hour_index // 24
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+    return {
+        'station': np.zeros(len(hour_index), dtype=np.int64),
+        'hour': hour_index % 24,
+        'day_of_week': (days + 3) % 7,  # 1970-01-01 was a Thursday
+        'season': SEASON_OF_MONTH[months]
+    }
+
+
+def build_period_cube(rollup, periods, catalog_df):
+    """
+    Aggregate the hourly rollup into dense period x station x value arrays
+
+    Every array is rolled up to the boroughs and the whole system in the
+    same pass, so the three levels always add up.
+
+    Args:
+        rollup (dict): Rollup from HourlyRollup
+        periods (list): Periods from Periods.define_periods
+        catalog_df (DataFrame): Station catalog, for the borough of every station
+
+    Returns:
+        dict: 'labels' (period labels), 'boroughs' (borough names) and, for
+        every dimension in COMPARISON_DIMENSIONS, '<dimension>_sum',
+        '<dimension>_count' and '<dimension>_transfers' arrays of shape
+        (periods, stations, values of the dimension). The same arrays
+        prefixed with 'borough_' have one row per borough instead of per
+        station, and with 'system_' a single row.
+    """
+    hierarchy = catalog_hierarchy(catalog_df)
+    n_stations = len(hierarchy['parent'])
+    keys = _dimension_keys(rollup['hour_index'])
+    cube = {'labels': [period['label'] for period in periods], 'boroughs': hierarchy['boroughs']}
+
+    for dimension, values in COMPARISON_DIMENSIONS.items():
+        size = n_stations * len(values)
+        sums = np.zeros((len(periods), size))
+        counts = np.zeros((len(periods), size))
+        transfers = np.zeros((len(periods), size))
+        cell = rollup['station_code'].astype(np.int64) * len(values) + keys[dimension]
+        for p, period in enumerate(periods):
+            mask = (rollup['hour_index'] >= period['start_hour']) & (rollup['hour_index'] < period['end_hour'])
+            sums[p] = np.bincount(cell[mask], weights=rollup['sum'][mask], minlength=size)
+            counts[p] = np.bincount(cell[mask], weights=rollup['count'][mask], minlength=size)
+            transfers[p] = np.bincount(cell[mask], weights=rollup['transfers'][mask], minlength=size)
+        cube[f'{dimension}_sum'] = sums.reshape(len(periods), n_stations, len(values))
+        cube[f'{dimension}_count'] = counts.reshape(len(periods), n_stations, len(values))
+        cube[f'{dimension}_transfers'] = transfers.reshape(len(periods), n_stations, len(values))
+
+        for measure in ['sum', 'count', 'transfers']:
+            levels = hierarchy_levels(cube[f'{dimension}_{measure}'], hierarchy, axis=1)
+            cube[f'borough_{dimension}_{measure}'] = levels['borough']
+            cube[f'system_{dimension}_{measure}'] = levels['system']
+
+    return cube
+
+
+def _level_key(dimension, measure, level):
+    """Cube key of a dimension and measure at a hierarchy level."""
+    if level not in HIERARCHY_LEVELS:
+        raise ValueError(f"Unknown hierarchy level: {level}")
+    return f"{dimension}_{measure}" if level == 'station' else f"{level}_{dimension}_{measure}"
+
+
+def _level_names(cube, catalog_df, level, n_rows):
+    """Name column and row names of a hierarchy level: stations, boroughs or the system."""
+    if level == 'station':
+        names = catalog_df.reset_index().set_index('station_code')['station_complex']
+        return 'station_complex', names.reindex(np.arange(n_rows)).to_numpy()
+    if level == 'borough':
+        return 'borough', np.asarray(cube['boroughs'])
+    return 'borough', np.array([SYSTEM_LABEL])
+
+
+def period_deltas(cube, dimension, measure='total', base=0, level='station'):
+    """
+    Compare every period against a base period for all stations (or boroughs) at once
+
+    Args:
+        cube (dict): Cube from build_period_cube
+        dimension (str): 'station', 'hour', 'day_of_week' or 'season'
+        measure (str): 'total' ridership or 'average' ridership per row
+        base (int): Position of the period the others are compared with
+        level (str): 'station', 'borough' or 'system'
+
+    Returns:
+        tuple: (values, absolute change, percent change), each of shape
+        (periods, stations/boroughs/1, values of the dimension). The percent
+        change is NaN where the base period has no ridership.
+    """
+    if dimension not in COMPARISON_DIMENSIONS:
+        raise ValueError(f"Unknown comparison dimension: {dimension}")
+
+    sums = cube[_level_key(dimension, 'sum', level)]
+    if measure == 'total':
+        values = sums
+    elif measure == 'average':
+        counts = cube[_level_key(dimension, 'count', level)]
+        values = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    else:
+        raise ValueError(f"Unknown measure: {measure}")
+
+    change = values - values[base]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_change = np.where(values[base] > 0, change / values[base], np.nan)
+    return values, change, percent_change
+
+
+def comparison_table(cube, catalog_df, dimension, measure='total', base=0, level='station'):
+    """
+    Flatten the period deltas of one dimension into a table
+
+    Returns:
+        DataFrame: station_complex (borough for the 'borough' and 'system'
+        levels), the dimension value (except for 'station'), one column per
+        period and, for every other period, 'Change <period> vs <base>' and
+        '% Change <period> vs <base>' (a fraction). Rows with no ridership
+        in any period are dropped.
+    """
+    values, change, percent_change = period_deltas(cube, dimension, measure, base, level)
+    labels = cube['labels']
+    n_periods, n_rows, n_values = values.shape
+    name_column, names = _level_names(cube, catalog_df, level, n_rows)
+
+    table = pd.DataFrame({name_column: np.repeat(names, n_values)})
+    if dimension != 'station':
+        table[dimension] = np.tile(COMPARISON_DIMENSIONS[dimension], n_rows)
+    for p, label in enumerate(labels):
+        table[label] = values[p].ravel()
+    for p, label in enumerate(labels):
+        if p != base:
+            table[f"Change {label} vs {labels[base]}"] = change[p].ravel()
+            table[f"% Change {label} vs {labels[base]}"] = percent_change[p].ravel()
+
+    return table[values.reshape(n_periods, -1).any(axis=0)].reset_index(drop=True)
+
+
+def transfer_table(cube, catalog_df, dimension, level='station'):
+    """
+    Transfers and transfer ratio (transfers per rider) of every station (or borough) for one dimension
+
+    Returns:
+        DataFrame: station_complex (borough for the 'borough' and 'system'
+        levels), the dimension value (except for 'station') and '<period>
+        transfers' and '<period> transfer ratio' for every period. Rows with
+        no ridership in any period are dropped.
+    """
+    if dimension not in COMPARISON_DIMENSIONS:
+        raise ValueError(f"Unknown comparison dimension: {dimension}")
+
+    sums = cube[_level_key(dimension, 'sum', level)]
+    transfers = cube[_level_key(dimension, 'transfers', level)]
+    ratios = np.divide(transfers, sums, out=np.full(sums.shape, np.nan), where=sums > 0)
+    n_periods, n_rows, n_values = sums.shape
+    name_column, names = _level_names(cube, catalog_df, level, n_rows)
+
+    table = pd.DataFrame({name_column: np.repeat(names, n_values)})
+    if dimension != 'station':
+        table[dimension] = np.tile(COMPARISON_DIMENSIONS[dimension], n_rows)
+    for p, label in enumerate(cube['labels']):
+        table[f"{label} transfers"] = transfers[p].ravel()
+        table[f"{label} transfer ratio"] = ratios[p].ravel()
+
+    return table[sums.reshape(n_periods, -1).any(axis=0)].reset_index(drop=True)
+
+
+def top_transfer_hubs(cube, catalog_df, period=0, n=10):
+    """The n stations with the most transfers in one period, with their ridership and transfer ratio."""
+    label = cube['labels'][period]
+    table = transfer_table(cube, catalog_df, 'station')
+    table.insert(1, f"{label} ridership", comparison_table(cube, catalog_df, 'station')[label])
+    columns = ['station_complex', f"{label} ridership", f"{label} transfers", f"{label} transfer ratio"]
+    return table[columns].sort_values(f"{label} transfers", ascending=False).head(n).reset_index(drop=True)
+
+
+def gainers_and_losers(table, change_column, n=10):
+    """
+    Return the n rows with the largest increase and the n with the largest decrease in a change column
+
+    Only rows that went up are gainers and only rows that went down are
+    losers, so no row is listed as both when there are fewer than 2n rows.
+    """
+    ranked = table.dropna(subset=[change_column]).sort_values(change_column, ascending=False)
+    gainers = ranked[ranked[change_column] > 0].head(n)
+    losers = ranked[ranked[change_column] < 0].tail(n).iloc[::-1]
+    return gainers.reset_index(drop=True), losers.reset_index(drop=True)
+
+
+def _write_table(writer, df, sheet_name, formats):
+    """Write a comparison table with percent, number and text columns formatted by their names."""
+    column_formats = {}
+    for col in df.columns:
+        if col.startswith('% Change') or col.endswith('transfer ratio'):
+            column_formats[col] = formats['percent']
+        elif col not in ('station_complex', 'borough') + tuple(COMPARISON_DIMENSIONS):
+            column_formats[col] = formats['number']
+    worksheet = write_table(writer, df, sheet_name, column_formats)
+    worksheet.set_column(0, 0, 40)
+    worksheet.set_column(1, len(df.columns) - 1, 18)
+
+
+def write_comparison_report(cube, catalog_df, output_file, measure='total', base=0, n=10):
+    """
+    Write one sheet per dimension with the deltas of every station and one
+    with those of every borough and the system, the biggest gainers and
+    losers of every period against the base period and the transfers of
+    every station, borough and period
+    """
+    labels = cube['labels']
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        formats = {
+            'number': workbook.add_format({'num_format': '#,##0' if measure == 'total' else '#,##0.00'}),
+            'percent': workbook.add_format({'num_format': '0.0%'})
+        }
+
+        for dimension in COMPARISON_DIMENSIONS:
+            table = comparison_table(cube, catalog_df, dimension, measure, base)
+            _write_table(writer, table, f"By {dimension.replace('_', ' ')}", formats)
+        for dimension in COMPARISON_DIMENSIONS:
+            table = pd.concat([comparison_table(cube, catalog_df, dimension, measure, base, level)
+                               for level in ['borough', 'system']], ignore_index=True)
+            _write_table(writer, table, "By borough" if dimension == 'station' else f"By borough and {dimension.replace('_', ' ')}", formats)
+
+        station_table = comparison_table(cube, catalog_df, 'station', measure, base)
+        for p, label in enumerate(labels):
+            if p == base:
+                continue
+            gainers, losers = gainers_and_losers(station_table, f"Change {label} vs {labels[base]}", n)
+            _write_table(writer, gainers, f"Gainers {label} vs {labels[base]}", formats)
+            _write_table(writer, losers, f"Losers {label} vs {labels[base]}", formats)
+
+        for dimension in COMPARISON_DIMENSIONS:
+            table = transfer_table(cube, catalog_df, dimension)
+            _write_table(writer, table, f"Transfers by {dimension.replace('_', ' ')}", formats)
+        table = pd.concat([transfer_table(cube, catalog_df, 'station', level) for level in ['borough', 'system']], ignore_index=True)
+        _write_table(writer, table, "Transfers by borough", formats)
+        for p, label in enumerate(labels):
+            _write_table(writer, top_transfer_hubs(cube, catalog_df, p, n), f"Top transfer hubs {label}", formats)
+
+
+def main(period_specs=DEFAULT_PERIODS, measure='total'):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    periods = define_periods(period_specs)
+    if len(periods) < 2:
+        raise ValueError("At least two periods are needed for a comparison")
+
+    cube = build_period_cube(rollup, periods, catalog_df)
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Period_Comparison_{periods_label(periods)}_{date_time_str}.xlsx"
+    write_comparison_report(cube, catalog_df, output_file, measure)
+    print(f"✅ Station and borough changes and transfers by hour, day of week and season saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
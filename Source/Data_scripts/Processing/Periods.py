@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from RawData import to_hour_index
+
+# Periods the reports cover unless a script is given others. Each entry is
+# either a year or a (label, start date, end date) tuple where the end date
+# is included, e.g. ("Summer 2024", "2024-06-01", "2024-08-31").
+DEFAULT_PERIODS = [2023, 2024]
+
+
+def define_periods(specs=DEFAULT_PERIODS):
+    """
+    Turn years and date ranges into period definitions
+
+    Args:
+        specs (list): Years (int) and/or (label, start date, end date) tuples
+
+    Returns:
+        list: One dict per period with its 'code', 'label', 'start' and 'end'
+        (end excluded) timestamps and the same bounds as hour indexes
+    """
+    periods = []
+    for code, spec in enumerate(specs):
+        if isinstance(spec, (int, np.integer)):
+            label, start, end = str(spec), pd.Timestamp(year=int(spec), month=1, day=1), pd.Timestamp(year=int(spec) + 1, month=1, day=1)
+        else:
+            label, start, end = spec
+            start = pd.Timestamp(start).normalize()
+            end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        periods.append({
+            'code': code,
+            'label': label,
+            'start': start,
+            'end': end,
+            'start_hour': int(to_hour_index([start])[0]),
+            'end_hour': int(to_hour_index([end])[0])
+        })
+
+    labels = [period['label'] for period in periods]
+    if len(set(labels)) != len(labels):
+        raise ValueError(f"Period labels must be unique: {labels}")
+    return periods
+
+
+def periods_label(periods):
+    """Label for file names, e.g. '2023_and_2024' or '2022_2023_and_2024'."""
+    labels = [period['label'].replace(" ", "_") for period in periods]
+    if len(labels) == 1:
+        return labels[0]
+    return "_".join(labels[:-1]) + "_and_" + labels[-1]
+
+
+def calendar_year(period):
+    """The year a period covers when it is exactly one calendar year, otherwise None."""
+    year = period['start'].year
+    if period['start'] == pd.Timestamp(year=year, month=1, day=1) and period['end'] == pd.Timestamp(year=year + 1, month=1, day=1):
+        return year
+    return None
+
+
+def period_masks(hour_index, periods):
+    """Yield (period, boolean mask) for every period with at least one matching row."""
+    hour_index = np.asarray(hour_index)
+    for period in periods:
+        mask = (hour_index >= period['start_hour']) & (hour_index < period['end_hour'])
+        if mask.any():
+            yield period, mask
+
+
+def add_period_column(df, periods, date_column='transit_timestamp'):
+    """
+    Tag every row with the label of the period it falls in
+
+    Rows outside all periods are dropped. A row inside several overlapping
+    periods appears once per period, so grouping by 'period' afterwards
+    gives every period its complete totals from the same pass over the data.
+    """
+    hour_index = to_hour_index(df[date_column])
+    parts = []
+    for period, mask in period_masks(hour_index, periods):
+        part = df[mask].copy()
+        part['period'] = period['label']
+        parts.append(part)
+
+    if not parts:
+        return df.iloc[0:0].assign(period=pd.Series(dtype=str))
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
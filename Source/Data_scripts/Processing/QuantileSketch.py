@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from RawData import hour_index_to_timestamp
+
+SKETCH_FILE_NAME = "hourly_quantile_sketches.npz"
+
+# KLL accuracy parameter. Each sketch keeps about 3 * k values no matter how
+# many rows it has seen; the rank error of a quantile is roughly 1.7 / k.
+SKETCH_K = 128
+
+REPORT_QUANTILES = [0.5, 0.9, 0.99]
+
+
+def new_kll_sketch(k=SKETCH_K):
+    """Create an empty KLL quantile sketch."""
+    return {'k': k, 'n': 0, 'levels': [np.empty(0, dtype=np.float32)]}
+
+
+def _level_capacity(k, height, level):
+    """Number of values a level may hold before it is compacted."""
+    return max(2, int(np.ceil(k * (2 / 3) ** (height - level - 1))))
+
+
+def _compress(sketch, rng):
+    """Compact every level that is over capacity, promoting half of its values to the next level."""
+    levels = sketch['levels']
+    level = 0
+    while level < len(levels):
+        if len(levels[level]) > _level_capacity(sketch['k'], len(levels), level):
+            if level + 1 == len(levels):
+                levels.append(np.empty(0, dtype=np.float32))
+            items = np.sort(levels[level])
+            # An odd value out stays behind so no weight is lost
+            leftover = items[len(items) - len(items) % 2:]
+            promoted = items[:len(items) - len(items) % 2][rng.integers(2)::2]
+            levels[level + 1] = np.concatenate([levels[level + 1], promoted])
+            levels[level] = leftover
+        level += 1
+
+
+def kll_update(sketch, values, rng):
+    """Add a batch of values to a sketch."""
+    sketch['levels'][0] = np.concatenate([sketch['levels'][0], np.asarray(values, dtype=np.float32)])
+    sketch['n'] += len(values)
+    _compress(sketch, rng)
+
+
+def kll_merge(a, b, rng):
+    """Merge two sketches into a new one covering both inputs."""
+    height = max(len(a['levels']), len(b['levels']))
+    levels = []
+    for level in range(height):
+        parts = [s['levels'][level] for s in (a, b) if level < len(s['levels'])]
+        levels.append(np.concatenate(parts))
+    merged = {'k': max(a['k'], b['k']), 'n': a['n'] + b['n'], 'levels': levels}
+    _compress(merged, rng)
+    return merged
+
+
+def kll_quantiles(sketch, quantiles):
+    """Estimate the given quantiles (0-1) from a sketch."""
+    if sketch['n'] == 0:
+        return np.full(len(quantiles), np.nan)
+    values = np.concatenate(sketch['levels'])
+    weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(sketch['levels'])])
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    positions = np.searchsorted(cumulative, np.asarray(quantiles) * cumulative[-1], side='left')
+    return values[order][np.minimum(positions, len(values) - 1)].astype(np.float64)
+
+
+def new_quantile_bank(k=SKETCH_K, seed=0):
+    """Create the set of sketches keyed by (year, station code, hour of day)."""
+    return {'k': k, 'sketches': {}, 'rng': np.random.default_rng(seed)}
+
+
+def update_quantile_bank(bank, rollup):
+    """
+    Add the station-hour totals of a rollup to the sketch of their (year, station, hour of day)
+
+    Each value is one station's total ridership in one hour, summed over the
+    payment method / fare class splits, so the quantiles describe how that
+    hour varies from day to day, event days included. Totals come from the
+    finished rollup so hours split across CSV chunks are counted once.
+    """
+    timestamps = hour_index_to_timestamp(rollup['hour_index'])
+    years = timestamps.year.to_numpy()
+    hours = timestamps.hour.to_numpy()
+    codes = np.asarray(rollup['station_code'])
+    values = np.asarray(rollup['sum'], dtype=np.float32)
+
+    order = np.lexsort((hours, codes, years))
+    years, codes, hours, values = years[order], codes[order], hours[order], values[order]
+    new_key = np.ones(len(order), dtype=bool)
+    new_key[1:] = (years[1:] != years[:-1]) | (codes[1:] != codes[:-1]) | (hours[1:] != hours[:-1])
+    starts = np.flatnonzero(new_key)
+    ends = np.append(starts[1:], len(order))
+
+    sketches = bank['sketches']
+    for start, end in zip(starts, ends):
+        key = (int(years[start]), int(codes[start]), int(hours[start]))
+        if key not in sketches:
+            sketches[key] = new_kll_sketch(bank['k'])
+        kll_update(sketches[key], values[start:end], bank['rng'])
+
+
+def merge_quantile_banks(a, b):
+    """Merge two sketch banks, e.g. built from different files or date ranges."""
+    merged = new_quantile_bank(max(a['k'], b['k']))
+    merged['sketches'] = dict(a['sketches'])
+    for key, sketch in b['sketches'].items():
+        if key in merged['sketches']:
+            merged['sketches'][key] = kll_merge(merged['sketches'][key], sketch, merged['rng'])
+        else:
+            merged['sketches'][key] = sketch
+    return merged
+
+
+def save_quantile_bank(bank, processed_dir):
+    """Save every sketch as flat arrays: key, level and value of each retained item."""
+    keys = list(bank['sketches'])
+    key_array, level_array, value_array, counts = [], [], [], []
+    for index, key in enumerate(keys):
+        sketch = bank['sketches'][key]
+        counts.append(sketch['n'])
+        for level, items in enumerate(sketch['levels']):
+            key_array.append(np.full(len(items), index, dtype=np.int32))
+            level_array.append(np.full(len(items), level, dtype=np.int8))
+            value_array.append(items)
+
+    output_file = processed_dir / SKETCH_FILE_NAME
+    np.savez(
+        output_file,
+        k=np.int32(bank['k']),
+        keys=np.array(keys, dtype=np.int32).reshape(-1, 3),
+        counts=np.array(counts, dtype=np.int64),
+        item_key=np.concatenate(key_array) if key_array else np.empty(0, dtype=np.int32),
+        item_level=np.concatenate(level_array) if level_array else np.empty(0, dtype=np.int8),
+        item_value=np.concatenate(value_array) if value_array else np.empty(0, dtype=np.float32)
+    )
+    return output_file
+
+
+def load_quantile_bank(processed_dir):
+    """Load the sketches written by save_quantile_bank."""
+    sketch_file = processed_dir / SKETCH_FILE_NAME
+    if not sketch_file.exists():
+        raise FileNotFoundError(f"🚨 Quantile sketches not found: {sketch_file}. Run IngestRawData.py first.")
+
+    with np.load(sketch_file) as data:
+        bank = new_quantile_bank(int(data['k']))
+        order = np.lexsort((data['item_level'], data['item_key']))
+        item_key, item_level, item_value = data['item_key'][order], data['item_level'][order], data['item_value'][order]
+        bounds = np.searchsorted(item_key, np.arange(len(data['keys']) + 1))
+        for index, key in enumerate(data['keys']):
+            lo, hi = bounds[index], bounds[index + 1]
+            height = int(item_level[lo:hi].max()) + 1 if hi > lo else 1
+            levels = [item_value[lo:hi][item_level[lo:hi] == level] for level in range(height)]
+            bank['sketches'][tuple(int(v) for v in key)] = {'k': bank['k'], 'n': int(data['counts'][index]), 'levels': levels}
+    return bank
+
+
+def quantile_table(bank, catalog_df, year, quantiles=REPORT_QUANTILES):
+    """
+    Build a table of quantiles of the hourly total ridership for every station and hour of a year
+
+    Returns:
+        DataFrame: station_complex_id, station_complex, hour and one column per quantile (e.g. 'p50')
+    """
+    stations = catalog_df.reset_index().set_index('station_code')
+    rows = []
+    for (key_year, station_code, hour), sketch in bank['sketches'].items():
+        if key_year != year:
+            continue
+        row = {'station_complex_id': stations.at[station_code, 'station_complex_id'],
+               'station_complex': stations.at[station_code, 'station_complex'], 'hour': hour}
+        for q, value in zip(quantiles, kll_quantiles(sketch, quantiles)):
+            row[f"p{round(q * 100)}"] = value
+        rows.append(row)
+
+    columns = ['station_complex_id', 'station_complex', 'hour'] + [f"p{round(q * 100)}" for q in quantiles]
+    return pd.DataFrame(rows, columns=columns).sort_values(by=['station_complex', 'hour'])
+
+
+def add_quantile_bands(avg_df, bank, catalog_df, year, quantiles=REPORT_QUANTILES):
+    """Add p50/p90/p99 columns to an hourly average table (station_complex_id, station_complex, hour, ridership)."""
+    bands = quantile_table(bank, catalog_df, year, quantiles).drop(columns='station_complex')
+    return avg_df.merge(bands, on=['station_complex_id', 'hour'], how='left')
@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+# Name of the CSV exported from the "MTA Subway Hourly Ridership: 2020-2024" dataset
+RAW_FILE_NAME = "MTA_Subway_Hourly_Ridership__2020-2024.csv"
+
+# Timestamp format used by the export, e.g. "10/18/2022 07:00:00 PM"
+DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+# Number of rows read from the CSV at once
+CHUNK_SIZE = 500000
+
+# Low-cardinality text columns kept as small integer codes in the processed store
+CODED_COLUMNS = ['payment_method', 'fare_class_category']
+
+# Columns the processing scripts need from the raw file
+RAW_COLUMNS = ['transit_timestamp', 'station_complex_id', 'station_complex', 'borough', 'ridership',
+               'transfers', 'latitude', 'longitude'] + CODED_COLUMNS
+
+
+def define_paths():
+    """Return the raw CSV path and the processed data directory."""
+    base_dir = Path(__file__).resolve().parents[3]
+    file_path = base_dir / "Source" / "Data" / "Raw" / RAW_FILE_NAME
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    processed_dir.mkdir(parents=True, exist_ok=True)
+
+    if not file_path.exists():
+        raise FileNotFoundError(f"🚨 File not found: {file_path}")
+
+    return file_path, processed_dir
+
+
+def to_hour_index(timestamps):
+    """Convert a series of timestamps to whole hours since 1970-01-01 (int64)."""
+    return np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[h]').astype(np.int64)
+
+
+def hour_index_to_timestamp(hour_index):
+    """Convert hour indexes produced by to_hour_index back to timestamps."""
+    return pd.to_datetime(np.asarray(hour_index, dtype=np.int64), unit='h')
+
+
+def read_raw_chunks(file_path, columns=RAW_COLUMNS, chunksize=CHUNK_SIZE):
+    """
+    Read the raw CSV in chunks and yield cleaned dataframes
+
+    Args:
+        file_path (str): Path to the CSV file
+        columns (list): Columns to load from the CSV
+        chunksize (int): Number of rows to process at once
+
+    Yields:
+        DataFrame: Chunk with parsed timestamps, numeric ridership and transfers and an
+        'hour_index' column (hours since 1970-01-01)
+    """
+    for chunk in pd.read_csv(
+        file_path,
+        usecols=columns,
+        chunksize=chunksize,
+        dtype={'station_complex_id': str, 'station_complex': str, 'borough': str, **{column: str for column in CODED_COLUMNS}},
+        low_memory=False
+    ):
+        # Convert timestamp with the format used by the export
+        chunk['transit_timestamp'] = pd.to_datetime(chunk['transit_timestamp'], format=DATE_FORMAT, errors='coerce')
+        chunk['ridership'] = pd.to_numeric(chunk['ridership'], errors='coerce')
+        for column in ['latitude', 'longitude']:
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+
+        # Drop rows with invalid timestamps, stations or ridership
+        chunk = chunk.dropna(subset=['transit_timestamp', 'station_complex_id', 'ridership'])
+        chunk = chunk.reset_index(drop=True)
+
+        # A row without a transfer count has no transfers
+        if 'transfers' in chunk.columns:
+            chunk['transfers'] = pd.to_numeric(chunk['transfers'], errors='coerce').fillna(0)
+
+        # A missing payment method or fare class is kept as its own value
+        for column in CODED_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = chunk[column].fillna('unknown')
+
+        chunk['hour_index'] = to_hour_index(chunk['transit_timestamp'])
+        yield chunk
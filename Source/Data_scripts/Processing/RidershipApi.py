@@ -0,0 +1,378 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from HourlyRollup import load_rollup, DAYS_OF_WEEK
+from StationCatalog import load_station_catalog
+from TimePyramid import load_time_pyramid, query_range
+from Periods import define_periods
+from PeriodComparison import build_period_cube, comparison_table, COMPARISON_DIMENSIONS, SEASONS
+from Hierarchy import HIERARCHY_LEVELS
+
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+
+# Rendered responses kept in memory, least recently used dropped first
+API_CACHE_SIZE = 1024
+
+# Period cubes kept in memory; each holds every station for one period
+API_CUBE_CACHE_SIZE = 16
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+# Default load of the benchmark in main(run_benchmark=True)
+BENCHMARK_REQUESTS = 5000
+BENCHMARK_CONCURRENCY = 50
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+
+class ApiError(Exception):
+    """Error answered with an HTTP status and a JSON message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def load_api_state(processed_dir):
+    """Load the rollup, catalog and time pyramid once for all requests."""
+    catalog_df = load_station_catalog(processed_dir)
+    return {
+        'catalog': catalog_df,
+        'rollup': load_rollup(processed_dir),
+        'pyramid': load_time_pyramid(processed_dir),
+        'codes': catalog_df['station_code'].to_dict(),
+        'cubes': OrderedDict(),
+        'responses': OrderedDict(),
+        # Uncached responses (e.g. a new period cube) are built off the event
+        # loop; a single worker keeps the cube cache to one thread
+        'executor': ThreadPoolExecutor(max_workers=1)
+    }
+
+
+def _lru_get(cache, key, size, compute):
+    """Return cache[key], computing and storing it (and dropping the oldest entry) when missing."""
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    value = compute()
+    cache[key] = value
+    if len(cache) > size:
+        cache.popitem(last=False)
+    return value
+
+
+def _floats(values, digits=2):
+    """JSON-ready list of rounded floats, None for NaN."""
+    values = np.round(np.asarray(values, dtype=np.float64), digits)
+    return [None if np.isnan(v) else float(v) for v in values]
+
+
+def _period_spec(value):
+    """A year ('2024') or a date range ('2024-06-01..2024-08-31', end included)."""
+    if value.isdigit():
+        return int(value)
+    start, sep, end = value.partition('..')
+    if not sep:
+        raise ApiError(400, f"Period must be a year or start..end: {value}")
+    return (value, start, end)
+
+
+def _periods(query, name, default):
+    try:
+        return define_periods([_period_spec(value) for value in query.get(name, default).split(',')])
+    except ValueError as e:
+        raise ApiError(400, str(e))
+
+
+def _cube(state, periods):
+    """Period cube of the given periods, cached by their bounds."""
+    key = tuple((period['label'], period['start_hour'], period['end_hour']) for period in periods)
+    return _lru_get(state['cubes'], key, API_CUBE_CACHE_SIZE, lambda: build_period_cube(state['rollup'], periods, state['catalog']))
+
+
+def _station_code(state, station_id):
+    if station_id not in state['codes']:
+        raise ApiError(404, f"Unknown station: {station_id}")
+    return state['codes'][station_id]
+
+
+def _int(query, name, default, minimum=None):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"{name} must be a whole number")
+    if minimum is not None and value < minimum:
+        raise ApiError(400, f"{name} must be at least {minimum}")
+    return value
+
+
+def stations_endpoint(state, query):
+    """GET /stations: every station in the catalog."""
+    catalog = state['catalog'].reset_index()
+    return [{
+        'station_complex_id': row.station_complex_id,
+        'station_complex': row.station_complex,
+        'borough': row.borough,
+        'latitude': None if pd.isna(row.latitude) else row.latitude,
+        'longitude': None if pd.isna(row.longitude) else row.longitude
+    } for row in catalog.itertuples()]
+
+
+def station_endpoint(state, query, station_id):
+    """GET /stations/<id>?period=2024: totals and hour, day of week and season profile of one station."""
+    code = _station_code(state, station_id)
+    period = _periods(query, 'period', '2024')[0]
+    cube = _cube(state, [period])
+
+    def averages(dimension):
+        sums, counts = cube[f'{dimension}_sum'][0, code], cube[f'{dimension}_count'][0, code]
+        return _floats(np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0))
+
+    record = state['catalog'].loc[station_id]
+    return {
+        'station_complex_id': station_id,
+        'station_complex': record['station_complex'],
+        'borough': record['borough'],
+        'period': period['label'],
+        'ridership': float(cube['station_sum'][0, code, 0]),
+        'transfers': float(cube['station_transfers'][0, code, 0]),
+        'hourly_average': averages('hour'),
+        'day_of_week_average': dict(zip(DAYS_OF_WEEK, averages('day_of_week'))),
+        'season_total': dict(zip(SEASONS, _floats(cube['season_sum'][0, code])))
+    }
+
+
+def top_endpoint(state, query):
+    """GET /top?period=2024&n=10&by=ridership: the busiest stations by ridership or transfers."""
+    period = _periods(query, 'period', '2024')[0]
+    by = query.get('by', 'ridership')
+    if by not in ('ridership', 'transfers'):
+        raise ApiError(400, "by must be ridership or transfers")
+    n = _int(query, 'n', 10, minimum=1)
+
+    cube = _cube(state, [period])
+    values = cube['station_sum' if by == 'ridership' else 'station_transfers'][0, :, 0]
+    top = np.argsort(-values, kind='stable')[:n]
+    stations = state['catalog'].reset_index().set_index('station_code')
+    return [{
+        'rank': rank,
+        'station_complex_id': stations.at[code, 'station_complex_id'],
+        'station_complex': stations.at[code, 'station_complex'],
+        by: float(values[code])
+    } for rank, code in enumerate(top, 1) if values[code] > 0]
+
+
+def compare_endpoint(state, query):
+    """GET /compare?periods=2023,2024&dimension=station&measure=total&level=station[&station=<id>]: period deltas."""
+    periods = _periods(query, 'periods', '2023,2024')
+    dimension = query.get('dimension', 'station')
+    measure = query.get('measure', 'total')
+    level = query.get('level', 'station')
+    if dimension not in COMPARISON_DIMENSIONS or measure not in ('total', 'average'):
+        raise ApiError(400, f"dimension must be one of {list(COMPARISON_DIMENSIONS)} and measure total or average")
+    if level not in HIERARCHY_LEVELS:
+        raise ApiError(400, f"level must be one of {HIERARCHY_LEVELS}")
+
+    table = comparison_table(_cube(state, periods), state['catalog'], dimension, measure, level=level)
+    if 'station' in query:
+        if level != 'station':
+            raise ApiError(400, "station can only be combined with level=station")
+        _station_code(state, query['station'])
+        table = table[table['station_complex'] == state['catalog'].at[query['station'], 'station_complex']]
+    return json.loads(table.to_json(orient='records'))
+
+
+def range_endpoint(state, query):
+    """GET /range?start=2024-01-01&end=2024-02-01[&station=<id>]: ridership between two timestamps."""
+    try:
+        start, end = pd.Timestamp(query['start']), pd.Timestamp(query['end'])
+    except (KeyError, ValueError):
+        raise ApiError(400, "start and end timestamps are required")
+
+    if 'station' in query:
+        totals = query_range(state['pyramid'], start, end, [_station_code(state, query['station'])])
+        return {'station_complex_id': query['station'], 'start': str(start), 'end': str(end), 'ridership': float(totals[0])}
+    totals = query_range(state['pyramid'], start, end)
+    return {'start': str(start), 'end': str(end), 'ridership': float(totals.sum())}
+
+
+def route(state, target):
+    """Answer one request target, e.g. '/top?n=5', with (status, JSON body bytes)."""
+    parts = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+    path = parts.path.rstrip('/') or '/'
+    try:
+        if path == '/stations':
+            data = stations_endpoint(state, query)
+        elif path.startswith('/stations/'):
+            data = station_endpoint(state, query, path[len('/stations/'):])
+        elif path == '/top':
+            data = top_endpoint(state, query)
+        elif path == '/compare':
+            data = compare_endpoint(state, query)
+        elif path == '/range':
+            data = range_endpoint(state, query)
+        else:
+            raise ApiError(404, f"Unknown endpoint: {path}")
+        status = 200
+    except ApiError as e:
+        status, data = e.status, {'error': str(e)}
+    except Exception:
+        print(f"🚨 Error while answering {target}:")
+        traceback.print_exc()
+        status, data = 500, {'error': "Internal server error"}
+    return status, json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _render(state, target):
+    """Route a target and prepare everything needed to send it: status, body, gzipped body and ETag."""
+    status, body = route(state, target)
+    compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    return status, body, compressed, etag
+
+
+def _response_bytes(status, headers, body=b''):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"] + [f"{name}: {value}" for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def handle_connection(reader, writer, state):
+    """Serve the requests of one keep-alive connection."""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                # Headers larger than the reader's buffer (64 KiB): answer and drop the connection
+                body = b'{"error":"Request headers are too large"}'
+                writer.write(_response_bytes(431, {'Content-Type': 'application/json', 'Connection': 'close',
+                                                   'Content-Length': len(body)}, body))
+                await writer.drain()
+                break
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = (request_line.split(' ') + ['', '', ''])[:3]
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            response_headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive' if keep_alive else 'close'}
+            if method not in ('GET', 'HEAD'):
+                body = b'{"error":"Only GET and HEAD are supported"}'
+                response = _response_bytes(405, {**response_headers, 'Content-Length': len(body)}, body)
+            else:
+                rendered = state['responses'].get(target)
+                if rendered is None:
+                    rendered = await loop.run_in_executor(state['executor'], _render, state, target)
+                if rendered[0] != 500:  # Errors are not cached, the next request tries again
+                    rendered = _lru_get(state['responses'], target, API_CACHE_SIZE, lambda: rendered)
+                status, body, compressed, etag = rendered
+                response_headers.update({'ETag': etag, 'Cache-Control': 'public, max-age=3600', 'Vary': 'Accept-Encoding'})
+                if status == 200 and etag in headers.get('if-none-match', ''):
+                    status, body = 304, b''
+                elif compressed is not None and 'gzip' in headers.get('accept-encoding', ''):
+                    body = compressed
+                    response_headers['Content-Encoding'] = 'gzip'
+                response_headers['Content-Length'] = len(body)
+                response = _response_bytes(status, response_headers, b'' if method == 'HEAD' else body)
+
+            writer.write(response)
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def start_api(state, host=API_HOST, port=API_PORT):
+    """Start the server on the running event loop."""
+    return await asyncio.start_server(lambda r, w: handle_connection(r, w, state), host, port)
+
+
+async def benchmark(host, port, targets, requests=BENCHMARK_REQUESTS, concurrency=BENCHMARK_CONCURRENCY):
+    """
+    Send requests over concurrent keep-alive connections and measure the throughput
+
+    Args:
+        targets (list): Request targets, used round robin
+        requests (int): Total number of requests
+        concurrency (int): Number of connections sending at the same time
+
+    Returns:
+        dict: 'requests', 'seconds', 'requests_per_second' and the 50th/99th
+        percentile latency in milliseconds
+    """
+    latencies = []
+    counter = iter(range(requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        for i in counter:
+            target = targets[i % len(targets)]
+            started = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\n\r\n".encode('latin-1'))
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(next(line.split(b':')[1] for line in head.split(b'\r\n') if line.lower().startswith(b'content-length')))
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'seconds': seconds,
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99))
+    }
+
+
+def main(host=API_HOST, port=API_PORT, run_benchmark=False):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    state = load_api_state(processed_dir)
+
+    async def serve():
+        server = await start_api(state, host, port)
+        print(f"✅ Ridership API listening on http://{host}:{port} (/stations, /stations/<id>, /top, /compare, /range)")
+        if not run_benchmark:
+            async with server:
+                await server.serve_forever()
+            return
+
+        station_ids = list(state['codes'])
+        targets = ['/top?n=10', '/compare?periods=2023,2024', '/range?start=2024-01-01&end=2024-07-01'] + \
+                  [f"/stations/{station_id}?period=2024" for station_id in station_ids]
+        result = await benchmark(host, port, targets)
+        print(f"✅ {result['requests']} requests in {result['seconds']:.2f} s: {result['requests_per_second']:,.0f} requests/s, "
+              f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+from RawData import to_hour_index, CODED_COLUMNS
+
+STORE_DIR_NAME = "row_groups"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Rows per row group. Each row group only ever holds rows from one calendar
+# month, so a year or month filter can skip whole groups from the manifest.
+ROW_GROUP_SIZE = 200000
+
+# Columns kept in the store and the dtype each one is written with
+STORE_COLUMNS = {
+    'hour_index': np.int64,
+    'station_code': np.int32,
+    'ridership': np.float32,
+    'transfers': np.float32,
+    'payment_method': np.int8,
+    'fare_class_category': np.int8
+}
+
+
+def month_index(hour_index):
+    """Convert hour indexes to months since 1970-01 (int64)."""
+    return np.asarray(hour_index, dtype='datetime64[h]').astype('datetime64[M]').astype(np.int64)
+
+
+def new_row_group_writer(processed_dir):
+    """Create a writer for the processed store, removing any store from a previous ingest."""
+    store_dir = processed_dir / STORE_DIR_NAME
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    store_dir.mkdir(parents=True)
+
+    return {
+        'store_dir': store_dir,
+        'buffers': {},       # month index -> list of column dicts waiting to be written
+        'buffered_rows': {},  # month index -> number of rows waiting
+        'zone_maps': [],
+        'dictionaries': {column: {} for column in CODED_COLUMNS}  # text value -> code
+    }
+
+
+def _encode(writer, column, values):
+    """Turn the text values of a coded column into codes, giving new values the next free code."""
+    dictionary = writer['dictionaries'][column]
+    for value in pd.unique(values):
+        if value not in dictionary:
+            dictionary[value] = len(dictionary)
+    return pd.Series(values).map(dictionary).to_numpy(dtype=STORE_COLUMNS[column])
+
+
+def _write_row_group(writer, columns):
+    """Sort one row group by station and time, write its columns and record its zone map."""
+    order = np.lexsort((columns['hour_index'], columns['station_code']))
+    name = f"rg_{len(writer['zone_maps']):05d}"
+
+    for column, values in columns.items():
+        np.save(writer['store_dir'] / f"{name}.{column}.npy", values[order])
+
+    # The values of every coded column present, so where= filters can skip the group
+    values_present = {column: [int(code) for code in np.unique(columns[column])] for column in CODED_COLUMNS}
+
+    hours = columns['hour_index']
+    stations = columns['station_code']
+    writer['zone_maps'].append({
+        'name': name,
+        'rows': int(len(hours)),
+        'hour_min': int(hours.min()),
+        'hour_max': int(hours.max()),
+        'station_min': int(stations.min()),
+        'station_max': int(stations.max()),
+        'values': values_present
+    })
+
+
+def _flush_month(writer, month):
+    """Write everything buffered for one month as row groups of at most ROW_GROUP_SIZE rows."""
+    parts = writer['buffers'].pop(month)
+    writer['buffered_rows'].pop(month)
+    merged = {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+
+    total = len(merged['hour_index'])
+    for start in range(0, total, ROW_GROUP_SIZE):
+        _write_row_group(writer, {column: values[start:start + ROW_GROUP_SIZE] for column, values in merged.items()})
+
+
+def write_chunk(writer, chunk, station_codes):
+    """
+    Buffer one cleaned chunk, splitting it by calendar month
+
+    Args:
+        writer (dict): Writer created by new_row_group_writer
+        chunk (DataFrame): Chunk from read_raw_chunks
+        station_codes (ndarray): Station code for every row of the chunk
+    """
+    columns = {
+        'hour_index': chunk['hour_index'].to_numpy(dtype=np.int64),
+        'station_code': np.asarray(station_codes, dtype=np.int32),
+        'ridership': chunk['ridership'].to_numpy(dtype=np.float32),
+        'transfers': chunk['transfers'].to_numpy(dtype=np.float32),
+        **{column: _encode(writer, column, chunk[column].to_numpy()) for column in CODED_COLUMNS}
+    }
+    months = month_index(columns['hour_index'])
+    order = np.argsort(months, kind='stable')
+    months = months[order]
+    boundaries = np.flatnonzero(np.diff(months)) + 1
+
+    for month, part_order in zip(months[np.r_[0, boundaries]], np.split(order, boundaries)):
+        month = int(month)
+        part = {column: values[part_order] for column, values in columns.items()}
+
+        writer['buffers'].setdefault(month, []).append(part)
+        writer['buffered_rows'][month] = writer['buffered_rows'].get(month, 0) + len(part_order)
+
+        # Only full row groups are written while the scan is running
+        if writer['buffered_rows'][month] >= ROW_GROUP_SIZE:
+            _flush_month(writer, month)
+
+
+def close_row_group_writer(writer):
+    """Write the remaining buffers and the manifest holding the zone maps."""
+    for month in sorted(writer['buffers']):
+        _flush_month(writer, month)
+
+    manifest_file = writer['store_dir'] / MANIFEST_FILE_NAME
+    manifest = {
+        'columns': {column: np.dtype(dtype).name for column, dtype in STORE_COLUMNS.items()},
+        # Text value of every code, in code order
+        'dictionaries': {column: list(dictionary) for column, dictionary in writer['dictionaries'].items()},
+        'row_groups': writer['zone_maps']
+    }
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest_file
+
+
+def load_manifest(processed_dir):
+    """Load the zone map manifest of the processed store."""
+    manifest_file = processed_dir / STORE_DIR_NAME / MANIFEST_FILE_NAME
+    if not manifest_file.exists():
+        raise FileNotFoundError(f"🚨 Processed store not found: {manifest_file}. Run IngestRawData.py first.")
+    with open(manifest_file, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def encode_where(manifest, where):
+    """
+    Turn a {coded column: value or list of values} filter into codes
+
+    Values the store has never seen get no code, so they match no rows.
+    """
+    if not where:
+        return None
+    encoded = {}
+    for column, values in where.items():
+        if column not in manifest['dictionaries']:
+            raise ValueError(f"Unknown coded column: {column}")
+        values = [values] if isinstance(values, str) else list(values)
+        dictionary = manifest['dictionaries'][column]
+        encoded[column] = [dictionary.index(value) for value in values if value in dictionary]
+    return encoded
+
+
+def row_group_may_match(zone_map, years=None, months=None, stations=None, start=None, end=None, where_codes=None):
+    """
+    Check a row group's zone map against the filters
+
+    Returns False only when no row in the group can match, so a True result
+    still needs the rows themselves to be filtered.
+    """
+    if where_codes is not None:
+        for column, codes in where_codes.items():
+            if not set(codes) & set(zone_map['values'][column]):
+                return False
+
+    if stations is not None:
+        stations = np.asarray(stations)
+        if not ((stations >= zone_map['station_min']) & (stations <= zone_map['station_max'])).any():
+            return False
+
+    if start is not None and zone_map['hour_max'] < start:
+        return False
+    if end is not None and zone_map['hour_min'] > end:
+        return False
+
+    if years is not None or months is not None:
+        first_month, last_month = month_index([zone_map['hour_min'], zone_map['hour_max']])
+        spanned = np.arange(first_month, last_month + 1)
+        if years is not None and not np.isin(spanned // 12 + 1970, list(years)).any():
+            return False
+        if months is not None and not np.isin(spanned % 12 + 1, list(months)).any():
+            return False
+
+    return True
+
+
+def _row_mask(group, years, months, stations, start, end):
+    """Build the row-level filter for a row group that passed its zone map check."""
+    mask = np.ones(len(group['hour_index']), dtype=bool)
+    if stations is not None:
+        mask &= np.isin(group['station_code'], stations)
+    if start is not None:
+        mask &= group['hour_index'] >= start
+    if end is not None:
+        mask &= group['hour_index'] <= end
+    if years is not None or months is not None:
+        row_months = month_index(group['hour_index'])
+        if years is not None:
+            mask &= np.isin(row_months // 12 + 1970, list(years))
+        if months is not None:
+            mask &= np.isin(row_months % 12 + 1, list(months))
+    return mask
+
+
+def _where_mask(group, where_codes):
+    """
+    Row mask of a coded column filter: any of the codes of each column, all columns
+
+    The int8 code columns are read directly. At one byte per row they are
+    as small as per-value bitmaps over rows sorted by station and hour,
+    where the payment and fare values alternate and leave no runs to compress.
+    """
+    mask = np.ones(len(group['hour_index']), dtype=bool)
+    for column, codes in where_codes.items():
+        mask &= np.isin(group[column], codes)
+    return mask
+
+
+def read_row_groups(processed_dir, columns=None, years=None, months=None, stations=None, start=None, end=None,
+                    where=None):
+    """
+    Read the processed store, skipping row groups whose zone maps rule them out
+
+    Args:
+        processed_dir (Path): Directory the store was written to
+        columns (list): Columns to return (defaults to every stored column)
+        years (list): Only keep rows from these years
+        months (list): Only keep rows from these calendar months (1-12)
+        stations (list): Only keep rows with these station codes
+        start, end (Timestamp): Only keep rows inside this inclusive range
+        where (dict): Only keep rows with these coded column values, e.g.
+            {'payment_method': 'omny'} or {'fare_class_category': [...]};
+            answered from the code columns
+
+    Yields:
+        dict: Column name -> ndarray for the matching rows of each row group
+    """
+    manifest = load_manifest(processed_dir)
+    store_dir = processed_dir / STORE_DIR_NAME
+    columns = list(columns or manifest['columns'])
+    start = None if start is None else int(to_hour_index([pd.Timestamp(start)])[0])
+    end = None if end is None else int(to_hour_index([pd.Timestamp(end)])[0])
+    where_codes = encode_where(manifest, where)
+
+    for zone_map in manifest['row_groups']:
+        if not row_group_may_match(zone_map, years, months, stations, start, end, where_codes):
+            continue
+
+        # Memory-map the columns so only the parts that are used get read
+        needed = set(columns) | {'hour_index', 'station_code'} | set(where_codes or {})
+        group = {column: np.load(store_dir / f"{zone_map['name']}.{column}.npy", mmap_mode='r') for column in needed}
+        mask = _row_mask(group, years, months, stations, start, end)
+        if where_codes is not None:
+            mask &= _where_mask(group, where_codes)
+        if mask.any():
+            yield {column: np.asarray(group[column][mask]) for column in columns}
+
+
+def read_store(processed_dir, columns=None, **filters):
+    """Read the matching rows of the processed store into one DataFrame, with coded columns as categories."""
+    manifest = load_manifest(processed_dir)
+    parts = [pd.DataFrame(group) for group in read_row_groups(processed_dir, columns, **filters)]
+    if not parts:
+        return pd.DataFrame(columns=list(columns or manifest['columns']))
+    df = pd.concat(parts, ignore_index=True)
+    for column in CODED_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.Categorical.from_codes(df[column], categories=manifest['dictionaries'][column])
+    return df
+
+
+def _year_range(manifest):
+    """First year of the store (as years since 1970) and the number of years it spans."""
+    first = min(int(month_index([zone_map['hour_min']])[0]) // 12 for zone_map in manifest['row_groups'])
+    last = max(int(month_index([zone_map['hour_max']])[0]) // 12 for zone_map in manifest['row_groups'])
+    return first, last - first + 1
+
+
+def _key_column(group, column, manifest):
+    """Codes 0..n-1 of one by= column for the rows of a row group, and n."""
+    if column == 'hour':
+        return group['hour_index'] % 24, 24
+    if column == 'month':
+        return month_index(group['hour_index']) % 12, 12
+    if column == 'year':
+        first_year, n_years = _year_range(manifest)
+        return month_index(group['hour_index']) // 12 - first_year, n_years
+    if column == 'station_code':
+        return group['station_code'], max(zone_map['station_max'] for zone_map in manifest['row_groups']) + 1
+    if column in CODED_COLUMNS:
+        return group[column], len(manifest['dictionaries'][column])
+    raise ValueError(f"Cannot group by {column}")
+
+
+def _key_labels(column, size, manifest):
+    """Labels of the codes of one by= column."""
+    if column == 'hour':
+        return np.arange(24)
+    if column == 'month':
+        return np.arange(1, 13)
+    if column == 'year':
+        return np.arange(size) + _year_range(manifest)[0] + 1970
+    if column in CODED_COLUMNS:
+        return np.asarray(manifest['dictionaries'][column])
+    return np.arange(size)
+
+
+def aggregate_store(processed_dir, by, value='ridership', **filters):
+    """
+    Sum a column of the processed store grouped by one or more columns, one row group at a time
+
+    The filters (including where= on the coded columns) select rows, then
+    every row group adds its masked rows into one flat array of totals with
+    np.bincount, so the raw rows are never collected in one place.
+
+    Args:
+        processed_dir (Path): Directory the store was written to
+        by (list): Columns to group by: station_code, payment_method,
+            fare_class_category, hour, month or year
+        value (str): Column to sum, 'ridership' or 'transfers'
+        **filters: Filters of read_row_groups, e.g. years=[2024], where={'payment_method': 'omny'}
+
+    Returns:
+        Series: Totals indexed by the by= columns, without empty groups
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    manifest = load_manifest(processed_dir)
+    if not manifest['row_groups']:
+        return pd.Series(dtype=np.float64)
+    needed = [value, 'hour_index'] + [column for column in by if column in STORE_COLUMNS]
+
+    sizes, totals = None, None
+    for group in read_row_groups(processed_dir, list(dict.fromkeys(needed)), **filters):
+        keys = [_key_column(group, column, manifest) for column in by]
+        if sizes is None:
+            sizes = [size for _, size in keys]
+            totals = np.zeros(int(np.prod(sizes)))
+        flat = np.ravel_multi_index([codes.astype(np.int64) for codes, _ in keys], sizes)
+        totals += np.bincount(flat, weights=group[value], minlength=len(totals))
+
+    if totals is None:
+        return pd.Series(dtype=np.float64)
+    index = pd.MultiIndex.from_product([_key_labels(column, size, manifest) for column, size in zip(by, sizes)], names=by)
+    result = pd.Series(totals, index=index, name=value)
+    result = result[result != 0]
+    return result.droplevel(list(range(1, len(by)))) if len(by) == 1 else result
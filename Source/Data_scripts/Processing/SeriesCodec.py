@@ -0,0 +1,211 @@
+import json
+import struct
+
+import numpy as np
+
+# Every encoded series starts with this header (little endian): magic,
+# version, scheme, bit width (FOR only), padding, number of values, payload
+# bytes and the base value (first value for delta, minimum for FOR)
+SERIES_MAGIC = b'MTS1'
+SERIES_HEADER = struct.Struct('<4sBBBxIIq')
+SERIES_VERSION = 1
+
+# delta + zigzag + varint: small changes between neighbours take one byte
+DELTA_VARINT = 0
+# frame of reference: every value minus the minimum, packed in as few bits as the largest needs
+FRAME_OF_REFERENCE = 1
+SCHEMES = {'delta': DELTA_VARINT, 'for': FRAME_OF_REFERENCE}
+
+# A file of several named series: magic, length of a JSON header with the
+# names (and any other metadata), the JSON, then the encoded series in order
+FILE_MAGIC = b'MTSF'
+FILE_HEADER = struct.Struct('<4sI')
+
+
+def _whole_numbers(values):
+    """Series as int64, refusing values that are not whole numbers."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        if not np.all(np.isfinite(values)) or np.any(values != np.round(values)):
+            raise ValueError("Only whole-number series can be encoded; round them first")
+    return values.astype(np.int64)
+
+
+def zigzag_encode(values):
+    """Map signed to unsigned so small negative numbers stay small: 0, -1, 1, -2 -> 0, 1, 2, 3."""
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def zigzag_decode(values):
+    """Inverse of zigzag_encode."""
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def varint_encode(values):
+    """LEB128 bytes of unsigned values: 7 bits per byte, high bit set on all but the last byte of a value."""
+    values = np.asarray(values, dtype=np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        n_bytes += values >= np.uint64(1) << np.uint64(7 * k)
+    offsets = np.cumsum(n_bytes) - n_bytes
+
+    out = np.empty(int(n_bytes.sum()), dtype=np.uint8)
+    for k in range(int(n_bytes.max(initial=0))):
+        has_byte = n_bytes > k
+        chunk = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (n_bytes[has_byte] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[has_byte] + k] = (chunk | more).astype(np.uint8)
+    return out
+
+
+def varint_decode(data, count):
+    """Decode count LEB128 values from a uint8 array in one pass."""
+    data = np.asarray(data, dtype=np.uint8)
+    last_byte = data < 0x80
+    ends = np.flatnonzero(last_byte)[:count]
+    data = data[:ends[-1] + 1] if count else data[:0]
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+
+    # Position of every byte inside its value gives its shift
+    value_of_byte = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(data))))
+    shift = (np.arange(len(data)) - starts[value_of_byte]).astype(np.uint64) * np.uint64(7)
+    parts = (data & 0x7F).astype(np.uint64) << shift
+    return np.add.reduceat(parts, starts) if count else np.empty(0, dtype=np.uint64)
+
+
+def bitpack(values, width):
+    """Pack unsigned values into width bits each (little-endian bit order)."""
+    if width == 0:
+        return np.empty(0, dtype=np.uint8)
+    values = np.asarray(values, dtype=np.uint64)
+    bits = ((values[:, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(bits.ravel(), bitorder='little')
+
+
+def bitunpack(data, count, width):
+    """Unpack count values of width bits each."""
+    if width == 0:
+        return np.zeros(count, dtype=np.uint64)
+    bits = np.unpackbits(np.asarray(data, dtype=np.uint8), count=count * width, bitorder='little')
+    weights = np.uint64(1) << np.arange(width, dtype=np.uint64)
+    return bits.reshape(count, width).astype(np.uint64) @ weights
+
+
+def encode_series(values, scheme='auto'):
+    """
+    Encode a whole-number series to bytes
+
+    Args:
+        values (array-like): Whole numbers (int or float)
+        scheme (str): 'delta' (delta + zigzag + varint), 'for' (frame of
+            reference bit-packing) or 'auto' for whichever is smaller
+
+    Returns:
+        bytes: Header and payload
+    """
+    values = _whole_numbers(values)
+    if scheme == 'auto':
+        return min((encode_series(values, name) for name in SCHEMES), key=len)
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown scheme: {scheme}")
+
+    if scheme == 'delta':
+        base = int(values[0]) if len(values) else 0
+        payload = varint_encode(zigzag_encode(np.diff(values, prepend=base)))
+        width = 0
+    else:
+        base = int(values.min()) if len(values) else 0
+        offsets = (values - base).view(np.uint64)
+        width = int(offsets.max()).bit_length() if len(values) else 0
+        payload = bitpack(offsets, width)
+
+    header = SERIES_HEADER.pack(SERIES_MAGIC, SERIES_VERSION, SCHEMES[scheme], width, len(values), len(payload), base)
+    return header + payload.tobytes()
+
+
+def decode_series(data, offset=0):
+    """
+    Decode one series written by encode_series
+
+    Args:
+        data (bytes): Buffer holding the series
+        offset (int): Where the series starts in the buffer
+
+    Returns:
+        tuple: (int64 array, offset just past the series)
+    """
+    magic, version, scheme, width, count, n_bytes, base = SERIES_HEADER.unpack_from(data, offset)
+    if magic != SERIES_MAGIC or version != SERIES_VERSION:
+        raise ValueError("Not an encoded series")
+    start = offset + SERIES_HEADER.size
+    payload = np.frombuffer(data, dtype=np.uint8, count=n_bytes, offset=start)
+
+    if scheme == DELTA_VARINT:
+        values = np.cumsum(zigzag_decode(varint_decode(payload, count))) + base
+    elif scheme == FRAME_OF_REFERENCE:
+        values = bitunpack(payload, count, width).view(np.int64) + base
+    else:
+        raise ValueError(f"Unknown scheme code: {scheme}")
+    return values.astype(np.int64), start + n_bytes
+
+
+def encode_series_file(series, metadata=None, scheme='auto'):
+    """
+    Encode several named series, and optional JSON metadata, into one buffer
+
+    Args:
+        series (dict): Name -> whole-number series
+        metadata (dict): Anything JSON can hold, returned as is by decode_series_file
+        scheme (str): Scheme of encode_series
+
+    Returns:
+        bytes
+    """
+    header = json.dumps({'names': list(series), 'metadata': metadata or {}}, separators=(',', ':')).encode('utf-8')
+    parts = [FILE_HEADER.pack(FILE_MAGIC, len(header)), header]
+    parts += [encode_series(values, scheme) for values in series.values()]
+    return b''.join(parts)
+
+
+def decode_series_file(data, names=None):
+    """
+    Decode a buffer written by encode_series_file
+
+    Args:
+        data (bytes): The buffer
+        names (list): Only decode these series (the others are skipped over)
+
+    Returns:
+        tuple: (dict of name -> int64 array, metadata dict)
+    """
+    magic, header_length = FILE_HEADER.unpack_from(data, 0)
+    if magic != FILE_MAGIC:
+        raise ValueError("Not a series file")
+    offset = FILE_HEADER.size
+    header = json.loads(bytes(data[offset:offset + header_length]).decode('utf-8'))
+    offset += header_length
+
+    series = {}
+    for name in header['names']:
+        if names is None or name in names:
+            series[name], offset = decode_series(data, offset)
+        else:
+            n_bytes = SERIES_HEADER.unpack_from(data, offset)[5]
+            offset += SERIES_HEADER.size + n_bytes
+    return series, header['metadata']
+
+
+def write_series_file(file_path, series, metadata=None, scheme='auto'):
+    """Write encode_series_file output to a file and return its size in bytes."""
+    data = encode_series_file(series, metadata, scheme)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def read_series_file(file_path, names=None):
+    """Read a file written by write_series_file."""
+    with open(file_path, 'rb') as f:
+        return decode_series_file(f.read(), names)
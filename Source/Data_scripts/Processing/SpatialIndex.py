@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from RawData import hour_index_to_timestamp
+from StationCatalog import load_station_catalog
+from TimePyramid import load_time_pyramid
+from ExcelTables import write_table
+
+# Mean earth radius used for all distances
+EARTH_RADIUS_METERS = 6371008.8
+
+# Side of one grid cell. Radius queries only look at the cells the circle touches
+GRID_CELL_METERS = 500
+
+# Radius of the area around every station in the report, about a 10 minute walk
+WALKSHED_METERS = 800
+
+# Nearest stations listed for every station in the report
+NEAREST_STATIONS = 5
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters; the arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _project(index, lat, lon):
+    """Meters east and north of the grid corner, on a plane tangent at the index's mean latitude."""
+    lat0, lon0 = index['origin']
+    x = EARTH_RADIUS_METERS * np.radians(np.asarray(lon, dtype=np.float64) - lon0) * np.cos(np.radians(lat0))
+    y = EARTH_RADIUS_METERS * np.radians(np.asarray(lat, dtype=np.float64) - lat0)
+    return x - index['corner'][0], y - index['corner'][1]
+
+
+def build_spatial_index(catalog_df, cell_meters=GRID_CELL_METERS):
+    """
+    Uniform grid over the station coordinates of the catalog
+
+    The stations are sorted by grid cell (row by row), so the stations of a
+    run of cells in one grid row are one contiguous slice found with two
+    lookups in 'cell_starts'. Stations without coordinates are left out.
+
+    Args:
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+        cell_meters (float): Side of one grid cell
+
+    Returns:
+        dict: 'station_code', 'latitude', 'longitude', 'x', 'y' (sorted by
+        cell), 'origin', 'corner', 'cell_meters', 'shape' (cells across and
+        down) and 'cell_starts'
+    """
+    located = catalog_df.dropna(subset=['latitude', 'longitude'])
+    latitude = located['latitude'].to_numpy(dtype=np.float64)
+    longitude = located['longitude'].to_numpy(dtype=np.float64)
+
+    index = {'origin': (latitude.mean(), longitude.mean()), 'corner': (0.0, 0.0), 'cell_meters': float(cell_meters)}
+    x, y = _project(index, latitude, longitude)
+    index['corner'] = (x.min(), y.min())
+    x, y = x - x.min(), y - y.min()
+
+    columns = (x // cell_meters).astype(np.int64)
+    rows = (y // cell_meters).astype(np.int64)
+    shape = (int(columns.max()) + 1, int(rows.max()) + 1)
+    cells = rows * shape[0] + columns
+    order = np.argsort(cells, kind='stable')
+
+    index.update({
+        'station_code': located['station_code'].to_numpy(dtype=np.int64)[order],
+        'latitude': latitude[order],
+        'longitude': longitude[order],
+        'x': x[order],
+        'y': y[order],
+        'shape': shape,
+        'cell_starts': np.searchsorted(cells[order], np.arange(shape[0] * shape[1] + 1))
+    })
+    return index
+
+
+def _candidates(index, x_min, x_max, y_min, y_max):
+    """Positions of the stations in the cells overlapping a box (projected meters)."""
+    n_columns, n_rows = index['shape']
+    cell = index['cell_meters']
+    first_column, last_column = max(int(x_min // cell), 0), min(int(x_max // cell), n_columns - 1)
+    first_row, last_row = max(int(y_min // cell), 0), min(int(y_max // cell), n_rows - 1)
+    if first_column > last_column or first_row > last_row:
+        return np.empty(0, dtype=np.int64)
+
+    starts = index['cell_starts']
+    slices = [np.arange(starts[row * n_columns + first_column], starts[row * n_columns + last_column + 1])
+              for row in range(first_row, last_row + 1)]
+    return np.concatenate(slices)
+
+
+def stations_within(index, lat, lon, radius_meters):
+    """
+    Stations within a radius of a point
+
+    Returns:
+        tuple: (station codes, distances in meters), nearest first
+    """
+    x, y = _project(index, lat, lon)
+    # The plane is only used to find the cells; a small margin covers its
+    # error and the exact distance decides
+    reach = radius_meters * 1.01 + 1
+    positions = _candidates(index, x - reach, x + reach, y - reach, y + reach)
+    distances = haversine_meters(lat, lon, index['latitude'][positions], index['longitude'][positions])
+    inside = distances <= radius_meters
+    positions, distances = positions[inside], distances[inside]
+    order = np.argsort(distances, kind='stable')
+    return index['station_code'][positions[order]], distances[order]
+
+
+def nearest_stations(index, lat, lon, k=NEAREST_STATIONS):
+    """
+    The k stations nearest to a point
+
+    The search radius starts where k stations are expected at the average
+    station density and doubles until it holds k stations; every station
+    closer than the k-th one is then inside it too.
+
+    Returns:
+        tuple: (station codes, distances in meters), nearest first
+    """
+    k = min(k, len(index['station_code']))
+    x, y = _project(index, lat, lon)
+    width, height = (n * index['cell_meters'] for n in index['shape'])
+    radius = np.sqrt(k * width * height / (np.pi * len(index['station_code'])))
+    # A point outside the grid starts with a radius that reaches it
+    radius += np.hypot(max(-x, 0, x - width), max(-y, 0, y - height))
+    while True:
+        codes, distances = stations_within(index, lat, lon, radius)
+        if len(codes) >= k:
+            return codes[:k], distances[:k]
+        radius *= 2
+
+
+def _inside_polygon(x, y, polygon_x, polygon_y):
+    """Even-odd rule for many points against one polygon."""
+    inside = np.zeros(len(x), dtype=bool)
+    x_prev, y_prev = polygon_x[-1], polygon_y[-1]
+    for x_vertex, y_vertex in zip(polygon_x, polygon_y):
+        crosses = (y_vertex > y) != (y_prev > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = (x_prev - x_vertex) * (y - y_vertex) / (y_prev - y_vertex) + x_vertex
+        inside ^= crosses & (x < x_cross)
+        x_prev, y_prev = x_vertex, y_vertex
+    return inside
+
+
+def stations_in_polygon(index, polygon):
+    """
+    Stations inside a polygon
+
+    Args:
+        index (dict): From build_spatial_index
+        polygon (list): (latitude, longitude) vertices, in order
+
+    Returns:
+        ndarray: Station codes
+    """
+    polygon = np.asarray(polygon, dtype=np.float64)
+    polygon_x, polygon_y = _project(index, polygon[:, 0], polygon[:, 1])
+    positions = _candidates(index, polygon_x.min(), polygon_x.max(), polygon_y.min(), polygon_y.max())
+    inside = _inside_polygon(index['x'][positions], index['y'][positions], polygon_x, polygon_y)
+    return index['station_code'][positions[inside]]
+
+
+def aggregate_stations(values, station_codes):
+    """Add up the rows of a station x ... array (rows are station codes) for some stations."""
+    return np.asarray(values)[np.asarray(station_codes, dtype=np.int64)].sum(axis=0)
+
+
+def ridership_within(index, values, lat, lon, radius_meters):
+    """Total of a station x ... array over the stations within a radius of a point."""
+    return aggregate_stations(values, stations_within(index, lat, lon, radius_meters)[0])
+
+
+def ridership_in_polygon(index, values, polygon):
+    """Total of a station x ... array over the stations inside a polygon."""
+    return aggregate_stations(values, stations_in_polygon(index, polygon))
+
+
+def walkshed_matrix(index, radius_meters=WALKSHED_METERS, n_stations=None):
+    """
+    Station x station matrix with a 1 where the two stations are within the radius
+
+    Multiplying it with a station x ... array gives the total around every
+    station at once.
+    """
+    n_stations = n_stations or int(index['station_code'].max()) + 1
+    matrix = np.zeros((n_stations, n_stations))
+    for station_code, lat, lon in zip(index['station_code'], index['latitude'], index['longitude']):
+        matrix[station_code, stations_within(index, lat, lon, radius_meters)[0]] = 1
+    return matrix
+
+
+def main(radius_meters=WALKSHED_METERS, k=NEAREST_STATIONS):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    catalog_df = load_station_catalog(processed_dir)
+    pyramid = load_time_pyramid(processed_dir)
+    index = build_spatial_index(catalog_df)
+    stations = catalog_df.reset_index().set_index('station_code')
+    names = stations['station_complex']
+
+    rows = []
+    for station_code, lat, lon in zip(index['station_code'], index['latitude'], index['longitude']):
+        codes, distances = nearest_stations(index, lat, lon, k + 1)
+        others = codes != station_code
+        for rank, (neighbor, meters) in enumerate(zip(codes[others][:k], distances[others][:k]), 1):
+            rows.append({'station_complex': names[station_code], 'rank': rank,
+                         'neighbor': names[neighbor], 'meters': meters})
+    nearest = pd.DataFrame(rows, columns=['station_complex', 'rank', 'neighbor', 'meters'])
+
+    # Yearly ridership of every station's walkshed, all stations at once
+    years = hour_index_to_timestamp(pyramid['year_starts'][:-1] + int(pyramid['origin'])).year
+    matrix = walkshed_matrix(index, radius_meters, len(pyramid['year']))
+    walkshed = pd.DataFrame(matrix @ pyramid['year'], columns=[str(year) for year in years])
+    walkshed.insert(0, 'stations_within', matrix.sum(axis=1).astype(int))
+    walkshed.insert(0, 'borough', stations['borough'].reindex(walkshed.index).to_numpy())
+    walkshed.insert(0, 'station_complex', names.reindex(walkshed.index).to_numpy())
+    walkshed = walkshed[walkshed['stations_within'] > 0].sort_values('station_complex')
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Station_Neighborhoods_{radius_meters}m_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0'})
+
+        for sheet_name, table, text_columns in [('Nearest Stations', nearest, ['station_complex', 'neighbor']),
+                                                (f'Within {radius_meters} m', walkshed, ['station_complex', 'borough'])]:
+            worksheet = write_table(writer, table, sheet_name, {col: number_format for col in table.columns
+                                                                if col not in text_columns and col != 'rank'})
+            for idx, col in enumerate(table.columns):
+                worksheet.set_column(idx, idx, 40 if col in ['station_complex', 'neighbor'] else 16)
+
+    print(f"✅ Nearest stations and {radius_meters} m ridership of {len(index['station_code'])} stations saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+from RawData import hour_index_to_timestamp
+from StationCatalog import load_station_catalog
+from TimePyramid import load_time_pyramid
+from HourlyRollup import get_season
+from SeriesCodec import encode_series_file
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only the .gz copies are written
+    brotli = None
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Station files go in this folder next to the manifest
+STATION_DIR_NAME = "stations"
+
+# 'json', or 'binary' for SeriesCodec files (.bin): about 3x smaller, 1.2x once gzipped
+EXPORT_FORMAT = 'json'
+
+# Series stored as encoded arrays in binary station files
+SERIES_NAMES = ['hourly', 'daily', 'monthly']
+
+# Level 9 gzip is about 5x slower than 6 for files only ~3% smaller
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+# Stations exported at the same time; compression runs outside the GIL
+EXPORT_WORKERS = min(32, os.cpu_count() or 1)
+
+
+def series_axes(pyramid):
+    """
+    Time axes shared by every station file
+
+    Returns:
+        dict: 'first_hour' and 'first_day' (ISO timestamps the hourly and
+        daily series start at), 'months' ('YYYY-MM' of every monthly value)
+        and 'years'
+    """
+    origin = int(pyramid['origin'])
+    months = hour_index_to_timestamp(pyramid['month_starts'][:-1] + origin)
+    years = hour_index_to_timestamp(pyramid['year_starts'][:-1] + origin)
+    first = hour_index_to_timestamp([origin])[0]
+    return {
+        'first_hour': first.isoformat(),
+        'first_day': first.date().isoformat(),
+        'months': [month.strftime('%Y-%m') for month in months],
+        'years': [int(year) for year in years.year]
+    }
+
+
+def _seasonal(monthly, months):
+    """Season totals of every year from the monthly totals, e.g. {'2024': {'Winter': ...}}."""
+    seasonal = {}
+    for value, month in zip(monthly, months):
+        year, month_number = month.split('-')
+        seasons = seasonal.setdefault(year, {'Winter': 0, 'Spring': 0, 'Summer': 0, 'Fall': 0})
+        seasons[get_season(int(month_number))] += value
+    return seasonal
+
+
+def station_document(pyramid, axes, station):
+    """
+    Everything the website shows for one station
+
+    Args:
+        pyramid (dict): Pyramid from TimePyramid
+        axes (dict): From series_axes
+        station (dict): Catalog row with station_code
+
+    Returns:
+        dict: Station details, the hourly, daily and monthly series (whole
+        riders, starting at the axes' first hour, day and month) and the
+        season totals of every year
+    """
+    code = station['station_code']
+    monthly = np.rint(pyramid['month'][code]).astype(np.int64).tolist()
+    return {
+        'station_complex_id': station['station_complex_id'],
+        'station_complex': station['station_complex'],
+        'borough': station['borough'],
+        'first_hour': axes['first_hour'],
+        'first_day': axes['first_day'],
+        'months': axes['months'],
+        'hourly': np.rint(pyramid['hour'][code]).astype(np.int64).tolist(),
+        'daily': np.rint(pyramid['day'][code]).astype(np.int64).tolist(),
+        'monthly': monthly,
+        'seasonal': _seasonal(monthly, axes['months'])
+    }
+
+
+def write_precompressed(file_path, data):
+    """
+    Write data and its .gz (and .br when brotli is installed) copies
+
+    Returns:
+        dict: Size in bytes of every file written, and an ETag of the data
+    """
+    file_path.write_bytes(data)
+    sizes = {'bytes': len(data)}
+
+    compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    file_path.with_name(file_path.name + '.gz').write_bytes(compressed)
+    sizes['gzip_bytes'] = len(compressed)
+
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        file_path.with_name(file_path.name + '.br').write_bytes(compressed)
+        sizes['brotli_bytes'] = len(compressed)
+
+    sizes['etag'] = hashlib.sha1(data).hexdigest()[:20]
+    return sizes
+
+
+def export_station(pyramid, axes, station, station_dir, file_format=EXPORT_FORMAT):
+    """Write one station's file and return its manifest entry."""
+    document = station_document(pyramid, axes, station)
+    if file_format == 'json':
+        file_name = f"{station['station_complex_id']}.json"
+        data = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    elif file_format == 'binary':
+        # The series are encoded arrays and everything else the JSON metadata
+        file_name = f"{station['station_complex_id']}.bin"
+        metadata = {key: value for key, value in document.items() if key not in SERIES_NAMES}
+        data = encode_series_file({name: document[name] for name in SERIES_NAMES}, metadata)
+    else:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    sizes = write_precompressed(station_dir / file_name, data)
+    return {
+        'station_complex_id': station['station_complex_id'],
+        'station_complex': station['station_complex'],
+        'borough': station['borough'],
+        'latitude': None if np.isnan(station['latitude']) else station['latitude'],
+        'longitude': None if np.isnan(station['longitude']) else station['longitude'],
+        'ridership': int(sum(document['monthly'])),
+        'file': f"{STATION_DIR_NAME}/{file_name}",
+        **sizes
+    }
+
+
+def remove_stale_files(station_dir, entries):
+    """
+    Delete station files the manifest no longer lists
+
+    Files of stations that are gone, of the other format or compressed
+    copies that are no longer written (e.g. .br without brotli) would
+    otherwise stay next to the new export.
+
+    Returns:
+        int: Number of files deleted
+    """
+    keep = set()
+    for entry in entries:
+        name = Path(entry['file']).name
+        keep.add(name)
+        keep.add(name + '.gz')
+        if 'brotli_bytes' in entry:
+            keep.add(name + '.br')
+
+    removed = 0
+    for path in station_dir.iterdir():
+        if path.is_file() and path.name not in keep:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def export_static_site(pyramid, catalog_df, output_dir, file_format=EXPORT_FORMAT, workers=EXPORT_WORKERS):
+    """
+    Write one precompressed file per station and the manifest, stations in parallel
+
+    Station files of an earlier export that the new manifest does not list
+    are deleted once the new files are written.
+
+    Args:
+        pyramid (dict): Pyramid from TimePyramid
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+        output_dir (Path): Folder of the static site data
+        file_format (str): 'json' or 'binary'
+        workers (int): Stations exported at the same time
+
+    Returns:
+        Path: The manifest file
+    """
+    station_dir = output_dir / STATION_DIR_NAME
+    station_dir.mkdir(parents=True, exist_ok=True)
+    axes = series_axes(pyramid)
+    stations = catalog_df.reset_index().to_dict(orient='records')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(lambda station: export_station(pyramid, axes, station, station_dir, file_format), stations))
+    remove_stale_files(station_dir, entries)
+
+    manifest = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        **axes,
+        'format': file_format,
+        'encodings': ['gzip'] + (['br'] if brotli is not None else []),
+        'stations': sorted(entries, key=lambda entry: entry['station_complex'])
+    }
+    manifest_file = output_dir / MANIFEST_FILE_NAME
+    write_precompressed(manifest_file, json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+    return manifest_file
+
+
+def main(file_format=EXPORT_FORMAT):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "static"
+
+    pyramid = load_time_pyramid(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+
+    started = time.perf_counter()
+    manifest_file = export_static_site(pyramid, catalog_df, output_dir, file_format)
+    print(f"✅ {len(catalog_df)} station files exported in {time.perf_counter() - started:.1f} s, manifest saved to: {manifest_file}")
+
+
+if __name__ == "__main__":
+    main()
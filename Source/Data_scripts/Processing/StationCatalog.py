@@ -0,0 +1,194 @@
+import json
+import numpy as np
+import pandas as pd
+
+from RawData import hour_index_to_timestamp
+
+CATALOG_FILE_NAME = "station_catalog.json"
+
+# Borough of a station whose rows never name one
+UNKNOWN_BOROUGH = "Unknown"
+
+
+def new_station_catalog():
+    """Create an empty catalog to be filled by update_station_catalog."""
+    return {
+        'codes': {},      # station_complex_id -> integer station code
+        'stations': {},   # station_complex_id -> accumulated record
+        'coverage': {}    # station_complex_id -> (first hour, bool array of hours seen)
+    }
+
+
+def get_station_codes(catalog, station_ids):
+    """
+    Map station ids to integer codes, assigning new codes in order of first appearance
+
+    Args:
+        catalog (dict): Catalog created by new_station_catalog
+        station_ids (Series): station_complex_id values
+
+    Returns:
+        ndarray: int32 station code for every value
+    """
+    codes = catalog['codes']
+    unique_ids, inverse = np.unique(station_ids.to_numpy(dtype=str), return_inverse=True)
+    for station_id in unique_ids:
+        if station_id not in codes:
+            codes[station_id] = len(codes)
+    unique_codes = np.array([codes[station_id] for station_id in unique_ids], dtype=np.int32)
+    return unique_codes[inverse]
+
+
+def _mark_coverage(catalog, station_id, hours):
+    """Mark the hours a station reported data in its coverage bitmap."""
+    coverage = catalog['coverage']
+    lo, hi = int(hours.min()), int(hours.max())
+
+    if station_id not in coverage:
+        coverage[station_id] = (lo, np.zeros(hi - lo + 1, dtype=bool))
+
+    start, seen = coverage[station_id]
+    # Grow the bitmap if this chunk reaches outside the current window
+    if lo < start or hi >= start + len(seen):
+        new_start = min(start, lo)
+        grown = np.zeros(max(start + len(seen), hi + 1) - new_start, dtype=bool)
+        grown[start - new_start:start - new_start + len(seen)] = seen
+        start, seen = new_start, grown
+        coverage[station_id] = (start, seen)
+
+    seen[hours - start] = True
+
+
+def update_station_catalog(catalog, chunk):
+    """Fold one cleaned chunk from read_raw_chunks into the catalog and return its station codes."""
+    station_codes = get_station_codes(catalog, chunk['station_complex_id'])
+
+    grouped = chunk.groupby('station_complex_id').agg(
+        first_hour=('hour_index', 'min'),
+        last_hour=('hour_index', 'max'),
+        rows=('ridership', 'size'),
+        ridership=('ridership', 'sum')
+    )
+    name_counts = chunk.groupby(['station_complex_id', 'station_complex']).size()
+
+    stations = catalog['stations']
+    for station_id, row in grouped.iterrows():
+        record = stations.get(station_id)
+        if record is None:
+            record = {
+                'first_hour': int(row['first_hour']),
+                'last_hour': int(row['last_hour']),
+                'rows': 0,
+                'ridership': 0.0,
+                'names': {},
+                'boroughs': {},
+                'coordinates': [0.0, 0.0, 0]   # latitude sum, longitude sum, rows
+            }
+            stations[station_id] = record
+        record['first_hour'] = min(record['first_hour'], int(row['first_hour']))
+        record['last_hour'] = max(record['last_hour'], int(row['last_hour']))
+        record['rows'] += int(row['rows'])
+        record['ridership'] += float(row['ridership'])
+
+    for (station_id, name), count in name_counts.items():
+        names = stations[station_id]['names']
+        names[name] = names.get(name, 0) + int(count)
+
+    if 'borough' in chunk.columns:
+        borough_counts = chunk.groupby(['station_complex_id', 'borough']).size()
+        for (station_id, borough), count in borough_counts.items():
+            boroughs = stations[station_id]['boroughs']
+            boroughs[borough] = boroughs.get(borough, 0) + int(count)
+
+    if 'latitude' in chunk.columns and 'longitude' in chunk.columns:
+        located = chunk.dropna(subset=['latitude', 'longitude'])
+        coordinates = located.groupby('station_complex_id').agg(
+            latitude=('latitude', 'sum'),
+            longitude=('longitude', 'sum'),
+            rows=('latitude', 'size')
+        )
+        for station_id, row in coordinates.iterrows():
+            total = stations[station_id]['coordinates']
+            total[0] += float(row['latitude'])
+            total[1] += float(row['longitude'])
+            total[2] += int(row['rows'])
+
+    for station_id, hours in chunk.groupby('station_complex_id')['hour_index']:
+        _mark_coverage(catalog, station_id, hours.to_numpy())
+
+    return station_codes
+
+
+def finalize_station_catalog(catalog):
+    """
+    Turn the accumulated catalog into one row per station
+
+    Returns:
+        DataFrame: Indexed by station_complex_id with the canonical name, all
+        names seen, borough, latitude/longitude, first/last timestamp, hours
+        covered, missing hours inside the first-to-last window and lifetime
+        ridership
+    """
+    rows = []
+    for station_id, record in catalog['stations'].items():
+        names = record['names']
+        boroughs = record['boroughs']
+        latitude_sum, longitude_sum, located_rows = record['coordinates']
+        start, seen = catalog['coverage'][station_id]
+        first, last = record['first_hour'], record['last_hour']
+        hours_covered = int(seen[first - start:last - start + 1].sum())
+        rows.append({
+            'station_complex_id': station_id,
+            'station_code': catalog['codes'][station_id],
+            # The name reported on the most rows is treated as canonical
+            'station_complex': max(names, key=names.get),
+            'all_names': sorted(names),
+            'borough': max(boroughs, key=boroughs.get) if boroughs else UNKNOWN_BOROUGH,
+            # Average position over the rows, NaN when no row has one
+            'latitude': latitude_sum / located_rows if located_rows else np.nan,
+            'longitude': longitude_sum / located_rows if located_rows else np.nan,
+            'first_seen': hour_index_to_timestamp([first])[0],
+            'last_seen': hour_index_to_timestamp([last])[0],
+            'hours_covered': hours_covered,
+            'missing_hours': (last - first + 1) - hours_covered,
+            'rows': record['rows'],
+            'lifetime_ridership': record['ridership']
+        })
+
+    columns = ['station_complex_id', 'station_code', 'station_complex', 'all_names', 'borough', 'latitude',
+               'longitude', 'first_seen', 'last_seen', 'hours_covered', 'missing_hours', 'rows', 'lifetime_ridership']
+    df = pd.DataFrame(rows, columns=columns)
+    return df.sort_values('station_code').set_index('station_complex_id')
+
+
+def save_station_catalog(catalog_df, processed_dir):
+    """Save the finalized catalog as JSON in the processed data directory."""
+    output_file = processed_dir / CATALOG_FILE_NAME
+    records = catalog_df.reset_index().to_dict(orient='records')
+    for record in records:
+        record['first_seen'] = record['first_seen'].isoformat()
+        record['last_seen'] = record['last_seen'].isoformat()
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=1)
+    return output_file
+
+
+def load_station_catalog(processed_dir):
+    """Load the catalog written by save_station_catalog, indexed by station_complex_id."""
+    catalog_file = processed_dir / CATALOG_FILE_NAME
+    if not catalog_file.exists():
+        raise FileNotFoundError(f"🚨 Station catalog not found: {catalog_file}. Run IngestRawData.py first.")
+
+    with open(catalog_file, encoding='utf-8') as f:
+        df = pd.DataFrame(json.load(f))
+    df['station_complex_id'] = df['station_complex_id'].astype(str)
+    df['first_seen'] = pd.to_datetime(df['first_seen'])
+    df['last_seen'] = pd.to_datetime(df['last_seen'])
+    return df.set_index('station_complex_id')
+
+
+def find_stations(catalog_df, name):
+    """Return catalog rows whose name (or any former name) contains the given text."""
+    name = name.lower()
+    mask = catalog_df['all_names'].apply(lambda names: any(name in n.lower() for n in names))
+    return catalog_df[mask]
@@ -0,0 +1,222 @@
+import io
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import load_rollup, DAYS_OF_WEEK
+from StationCatalog import load_station_catalog
+from ExcelTables import write_table
+
+# Number of station types to find
+CLUSTER_COUNT = 6
+
+# k-means runs started from different k-means++ seeds at once; the one with the lowest inertia is kept
+KMEANS_INITS = 10
+KMEANS_MAX_ITER = 100
+
+HOUR_LABELS = [f"{h % 12 if h % 12 != 0 else 12} {'AM' if h < 12 else 'PM'}" for h in range(24)]
+
+
+def profile_matrix(rollup, profile_hours=24, by_month=False, missing=0.0):
+    """
+    Average ridership of every station per hour of the day (24) or hour of the week (168)
+
+    Args:
+        rollup (dict): Rollup from HourlyRollup
+        profile_hours (int): 24 for a daily profile or 168 for a weekly profile
+        by_month (bool): One profile per station and month instead of one per station
+        missing (float): Value of the hours a profile has no rows for
+
+    Returns:
+        tuple: (DataFrame with the station_code, and year and month when
+        by_month, of every profile, array of shape (profiles, profile_hours))
+    """
+    if profile_hours not in (24, 168):
+        raise ValueError("profile_hours must be 24 or 168")
+
+    hour_index = rollup['hour_index'].astype(np.int64)
+    days = hour_index // 24
+    slot = hour_index % 24 if profile_hours == 24 else ((days + 3) % 7) * 24 + hour_index % 24  # 1970-01-01 was a Thursday
+
+    if by_month:
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        keys, group = np.unique(np.stack([rollup['station_code'], months], axis=1), axis=0, return_inverse=True)
+        index = pd.DataFrame({'station_code': keys[:, 0], 'year': keys[:, 1] // 12 + 1970, 'month': keys[:, 1] % 12 + 1})
+    else:
+        keys, group = np.unique(rollup['station_code'], return_inverse=True)
+        index = pd.DataFrame({'station_code': keys})
+
+    cell = group.ravel() * profile_hours + slot
+    size = len(index) * profile_hours
+    sums = np.bincount(cell, weights=rollup['sum'], minlength=size).reshape(-1, profile_hours)
+    counts = np.bincount(cell, weights=rollup['count'], minlength=size).reshape(-1, profile_hours)
+    return index, np.divide(sums, counts, out=np.full_like(sums, missing), where=counts > 0)
+
+
+def normalize_profiles(profiles):
+    """Turn every profile into the share of its ridership per hour, so stations of any size compare by shape."""
+    totals = profiles.sum(axis=1, keepdims=True)
+    return np.divide(profiles, totals, out=np.zeros_like(profiles), where=totals > 0)
+
+
+def _squared_distances(X, centroids):
+    """Squared distance of every row of X to every centroid of every run: (runs, rows, k)."""
+    return ((X * X).sum(axis=1)[None, :, None]
+            - 2 * np.einsum('nd,rkd->rnk', X, centroids)
+            + (centroids * centroids).sum(axis=2)[:, None, :])
+
+
+def kmeans(X, k=CLUSTER_COUNT, n_init=KMEANS_INITS, max_iter=KMEANS_MAX_ITER, seed=0):
+    """
+    Batched k-means: n_init runs are seeded and iterated together as one array
+
+    Args:
+        X (ndarray): One profile per row
+        k (int): Number of clusters
+
+    Returns:
+        tuple: (cluster of every row, centroids of shape (k, columns), inertia)
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = len(X)
+    runs = np.arange(n_init)
+
+    # k-means++ seeding, one centroid at a time for every run
+    centroids = np.empty((n_init, k, X.shape[1]))
+    centroids[:, 0] = X[rng.integers(n_rows, size=n_init)]
+    closest = _squared_distances(X, centroids[:, :1])[:, :, 0]
+    for c in range(1, k):
+        weights = np.maximum(closest, 0)
+        cumulative = np.cumsum(weights, axis=1)
+        picks = (rng.random(n_init) * cumulative[:, -1])[:, None] > cumulative
+        centroids[:, c] = X[np.minimum(picks.sum(axis=1), n_rows - 1)]
+        closest = np.minimum(closest, _squared_distances(X, centroids[:, c:c + 1])[:, :, 0])
+
+    labels = np.full((n_init, n_rows), -1)
+    for _ in range(max_iter):
+        new_labels = _squared_distances(X, centroids).argmin(axis=2)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        one_hot = np.zeros((n_init, n_rows, k))
+        one_hot[runs[:, None], np.arange(n_rows)[None, :], labels] = 1
+        sizes = one_hot.sum(axis=1)
+        sums = np.einsum('rnk,nd->rkd', one_hot, X)
+        # An empty cluster keeps its previous centroid
+        centroids = np.where(sizes[:, :, None] > 0, sums / np.maximum(sizes, 1)[:, :, None], centroids)
+
+    distances = _squared_distances(X, centroids)
+    inertia = np.take_along_axis(distances, labels[:, :, None], axis=2)[:, :, 0].sum(axis=1)
+    best = inertia.argmin()
+
+    # Number the clusters by size, largest first
+    order = np.argsort(-np.bincount(labels[best], minlength=k), kind='stable')
+    renumber = np.empty(k, dtype=int)
+    renumber[order] = np.arange(k)
+    return renumber[labels[best]], centroids[best][order], float(inertia[best])
+
+
+def describe_centroid(centroid):
+    """Short description of a daily or weekly centroid, e.g. 'Peaks at 8 AM and 5 PM'."""
+    daily = centroid.reshape(-1, 24).mean(axis=0)
+    morning, evening = int(daily[:12].argmax()), 12 + int(daily[12:].argmax())
+    text = f"Peaks at {HOUR_LABELS[morning]} and {HOUR_LABELS[evening]}"
+    if len(centroid) == 168:
+        by_day = centroid.reshape(7, 24).sum(axis=1)
+        text += f", weekend share {by_day[5:].sum():.0%}"
+    return text
+
+
+def cluster_stations(rollup, catalog_df, k=CLUSTER_COUNT, profile_hours=24, by_month=False):
+    """
+    Cluster the normalized hourly profiles of all stations
+
+    Returns:
+        tuple: (assignments DataFrame with station_complex, year and month when
+        by_month, cluster and the profile shares, centroids DataFrame with one
+        row per cluster, its size and description)
+    """
+    index, profiles = profile_matrix(rollup, profile_hours, by_month)
+    shares = normalize_profiles(profiles)
+    active = shares.sum(axis=1) > 0
+    index, shares = index[active].reset_index(drop=True), shares[active]
+
+    labels, centroids, inertia = kmeans(shares, min(k, len(shares)))
+    print(f"✅ Clustered {len(shares):,} profiles into {len(centroids)} clusters (inertia {inertia:.4f})")
+
+    columns = HOUR_LABELS if profile_hours == 24 else [f"{day[:3]} {hour}" for day in DAYS_OF_WEEK for hour in HOUR_LABELS]
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+    assignments = index.copy()
+    assignments.insert(0, 'station_complex', names.reindex(index['station_code']).to_numpy())
+    assignments['cluster'] = labels
+    assignments = pd.concat([assignments.drop(columns='station_code'), pd.DataFrame(shares, columns=columns)], axis=1)
+
+    centroid_df = pd.DataFrame(centroids, columns=columns)
+    centroid_df.insert(0, 'cluster', np.arange(len(centroids)))
+    centroid_df.insert(1, 'profiles', np.bincount(labels, minlength=len(centroids)))
+    centroid_df.insert(2, 'description', [describe_centroid(c) for c in centroids])
+    return assignments.sort_values(['cluster', 'station_complex']), centroid_df
+
+
+def create_centroid_chart(centroid_df):
+    """Line chart with the average profile of every cluster."""
+    hour_columns = centroid_df.columns[3:]
+    fig, ax = plt.subplots(figsize=(14, 7))
+    for _, row in centroid_df.iterrows():
+        ax.plot(range(len(hour_columns)), row[hour_columns].to_numpy(dtype=float) * 100,
+                label=f"Cluster {row['cluster']} ({row['profiles']} profiles): {row['description']}")
+
+    step = 1 if len(hour_columns) == 24 else 12
+    ax.set_xticks(range(0, len(hour_columns), step))
+    ax.set_xticklabels(hour_columns[::step], rotation=45, ha='right')
+    ax.set_xlabel("Time (EST)")
+    ax.set_ylabel("Share of ridership (%)")
+    ax.set_title("Average Hourly Ridership Profile of Each Station Cluster", pad=20)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend(fontsize=9)
+    plt.tight_layout()
+    return fig
+
+
+def write_cluster_report(assignments, centroid_df, output_file):
+    """Write the cluster of every station, the centroids and the centroid chart to Excel."""
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        share_format = workbook.add_format({'num_format': '0.0%'})
+
+        for sheet_name, df in [('Assignments', assignments), ('Centroids', centroid_df)]:
+            # The hour share columns follow the descriptive ones
+            first_hour = df.columns.get_loc(next(col for col in df.columns if col.endswith(('AM', 'PM'))))
+            worksheet = write_table(writer, df, sheet_name, {col: share_format for col in df.columns[first_hour:]})
+            worksheet.set_column(0, 0, 40 if sheet_name == 'Assignments' else 10)
+            worksheet.set_column(first_hour, len(df.columns) - 1, 9)
+        writer.sheets['Centroids'].set_column(2, 2, 50)
+
+        worksheet = workbook.add_worksheet('Centroid_Chart')
+        fig = create_centroid_chart(centroid_df)
+        imgdata = io.BytesIO()
+        fig.savefig(imgdata, format='png', dpi=150, bbox_inches='tight')
+        plt.close(fig)
+        worksheet.insert_image('B2', '', {'image_data': imgdata})
+
+
+def main(k=CLUSTER_COUNT, profile_hours=24, by_month=False):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    assignments, centroid_df = cluster_stations(rollup, catalog_df, k, profile_hours, by_month)
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Station_Clusters_{profile_hours}h{'_By_Month' if by_month else ''}_{date_time_str}.xlsx"
+    write_cluster_report(assignments, centroid_df, output_file)
+    print(f"✅ Station clusters saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
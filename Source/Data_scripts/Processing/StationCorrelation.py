@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from RawData import hour_index_to_timestamp
+from StationCatalog import load_station_catalog
+from TimePyramid import load_time_pyramid
+from Periods import define_periods, periods_label
+from ExcelTables import write_table
+
+CORRELATION_FILE_NAME = "station_correlation.npz"
+
+# Most correlated stations listed for every station
+CORRELATION_NEIGHBORS = 10
+
+
+def station_day_matrix(pyramid, period=None):
+    """
+    Station x day ridership from the time pyramid
+
+    Args:
+        pyramid (dict): Pyramid from TimePyramid
+        period (dict): Period from Periods.define_periods (defaults to all days)
+
+    Returns:
+        tuple: (first day of every column as timestamps, array of shape (stations, days))
+    """
+    origin = int(pyramid['origin'])
+    day_starts = pyramid['day_starts'][:-1] + origin
+    keep = np.ones(len(day_starts), dtype=bool)
+    if period is not None:
+        keep = (day_starts >= period['start_hour']) & (day_starts < period['end_hour'])
+    return hour_index_to_timestamp(day_starts[keep]), pyramid['day'][:, keep]
+
+
+def correlation_matrix(matrix, days=None, remove_weekly=True):
+    """
+    Pearson correlation of every pair of rows, from one matrix product
+
+    Args:
+        matrix (ndarray): Station x day ridership
+        days (DatetimeIndex): Day of every column, needed when remove_weekly is set
+        remove_weekly (bool): Subtract each station's average for the day of the
+            week first, so stations are not correlated just by sharing the
+            weekday/weekend cycle
+
+    Returns:
+        ndarray: Correlations of shape (stations, stations); NaN for stations
+        whose ridership never changes
+    """
+    values = np.array(matrix, dtype=np.float64)
+    if remove_weekly:
+        weekday = np.asarray(days.dayofweek)
+        for day in range(7):
+            columns = weekday == day
+            if columns.any():
+                values[:, columns] -= values[:, columns].mean(axis=1, keepdims=True)
+
+    centered = values - values.mean(axis=1, keepdims=True)
+    norms = np.sqrt((centered * centered).sum(axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        standardized = centered / norms[:, None]
+    correlations = standardized @ standardized.T
+    return np.clip(correlations, -1, 1)
+
+
+def top_neighbors(correlations, n=CORRELATION_NEIGHBORS):
+    """
+    The n most correlated other stations of every station
+
+    Returns:
+        tuple: (neighbor indexes and their correlations, both of shape (stations, n),
+        most correlated first)
+    """
+    scores = np.where(np.isnan(correlations), -np.inf, correlations)
+    np.fill_diagonal(scores, -np.inf)
+    n = min(n, len(scores) - 1)
+    candidates = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    neighbors = np.take_along_axis(candidates, order, axis=1)
+    return neighbors, np.take_along_axis(correlations, neighbors, axis=1)
+
+
+def save_correlations(station_codes, correlations, neighbors, processed_dir):
+    """Save the matrix as float16 with the station codes of its rows and the neighbor lists."""
+    output_file = processed_dir / CORRELATION_FILE_NAME
+    np.savez_compressed(
+        output_file,
+        station_code=np.asarray(station_codes, dtype=np.int32),
+        correlation=correlations.astype(np.float16),
+        neighbors=neighbors.astype(np.int32)
+    )
+    return output_file
+
+
+def load_correlations(processed_dir):
+    """Load the arrays written by save_correlations."""
+    correlation_file = processed_dir / CORRELATION_FILE_NAME
+    if not correlation_file.exists():
+        raise FileNotFoundError(f"🚨 Station correlations not found: {correlation_file}. Run StationCorrelation.py first.")
+    with np.load(correlation_file) as data:
+        return {name: data[name] for name in data.files}
+
+
+def neighbor_table(names, neighbors, neighbor_correlations):
+    """Long table with every station's most correlated stations."""
+    n_stations, n = neighbors.shape
+    table = pd.DataFrame({
+        'station_complex': np.repeat(names, n),
+        'rank': np.tile(np.arange(1, n + 1), n_stations),
+        'neighbor': names[neighbors.ravel()],
+        'correlation': neighbor_correlations.ravel()
+    })
+    return table.dropna(subset=['correlation'])
+
+
+def main(period_spec=None, remove_weekly=True, n=CORRELATION_NEIGHBORS):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pyramid = load_time_pyramid(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    period = define_periods([period_spec])[0] if period_spec is not None else None
+
+    days, matrix = station_day_matrix(pyramid, period)
+    station_codes = np.flatnonzero(matrix.sum(axis=1) > 0)
+    correlations = correlation_matrix(matrix[station_codes], days, remove_weekly)
+    neighbors, neighbor_correlations = top_neighbors(correlations, n)
+    save_correlations(station_codes, correlations, neighbors, processed_dir)
+
+    names = catalog_df.reset_index().set_index('station_code')['station_complex'].reindex(station_codes).to_numpy()
+    label = periods_label([period]) if period is not None else "All_Days"
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Station_Correlation_{label}_{date_time_str}.xlsx"
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        correlation_format = workbook.add_format({'num_format': '0.000'})
+
+        table = neighbor_table(names, neighbors, neighbor_correlations)
+        worksheet = write_table(writer, table, 'Top Neighbors', {'correlation': correlation_format})
+        worksheet.set_column(0, 0, 40)
+        worksheet.set_column(1, 1, 8)
+        worksheet.set_column(2, 2, 40)
+        worksheet.set_column(3, 3, 12)
+
+        pd.DataFrame(correlations, index=names, columns=names).to_excel(writer, sheet_name='Matrix')
+        worksheet = writer.sheets['Matrix']
+        worksheet.set_column(0, 0, 40)
+        worksheet.set_column(1, len(names), 10, correlation_format)
+        worksheet.freeze_panes(1, 1)
+
+    print(f"✅ Correlations of {len(station_codes)} stations over {len(days)} days saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import io
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import PowerNorm
+from pathlib import Path
+from datetime import datetime
+from pptx import Presentation
+from pptx.util import Inches
+
+from HourlyRollup import load_rollup, hourly_average_by_station
+from StationCatalog import load_station_catalog
+from StationClustering import normalize_profiles, kmeans, CLUSTER_COUNT, HOUR_LABELS
+from Periods import define_periods, periods_label
+from ExcelTables import write_table, unique_sheet_name
+
+# Years and/or (label, start date, end date) ranges, one heatmap each
+PERIODS = [2023, 2024]
+
+# 'total' (busiest station on top) or 'cluster' (stations with the same daily shape together)
+HEATMAP_ORDER = 'total'
+
+# At most this many station names are written next to a heatmap; the others are skipped evenly
+HEATMAP_MAX_LABELS = 60
+
+WATERMARK_TEXT = "Created By Mantie Reid II"
+
+
+def heatmap_matrix(avg_df):
+    """
+    Station x hour matrix from a frame of average ridership per station and hour
+
+    Rows are keyed by station_complex_id, so two stations that share a name
+    keep their own rows; the name is only the row's label.
+
+    Args:
+        avg_df (DataFrame): station_complex_id, station_complex, hour,
+            ridership, as returned by process_data_in_chunks in
+            AverageNumberOfRiders2023and2024Sep or
+            HourlyRollup.hourly_average_by_station
+
+    Returns:
+        tuple: (array of station names, array of shape (stations, 24) with
+        NaN where a station has no rows for an hour)
+    """
+    _, first, station = np.unique(avg_df['station_complex_id'].to_numpy(dtype=str), return_index=True, return_inverse=True)
+    names = avg_df['station_complex'].to_numpy(dtype=str)[first]
+    matrix = np.full((len(names), 24), np.nan)
+    matrix[station.ravel(), avg_df['hour'].to_numpy(dtype=np.int64)] = avg_df['ridership'].to_numpy(dtype=np.float64)
+    return names, matrix
+
+
+def station_order(matrix, order_by=HEATMAP_ORDER, k=CLUSTER_COUNT):
+    """
+    Row order of a station x hour matrix
+
+    'total' puts the busiest stations first. 'cluster' groups the stations by
+    the k-means cluster of their normalized profile, busiest cluster first
+    and busiest station first inside every cluster.
+
+    Returns:
+        tuple: (row order, positions in that order where a new cluster starts)
+    """
+    totals = np.nansum(matrix, axis=1)
+    if order_by == 'total':
+        return np.argsort(-totals, kind='stable'), np.empty(0, dtype=np.int64)
+    if order_by != 'cluster':
+        raise ValueError(f"Unknown heatmap order: {order_by}")
+
+    labels, _, _ = kmeans(normalize_profiles(np.nan_to_num(matrix)), min(k, len(matrix)))
+    cluster_rank = np.argsort(np.argsort(-np.bincount(labels, weights=totals)))
+    order = np.lexsort((-totals, cluster_rank[labels]))
+    boundaries = np.flatnonzero(np.diff(cluster_rank[labels][order])) + 1
+    return order, boundaries
+
+
+def create_heatmap(names, matrix, title, order_by=HEATMAP_ORDER, ordering=None):
+    """
+    Heatmap of a station x hour matrix drawn with a single imshow
+
+    The colors follow the square root of the ridership, so quiet stations
+    still show their shape next to the busiest ones. Hours without data are
+    grey. ordering is station_order's result when the caller already has it.
+    """
+    order, boundaries = ordering if ordering is not None else station_order(matrix, order_by)
+    names, matrix = np.asarray(names)[order], matrix[order]
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    cmap = plt.get_cmap('viridis').copy()
+    cmap.set_bad('lightgrey')
+    image = ax.imshow(np.ma.masked_invalid(matrix), aspect='auto', interpolation='nearest', cmap=cmap,
+                      norm=PowerNorm(0.5, vmin=0, vmax=max(np.nanmax(matrix, initial=0), 1)))
+    for boundary in boundaries:
+        ax.axhline(boundary - 0.5, color='white', linewidth=1.5)
+
+    step = max(1, int(np.ceil(len(names) / HEATMAP_MAX_LABELS)))
+    ax.set_yticks(range(0, len(names), step))
+    ax.set_yticklabels([name[:40] for name in names[::step]], fontsize=6)
+    ax.set_xticks(range(24))
+    ax.set_xticklabels(HOUR_LABELS, rotation=45, ha='right')
+    ax.set_xlabel("Time (EST)", fontsize=14)
+    ax.set_ylabel(f"Stations ({len(names)}, {'by cluster' if order_by == 'cluster' else 'busiest first'})", fontsize=14)
+    ax.set_title(title, fontsize=16)
+    fig.colorbar(image, ax=ax, label="Avg Riders", fraction=0.03, pad=0.02)
+    fig.text(0.5, 0.5, WATERMARK_TEXT, ha='center', va='center',
+             color='gray', alpha=0.15, fontsize=40, rotation=30)
+    plt.tight_layout()
+    return fig
+
+
+def heatmap_image(names, matrix, title, order_by=HEATMAP_ORDER, dpi=150, ordering=None):
+    """create_heatmap as a PNG in memory, ready for insert_image or add_picture."""
+    fig = create_heatmap(names, matrix, title, order_by, ordering)
+    imgdata = io.BytesIO()
+    fig.savefig(imgdata, format='png', dpi=dpi)
+    plt.close(fig)
+    imgdata.seek(0)
+    return imgdata
+
+
+def write_heatmap_reports(heatmaps, excel_file, ppt_file, order_by=HEATMAP_ORDER):
+    """
+    Write every period's heatmap, and its matrix as a table, to Excel and to PowerPoint
+
+    Args:
+        heatmaps (dict): Period label -> (station names, station x hour matrix)
+    """
+    ppt = Presentation()
+    with pd.ExcelWriter(excel_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0.00'})
+
+        for label, (names, matrix) in heatmaps.items():
+            title = f"Average Riders per Station and Hour - {label}"
+            ordering = station_order(matrix, order_by)
+            table = pd.DataFrame(matrix[ordering[0]], columns=HOUR_LABELS)
+            table.insert(0, 'station_complex', np.asarray(names)[ordering[0]])
+
+            worksheet = write_table(writer, table, f"{label} Matrix", {hour: number_format for hour in HOUR_LABELS})
+            worksheet.set_column(0, 0, 40)
+            worksheet.set_column(1, len(table.columns) - 1, 10)
+
+            # Rendered once; the sheet and the slide each get their own stream of the same PNG
+            png = heatmap_image(names, matrix, title, order_by, ordering=ordering).getvalue()
+            worksheet = workbook.add_worksheet(unique_sheet_name(writer, f"{label} Heatmap"))
+            worksheet.insert_image('B2', '', {'image_data': io.BytesIO(png), 'x_scale': 0.6, 'y_scale': 0.6})
+
+            slide = ppt.slides.add_slide(ppt.slide_layouts[5])
+            slide.shapes.title.text = title
+            slide.shapes.add_picture(io.BytesIO(png), Inches(0.5), Inches(1.5), height=Inches(5.75))
+    ppt.save(ppt_file)
+
+
+def main(period_specs=PERIODS, order_by=HEATMAP_ORDER):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    periods = define_periods(period_specs)
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    averages = hourly_average_by_station(rollup, catalog_df, periods)
+    heatmaps = {label: heatmap_matrix(df) for label, df in averages.items()}
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    name = f"MTA_Station_Hour_Heatmap_{periods_label(periods)}_{date_time_str}"
+    write_heatmap_reports(heatmaps, output_dir / f"{name}.xlsx", output_dir / f"{name}.pptx", order_by)
+    print(f"✅ Station x hour heatmaps saved to: {output_dir / name}.xlsx and .pptx")
+
+
+if __name__ == "__main__":
+    main()
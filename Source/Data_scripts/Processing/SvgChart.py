@@ -0,0 +1,185 @@
+import html
+import io
+import time
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import load_rollup, hourly_average_by_station
+from StationCatalog import load_station_catalog
+from StationClustering import HOUR_LABELS
+from StationHeatmap import heatmap_matrix
+from Periods import define_periods
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # Optional: only needed to turn the charts into PNG files (OSError: no cairo library)
+    cairosvg = None
+
+# Years and/or (label, start date, end date) ranges, one page of charts each
+PERIODS = [2023, 2024]
+
+WATERMARK_TEXT = "Created By Mantie Reid II"
+
+# Same size as the 10 x 6 inch matplotlib charts at 100 pixels per inch
+CHART_WIDTH = 1000
+CHART_HEIGHT = 600
+
+# Plot area inside the chart: left, top, width, height
+PLOT_BOX = (90, 80, 870, 380)
+
+LINE_COLOR = "#1f77b4"
+
+# Everything but the title, y axis and line is the same for every chart, so
+# it is laid out once; the chart fills in the rest with str.format
+_LEFT, _TOP, _WIDTH, _HEIGHT = PLOT_BOX
+_X = _LEFT + (np.arange(24) + 0.5) * _WIDTH / 24
+_X_TICKS = "".join(
+    f'<line x1="{x:.1f}" x2="{x:.1f}" y1="{_TOP}" y2="{_TOP + _HEIGHT}" stroke="#ddd" stroke-dasharray="4 4"/>'
+    f'<text x="{x:.1f}" y="{_TOP + _HEIGHT + 16}" text-anchor="end" font-size="12" '
+    f'transform="rotate(-45 {x:.1f} {_TOP + _HEIGHT + 16})">{label}</text>'
+    for x, label in zip(_X, HOUR_LABELS))
+
+SVG_TEMPLATE = (
+    f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" '
+    f'viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}" font-family="Arial, Helvetica, sans-serif">'
+    f'<defs><marker id="dot-{{chart_id}}" viewBox="0 0 8 8" refX="4" refY="4" markerWidth="8" markerHeight="8" markerUnits="userSpaceOnUse">'
+    f'<circle cx="4" cy="4" r="4" fill="{LINE_COLOR}"/></marker></defs>'
+    f'<rect width="{CHART_WIDTH}" height="{CHART_HEIGHT}" fill="white"/>'
+    f'<text x="{CHART_WIDTH / 2:.0f}" y="32" text-anchor="middle" font-size="20">{{title}}</text>'
+    f'<text x="{CHART_WIDTH / 2:.0f}" y="58" text-anchor="middle" font-size="15" fill="#555">{{subtitle}}</text>'
+    f'{_X_TICKS}{{y_ticks}}'
+    f'<rect x="{_LEFT}" y="{_TOP}" width="{_WIDTH}" height="{_HEIGHT}" fill="none" stroke="#444"/>'
+    f'<text x="{_LEFT + _WIDTH / 2:.0f}" y="{_TOP + _HEIGHT + 80}" text-anchor="middle" font-size="14">Time (EST)</text>'
+    f'<text x="22" y="{_TOP + _HEIGHT / 2:.0f}" text-anchor="middle" font-size="14" '
+    f'transform="rotate(-90 22 {_TOP + _HEIGHT / 2:.0f})">Avg Riders</text>'
+    f'<polyline points="{{points}}" fill="none" stroke="{LINE_COLOR}" stroke-width="2" '
+    f'marker-start="url(#dot-{{chart_id}})" marker-mid="url(#dot-{{chart_id}})" marker-end="url(#dot-{{chart_id}})"/>'
+    f'<rect x="{_LEFT + _WIDTH - 190}" y="{_TOP + 10}" width="180" height="28" fill="white" stroke="#ccc" rx="3"/>'
+    f'<text x="{_LEFT + _WIDTH - 20}" y="{_TOP + 29}" text-anchor="end" font-size="13">{{legend}}</text>'
+    f'<text x="{CHART_WIDTH / 2:.0f}" y="{CHART_HEIGHT / 2:.0f}" text-anchor="middle" font-size="40" fill="gray" '
+    f'opacity="0.15" transform="rotate(-30 {CHART_WIDTH / 2:.0f} {CHART_HEIGHT / 2:.0f})">{html.escape(WATERMARK_TEXT)}</text>'
+    f'</svg>')
+
+
+def nice_steps(maxima, n_ticks=5):
+    """Grid step of every chart: 1, 2 or 5 times a power of ten, giving about n_ticks lines up to the maximum."""
+    raw = np.maximum(np.asarray(maxima, dtype=np.float64), 1e-9) / n_ticks
+    power = 10.0 ** np.floor(np.log10(raw))
+    fraction = raw / power
+    return power * np.select([fraction <= 1, fraction <= 2, fraction <= 5], [1, 2, 5], 10)
+
+
+def chart_coordinates(values):
+    """
+    Pixel coordinates of many 24-point charts at once
+
+    Args:
+        values (array): Shape (charts, 24); NaN hours are left out of the line
+
+    Returns:
+        tuple: (y of every point, shape (charts, 24), grid steps and y axis
+        maximum of every chart)
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    maxima = np.nanmax(values, axis=1, initial=0)
+    steps = nice_steps(maxima)
+    tops = np.maximum(np.ceil(maxima / steps), 1) * steps
+    y = _TOP + _HEIGHT - values / tops[:, None] * _HEIGHT
+    return y, steps, tops
+
+
+def _y_ticks(step, top):
+    """Horizontal grid lines and labels of one chart."""
+    ticks = np.arange(0, top + step / 2, step)
+    y = _TOP + _HEIGHT - ticks / top * _HEIGHT
+    label = "{:,.0f}" if step >= 1 else "{:g}"
+    return "".join(
+        f'<line x1="{_LEFT}" x2="{_LEFT + _WIDTH}" y1="{y_tick:.1f}" y2="{y_tick:.1f}" stroke="#ccc" stroke-dasharray="4 4"/>'
+        f'<text x="{_LEFT - 8}" y="{y_tick + 4:.1f}" text-anchor="end" font-size="12">{label.format(tick)}</text>'
+        for tick, y_tick in zip(ticks, y))
+
+
+def render_line_charts(titles, values, subtitles=None):
+    """
+    The hourly line chart of every station as SVG text, without matplotlib
+
+    Same chart as CreateChartsForEachMonthINPowerPoint draws: AM/PM hour
+    ticks, title, average riders legend and the watermark. The coordinates of
+    all charts are computed at once; each chart is then one str.format.
+    Element ids end with the chart's position, so the charts can be inlined
+    into one HTML page.
+
+    Args:
+        titles (list): Title of every chart
+        values (array): Shape (charts, 24), average riders per hour, NaN for no data
+        subtitles (list): Optional second title line of every chart, e.g. the peak hours
+
+    Returns:
+        list: SVG document of every chart
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    y, steps, tops = chart_coordinates(values)
+    means = np.nanmean(np.where(np.isnan(values).all(axis=1, keepdims=True), 0, values), axis=1)
+    subtitles = subtitles if subtitles is not None else [""] * len(values)
+
+    charts = []
+    for chart_id, (title, subtitle, row, y_row, step, top, mean) in enumerate(zip(titles, subtitles, values, y, steps, tops, means)):
+        has_data = ~np.isnan(row)
+        points = " ".join(f"{x:.1f},{y_point:.1f}" for x, y_point in zip(_X[has_data], y_row[has_data]))
+        charts.append(SVG_TEMPLATE.format(chart_id=chart_id, title=html.escape(str(title)), subtitle=html.escape(str(subtitle)),
+                                          y_ticks=_y_ticks(step, top), points=points,
+                                          legend=f"Avg Riders: {mean:,.2f}"))
+    return charts
+
+
+def render_line_chart(title, values, subtitle=""):
+    """render_line_charts for one chart."""
+    return render_line_charts([title], [values], [subtitle])[0]
+
+
+def svg_to_png(svg, scale=1.0):
+    """
+    Rasterize an SVG chart (needs the optional cairosvg package)
+
+    Returns:
+        BytesIO: PNG, ready for xlsxwriter's insert_image or python-pptx's add_picture
+    """
+    if cairosvg is None:
+        raise ImportError("🚨 PNG charts need the cairosvg package: pip install cairosvg")
+    return io.BytesIO(cairosvg.svg2png(bytestring=svg.encode('utf-8'), scale=scale))
+
+
+def write_svg_page(charts, output_file, title):
+    """Write SVG charts inline into one HTML page."""
+    body = "\n".join(f"<div>{chart}</div>" for chart in charts)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+                f'</head>\n<body>\n<h2>{html.escape(title)}</h2>\n{body}\n</body>\n</html>\n')
+    return output_file
+
+
+def main(period_specs=PERIODS):
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    periods = define_periods(period_specs)
+    rollup = load_rollup(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+
+    for label, avg_df in hourly_average_by_station(rollup, catalog_df, periods).items():
+        names, matrix = heatmap_matrix(avg_df)
+        started = time.perf_counter()
+        charts = render_line_charts([f"Avg Ridership for {name} - {label}" for name in names], matrix)
+        elapsed = time.perf_counter() - started
+
+        output_file = output_dir / f"MTA_Station_Charts_{label}_{date_time_str}.html"
+        write_svg_page(charts, output_file, f"MTA Average Hourly Ridership by Station - {label}")
+        print(f"✅ {len(charts)} charts rendered in {elapsed:.3f} s ({len(charts) / max(elapsed, 1e-9):,.0f} per second), saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from RawData import to_hour_index, hour_index_to_timestamp
+
+PYRAMID_FILE_NAME = "time_pyramid.npz"
+
+# Levels from coarsest to finest. Every block of every level starts at
+# midnight, so a range can always be finished off with the next finer level.
+PYRAMID_LEVELS = ['year', 'month', 'week', 'day', 'hour']
+
+
+def _block_starts(days, level):
+    """Return the day offsets where each block of a level starts (the first block may be partial)."""
+    if level == 'day':
+        starts = np.ones(len(days), dtype=bool)
+    elif level == 'week':
+        starts = days.dayofweek == 0  # ISO weeks start on Monday
+    elif level == 'month':
+        starts = days.day == 1
+    elif level == 'year':
+        starts = (days.month == 1) & (days.day == 1)
+    starts = np.asarray(starts).copy()
+    starts[0] = True
+    return np.flatnonzero(starts)
+
+
+def build_time_pyramid(rollup):
+    """
+    Build the station x time pyramid from the hourly rollup
+
+    Args:
+        rollup (dict): Rollup from HourlyRollup
+
+    Returns:
+        dict: 'origin' (hour index of the first midnight), one station x block
+        array per level and, for every level above 'hour', the hour offsets
+        where its blocks start followed by the end of the data
+    """
+    first_day = hour_index_to_timestamp([rollup['hour_index'].min()])[0].normalize()
+    last_day = hour_index_to_timestamp([rollup['hour_index'].max()])[0].normalize()
+    days = pd.date_range(first_day, last_day, freq='D')
+    origin = int(to_hour_index([first_day])[0])
+    n_stations = int(rollup['station_code'].max()) + 1
+    n_hours = len(days) * 24
+
+    hourly = np.zeros((n_stations, n_hours), dtype=np.float32)
+    hourly[rollup['station_code'], rollup['hour_index'] - origin] = rollup['sum']
+
+    pyramid = {'origin': np.int64(origin), 'hour': hourly}
+    daily = hourly.reshape(n_stations, len(days), 24).sum(axis=2, dtype=np.float64)
+    for level in PYRAMID_LEVELS[:-1]:
+        start_days = _block_starts(days, level)
+        pyramid[level] = daily if level == 'day' else np.add.reduceat(daily, start_days, axis=1)
+        pyramid[f'{level}_starts'] = np.append(start_days * 24, n_hours).astype(np.int64)
+
+    return pyramid
+
+
+def save_time_pyramid(pyramid, processed_dir):
+    """Save the pyramid arrays to the processed data directory."""
+    output_file = processed_dir / PYRAMID_FILE_NAME
+    np.savez(output_file, **pyramid)
+    return output_file
+
+
+def load_time_pyramid(processed_dir):
+    """Load the pyramid written by save_time_pyramid."""
+    pyramid_file = processed_dir / PYRAMID_FILE_NAME
+    if not pyramid_file.exists():
+        raise FileNotFoundError(f"🚨 Time pyramid not found: {pyramid_file}. Run IngestRawData.py first.")
+    with np.load(pyramid_file) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _range_sum(pyramid, lo, hi, level_pos, rows):
+    """Sum hours [lo, hi) using whole blocks of the given level and finer levels for the edges."""
+    if lo >= hi:
+        return 0.0
+    level = PYRAMID_LEVELS[level_pos]
+    if level == 'hour':
+        return pyramid['hour'][rows, lo:hi].sum(axis=1, dtype=np.float64)
+
+    starts = pyramid[f'{level}_starts']
+    first_block = np.searchsorted(starts, lo, side='left')
+    end_block = np.searchsorted(starts, hi, side='right') - 1
+    if first_block >= end_block:
+        # No whole block of this level fits inside the range
+        return _range_sum(pyramid, lo, hi, level_pos + 1, rows)
+
+    total = pyramid[level][rows, first_block:end_block].sum(axis=1)
+    total = total + _range_sum(pyramid, lo, starts[first_block], level_pos + 1, rows)
+    total = total + _range_sum(pyramid, starts[end_block], hi, level_pos + 1, rows)
+    return total
+
+
+def query_range(pyramid, start, end, stations=None):
+    """
+    Total ridership between two timestamps for each station
+
+    Args:
+        pyramid (dict): Pyramid from build_time_pyramid or load_time_pyramid
+        start (Timestamp): First hour included
+        end (Timestamp): First hour no longer included
+        stations (list): Station codes to return (defaults to all stations)
+
+    Returns:
+        ndarray: Total ridership per requested station
+    """
+    rows = np.arange(pyramid['hour'].shape[0]) if stations is None else np.asarray(stations)
+    n_hours = pyramid['hour'].shape[1]
+    origin = int(pyramid['origin'])
+    lo = int(np.clip(to_hour_index([pd.Timestamp(start)])[0] - origin, 0, n_hours))
+    hi = int(np.clip(to_hour_index([pd.Timestamp(end)])[0] - origin, 0, n_hours))
+
+    total = _range_sum(pyramid, lo, hi, 0, rows)
+    return np.broadcast_to(np.asarray(total, dtype=np.float64), rows.shape).copy()
+
+
+def level_totals(pyramid, level, catalog_df):
+    """
+    Return one level of the pyramid as a DataFrame, e.g. monthly totals for all stations
+
+    Args:
+        pyramid (dict): Pyramid from build_time_pyramid or load_time_pyramid
+        level (str): 'year', 'month', 'week' or 'day'
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+
+    Returns:
+        DataFrame: One row per station (canonical name), one column per block
+        labelled with the timestamp the block starts at
+    """
+    if level not in PYRAMID_LEVELS[:-1]:
+        raise ValueError(f"Unknown pyramid level: {level}")
+
+    starts = hour_index_to_timestamp(pyramid[f'{level}_starts'][:-1] + int(pyramid['origin']))
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+    values = pyramid[level]
+    return pd.DataFrame(values, index=names.reindex(np.arange(values.shape[0])).to_numpy(), columns=starts)
@@ -0,0 +1,223 @@
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from HourlyRollup import get_season, DAYS_OF_WEEK
+from StationCatalog import load_station_catalog
+from ExcelTables import write_table
+
+TOP_K_FILE_NAME = "top_k_stations.json"
+
+# Counters kept per slice. Any station's estimate is at most
+# (total ridership of the slice / TOP_K_CAPACITY) too high.
+TOP_K_CAPACITY = 64
+
+# Dimensions a slice can be cut by, always within a year
+TOP_K_DIMENSIONS = ['year', 'season', 'hour', 'day_of_week']
+
+
+def new_top_k_tracker(capacity=TOP_K_CAPACITY):
+    """Create an empty set of Space-Saving summaries, one per slice."""
+    return {'capacity': capacity, 'summaries': {}}
+
+
+def merge_summaries(a, b, capacity):
+    """
+    Merge two Space-Saving summaries and keep the `capacity` largest counters
+
+    A summary is a dict with 'stations', 'counts' and 'errors' arrays and the
+    slice's 'total'. A station missing from a full summary may still have up
+    to that summary's smallest count, so that amount is added to both its
+    count and its error. The estimates therefore never undercount, and
+    count - error never overcounts.
+    """
+    def floor(summary):
+        return summary['counts'].min() if len(summary['counts']) >= capacity else 0.0
+
+    floor_a, floor_b = floor(a), floor(b)
+    stations = np.union1d(a['stations'], b['stations'])
+
+    def lookup(summary, column, default):
+        values = np.full(len(stations), default, dtype=np.float64)
+        values[np.searchsorted(stations, summary['stations'])] = summary[column]
+        return values
+
+    counts = lookup(a, 'counts', floor_a) + lookup(b, 'counts', floor_b)
+    errors = lookup(a, 'errors', floor_a) + lookup(b, 'errors', floor_b)
+
+    keep = np.sort(np.argsort(-counts, kind='stable')[:capacity])
+    return {
+        'stations': stations[keep],
+        'counts': counts[keep],
+        'errors': errors[keep],
+        'total': a['total'] + b['total']
+    }
+
+
+def _slice_keys(chunk):
+    """Yield (slice key, boolean row mask) for every slice the chunk touches."""
+    timestamps = chunk['transit_timestamp']
+    years = timestamps.dt.year.to_numpy()
+    columns = {
+        'season': timestamps.dt.month.map(get_season).to_numpy(),
+        'hour': timestamps.dt.hour.to_numpy(),
+        'day_of_week': timestamps.dt.day_name().to_numpy()
+    }
+    for year in np.unique(years):
+        in_year = years == year
+        yield ('year', int(year), ''), in_year
+        for dimension, values in columns.items():
+            for value in np.unique(values[in_year]):
+                yield (dimension, int(year), str(value)), in_year & (values == value)
+
+
+def update_top_k_tracker(tracker, chunk, station_codes):
+    """Fold the exact per-station totals of one chunk into the summary of every slice it touches."""
+    capacity = tracker['capacity']
+    ridership = chunk['ridership'].to_numpy(dtype=np.float64)
+    codes = np.asarray(station_codes)
+
+    for key, mask in _slice_keys(chunk):
+        stations, inverse = np.unique(codes[mask], return_inverse=True)
+        totals = np.bincount(inverse, weights=ridership[mask])
+        chunk_summary = {
+            'stations': stations,
+            'counts': totals,
+            'errors': np.zeros(len(stations)),
+            'total': float(totals.sum())
+        }
+        current = tracker['summaries'].get(key)
+        if current is None:
+            current = {'stations': np.empty(0, dtype=codes.dtype), 'counts': np.empty(0),
+                       'errors': np.empty(0), 'total': 0.0}
+        tracker['summaries'][key] = merge_summaries(current, chunk_summary, capacity)
+
+
+def save_top_k_tracker(tracker, processed_dir):
+    """Save every slice summary as JSON."""
+    records = []
+    for (dimension, year, value), summary in tracker['summaries'].items():
+        records.append({
+            'dimension': dimension,
+            'year': year,
+            'value': value,
+            'total': summary['total'],
+            'stations': summary['stations'].tolist(),
+            'counts': summary['counts'].tolist(),
+            'errors': summary['errors'].tolist()
+        })
+
+    output_file = processed_dir / TOP_K_FILE_NAME
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'capacity': tracker['capacity'], 'slices': records}, f)
+    return output_file
+
+
+def load_top_k_tracker(processed_dir):
+    """Load the summaries written by save_top_k_tracker."""
+    top_k_file = processed_dir / TOP_K_FILE_NAME
+    if not top_k_file.exists():
+        raise FileNotFoundError(f"🚨 Top-K summaries not found: {top_k_file}. Run IngestRawData.py first.")
+
+    with open(top_k_file, encoding='utf-8') as f:
+        data = json.load(f)
+    tracker = new_top_k_tracker(data['capacity'])
+    for record in data['slices']:
+        tracker['summaries'][(record['dimension'], record['year'], record['value'])] = {
+            'stations': np.array(record['stations'], dtype=np.int32),
+            'counts': np.array(record['counts']),
+            'errors': np.array(record['errors']),
+            'total': record['total']
+        }
+    return tracker
+
+
+def top_stations(tracker, catalog_df, dimension, year, value='', k=10):
+    """
+    Top-k stations of one slice with their error bounds
+
+    Args:
+        tracker (dict): Summaries from the ingest scan
+        catalog_df (DataFrame): Station catalog from load_station_catalog
+        dimension (str): 'year', 'season', 'hour' or 'day_of_week'
+        year (int): Year of the slice
+        value (str): Season, hour or day name of the slice ('' for a whole year)
+        k (int): Number of stations to return
+
+    Returns:
+        DataFrame: rank, station_complex, estimated ridership, the most the
+        estimate can be too high, and whether the station is guaranteed to
+        be in the true top-k
+    """
+    summary = tracker['summaries'].get((dimension, year, str(value)))
+    columns = ['rank', 'station_complex', 'estimated_ridership', 'max_overestimate', 'guaranteed_top_k']
+    if summary is None:
+        return pd.DataFrame(columns=columns)
+
+    order = np.argsort(-summary['counts'], kind='stable')
+    counts, errors, stations = summary['counts'][order], summary['errors'][order], summary['stations'][order]
+    # A station is surely in the top-k if its lowest possible total beats
+    # the (k+1)-th estimate, which is an upper bound for every station below it
+    threshold = counts[k] if len(counts) > k else 0.0
+    names = catalog_df.reset_index().set_index('station_code')['station_complex']
+
+    top = pd.DataFrame({
+        'rank': np.arange(1, min(k, len(counts)) + 1),
+        'station_complex': names.reindex(stations[:k]).to_numpy(),
+        'estimated_ridership': counts[:k],
+        'max_overestimate': errors[:k],
+        'guaranteed_top_k': (counts[:k] - errors[:k]) >= threshold
+    })
+    return top[columns]
+
+
+def write_top_k_report(tracker, catalog_df, output_file, k=10):
+    """Write one sheet per dimension and year with the top-k table of every slice."""
+    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        number_format = workbook.add_format({'num_format': '#,##0'})
+
+        slices = sorted(tracker['summaries'])
+        for dimension in TOP_K_DIMENSIONS:
+            for year in sorted({year for d, year, _ in slices if d == dimension}):
+                values = [value for d, y, value in slices if d == dimension and y == year]
+                if dimension == 'day_of_week':
+                    values = [day for day in DAYS_OF_WEEK if day in values]
+                elif dimension == 'hour':
+                    values = sorted(values, key=int)
+                elif dimension == 'season':
+                    values = [season for season in ['Winter', 'Spring', 'Summer', 'Fall'] if season in values]
+
+                tables = []
+                for value in values:
+                    table = top_stations(tracker, catalog_df, dimension, year, value, k)
+                    table.insert(0, 'slice', value if value else str(year))
+                    tables.append(table)
+                df = pd.concat(tables, ignore_index=True)
+
+                worksheet = write_table(writer, df, f"Top {k} by {dimension} {year}",
+                                        {'estimated_ridership': number_format, 'max_overestimate': number_format})
+                worksheet.set_column(0, 1, 12)
+                worksheet.set_column(2, 2, 40)
+                worksheet.set_column(3, 5, 20, number_format)
+
+
+def main():
+    base_dir = Path(__file__).resolve().parents[3]
+    processed_dir = base_dir / "Source" / "Data" / "processed"
+    output_dir = base_dir / "Source" / "Data" / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tracker = load_top_k_tracker(processed_dir)
+    catalog_df = load_station_catalog(processed_dir)
+
+    date_time_str = datetime.now().strftime("%B %d, %Y %I-%M %p")
+    output_file = output_dir / f"MTA_Top_Stations_By_Slice_{date_time_str}.xlsx"
+    write_top_k_report(tracker, catalog_df, output_file)
+    print(f"✅ Top stations by year, season, hour and day of week saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,35 @@
-import pandas as pd
+import sys
+from pathlib import Path
 
-#Gets the first month of data for a specific station and saves it to a CSV file.
+# The station catalog and the row-group store are built by Processing/IngestRawData.py
+sys.path.append(str(Path(__file__).resolve().parents[2] / "Processing"))
+from StationCatalog import load_station_catalog
+from RowGroupStore import read_store
+from RawData import hour_index_to_timestamp
 
-# Load the dataset
-file_path = "MTA_Ridership_Data_02-07-2025_23-25-21.csv"  # Update the path as needed
+#Gets the first month of data for a specific station and saves it to a CSV file.
 
-# Ensure station_complex_id is treated as an integer
-df = pd.read_csv(file_path)
+processed_dir = Path(__file__).resolve().parents[3] / "Data" / "processed"
 
-# Ensure station_complex_id is treated as an integer
-df["station_complex_id"] = pd.to_numeric(df["station_complex_id"], errors='coerce')
+# Get the first year and month of a specific station (e.g., station_complex_id = 444) from the catalog
+station_id = "444"
+catalog = load_station_catalog(processed_dir)
+if station_id in catalog.index:
+    station = catalog.loc[station_id]
+    first_seen = station["first_seen"]
 
-# Convert transit_timestamp to datetime format and extract year and month
-df["transit_timestamp"] = pd.to_datetime(df["transit_timestamp"], errors='coerce')
-df.dropna(subset=["transit_timestamp"], inplace=True)  # Drop rows with invalid timestamps
-df["year"] = df["transit_timestamp"].dt.year
-df["month"] = df["transit_timestamp"].dt.month
+    # Read only that station's row groups for its first recorded month
+    first_month_data = read_store(processed_dir, stations=[int(station["station_code"])],
+                                  years=[first_seen.year], months=[first_seen.month])
+    first_month_data.insert(0, "transit_timestamp", hour_index_to_timestamp(first_month_data.pop("hour_index")))
+    first_month_data.insert(1, "station_complex_id", station_id)
+    first_month_data.insert(2, "station_complex", station["station_complex"])
+    first_month_data.drop(columns=["station_code"], inplace=True)
 
-# Get the first year and month of a specific station (e.g., station_complex_id = 444)
-if not df[df["station_complex_id"] == 444].empty:
-    first_year_month = df[df["station_complex_id"] == 444][["year", "month"]].drop_duplicates().sort_values(by=["year", "month"]).iloc[0]
-    first_year, first_month = first_year_month["year"], first_year_month["month"]
-    
-    # Get all data for the first recorded month of the station
-    first_month_data = df[(df["station_complex_id"] == 444) & (df["year"] == first_year) & (df["month"] == first_month)]
-    
     # Save to CSV
     first_month_data.to_csv("first_month.csv", index=False)
-    
+
     # Display the results
     print(first_month_data)
 else:
-    print("No data found for station_complex_id 444.")
+    print(f"No data found for station_complex_id {station_id}.")
@@ -1,21 +1,19 @@
-import pandas as pd
+import sys
+from pathlib import Path
 
-# Load the dataset (update the file path if needed)
-file_path = "MTA_Ridership_Data_02-07-2025_23-25-21.csv"
-df = pd.read_csv(file_path)
+# The station catalog is built by Processing/IngestRawData.py
+sys.path.append(str(Path(__file__).resolve().parents[2] / "Processing"))
+from StationCatalog import load_station_catalog
 
-# Extract unique stations and their IDs
-station_list = df["station_complex"].unique()
-stationID_list = df["station_complex_id"].unique()
+processed_dir = Path(__file__).resolve().parents[3] / "Data" / "processed"
 
-# Create a DataFrame ensuring both columns are added to the CSV.
-station_df = pd.DataFrame({
-    "station_complex": station_list,
-    "station_complex_id": stationID_list
-})
+# Each catalog row already pairs a station_complex_id with its own name(s),
+# so the list no longer depends on the order unique() returns values in
+catalog = load_station_catalog(processed_dir)
+station_df = catalog.reset_index()[["station_complex", "station_complex_id", "all_names", "first_seen", "last_seen"]]
 
 # Save to a CSV file for easy review
 station_df.to_csv("MTA_Station_List.csv", index=False)
 
 # Display first few stations
-print(station_df.head(10))
\ No newline at end of file
+print(station_df.head(10))